@@ -0,0 +1,118 @@
+"""
+Async entry points for the store views when the project is served over ASGI.
+
+The `async_reads` function wraps the view function of a store view so that GET and HEAD requests run its `dispatch_async` (see `AsyncReadMixin` in the views module) on the event loop, while other methods run the sync view in a worker thread. A slow client then holds no thread while it waits for a list or detail response. The `with_async_reads` function wraps the URL patterns of the store views; `stores.api.urls` uses it when `STORES_ASYNC_READS` is set, which `test_api.asgi` does.
+
+The `authenticate_async` function authenticates a request like DRF's `Request._authenticate`, loading token users with the async ORM, or from the token cache of `CachedTokenAuthentication`, and session users with `request.auser()`.
+"""
+
+from asgiref.sync import sync_to_async
+from rest_framework import exceptions
+from rest_framework.authentication import (
+    SessionAuthentication,
+    TokenAuthentication,
+    get_authorization_header,
+)
+from users.api.authentication import CachedTokenAuthentication, token_cache
+
+ASYNC_READ_METHODS = {"GET", "HEAD"}
+ASYNC_READ_ACTIONS = {"list", "retrieve"}
+
+
+async def _authenticate_token(authenticator, request):
+    auth = get_authorization_header(request).split()
+    if not auth or auth[0].lower() != authenticator.keyword.lower().encode():
+        return None
+    try:
+        key = auth[1].decode() if len(auth) == 2 else None
+    except UnicodeError:
+        key = None
+    if key is None:
+        # Malformed header: the sync check raises the matching error without
+        # touching the database.
+        return authenticator.authenticate(request)
+    cached = isinstance(authenticator, CachedTokenAuthentication)
+    if cached:
+        credentials = token_cache.get(key)
+        if credentials is not None:
+            return credentials
+    model = authenticator.get_model()
+    try:
+        token = await model.objects.select_related("user").aget(key=key)
+    except model.DoesNotExist:
+        raise exceptions.AuthenticationFailed("Invalid token.")
+    if not token.user.is_active:
+        raise exceptions.AuthenticationFailed("User inactive or deleted.")
+    if cached:
+        token_cache.set(token)
+    return (token.user, token)
+
+
+async def _authenticate_session(authenticator, request):
+    auser = getattr(request._request, "auser", None)
+    user = await auser() if auser is not None else None
+    if not user or not user.is_active:
+        return None
+    authenticator.enforce_csrf(request)
+    return (user, None)
+
+
+async def authenticate_async(request):
+    """Set request.user and request.auth without blocking the event loop."""
+    for authenticator in request.authenticators:
+        try:
+            if isinstance(authenticator, TokenAuthentication):
+                user_auth_tuple = await _authenticate_token(authenticator, request)
+            elif isinstance(authenticator, SessionAuthentication):
+                user_auth_tuple = await _authenticate_session(authenticator, request)
+            else:
+                user_auth_tuple = await sync_to_async(authenticator.authenticate)(
+                    request
+                )
+        except exceptions.APIException:
+            request._not_authenticated()
+            raise
+        if user_auth_tuple is not None:
+            request._authenticator = authenticator
+            request.user, request.auth = user_auth_tuple
+            return
+    request._not_authenticated()
+
+
+def async_reads(view):
+    """An async view serving GET and HEAD of the DRF view function `view`."""
+    cls = view.cls
+    initkwargs = view.initkwargs
+    actions = getattr(view, "actions", None)
+    sync_view = sync_to_async(view)
+
+    async def async_view(request, *args, **kwargs):
+        if request.method not in ASYNC_READ_METHODS:
+            return await sync_view(request, *args, **kwargs)
+        self = cls(**initkwargs)
+        if actions is not None:
+            # What ViewSetMixin.as_view does before dispatching.
+            self.action_map = {"head": actions["get"], **actions}
+            for method, action in self.action_map.items():
+                setattr(self, method, getattr(self, action))
+        self.request = request
+        return await self.dispatch_async(request, *args, **kwargs)
+
+    async_view.cls = cls
+    async_view.initkwargs = initkwargs
+    async_view.actions = actions
+    async_view.csrf_exempt = True
+    return async_view
+
+
+def with_async_reads(urlpatterns):
+    """`urlpatterns` with the views that support it wrapped by async_reads."""
+    for pattern in urlpatterns:
+        view_class = getattr(pattern.callback, "cls", None)
+        if not hasattr(view_class, "dispatch_async"):
+            continue
+        # Viewset routes only qualify for the list and retrieve actions.
+        actions = getattr(pattern.callback, "actions", None)
+        if actions is None or actions.get("get") in ASYNC_READ_ACTIONS:
+            pattern.callback = async_reads(pattern.callback)
+    return urlpatterns
@@ -0,0 +1,199 @@
+"""
+Bulk write operations for the stores API.
+
+The `bulk_create_stores` function validates a list of store payloads with the `StoreSerializer`, collecting errors per item, and inserts the valid stores with `insert_stores`: batched INSERTs for the stores, their manager links, their `StoreAccess`, `StoreSearch` and `StoreOpenInterval` rows inside a single transaction. The users referenced by all payloads are loaded with one query up front.
+
+The `bulk_update_hours` and `bulk_update_days` functions apply one schedule change to many visible stores with set-based UPDATEs. A request without hour or day values is rejected before any store is selected. The opening<closing rule is checked with a single query against the selected stores, and the database recomputes `days_mask` from the day flags. The opening intervals of the updated stores are recomputed per batch.
+"""
+
+from django.db import transaction
+from django.utils import timezone
+from rest_framework.exceptions import NotFound, ValidationError
+from users.models import CustomUser
+from ..cache import bump_generations
+from ..models import (
+    DAY_BITS,
+    Store,
+    StoreAccess,
+    StoreOpenInterval,
+    StoreSearch,
+)
+from .serializers import StoreSerializer
+
+BULK_CREATE_LIMIT = 1000
+BULK_BATCH_SIZE = 500
+HOUR_FIELDS = ("opening_time", "closing_time")
+
+
+def _referenced_user_ids(items):
+    user_ids = set()
+    for item in items:
+        if not isinstance(item, dict):
+            continue
+        values = [item.get("owner_id")]
+        managers = item.get("manager_ids")
+        if isinstance(managers, list):
+            values += managers
+        for value in values:
+            if isinstance(value, int) and not isinstance(value, bool):
+                user_ids.add(value)
+            elif isinstance(value, str) and value.isdigit():
+                user_ids.add(int(value))
+    return user_ids
+
+
+def validate_store_payloads(items, context):
+    if not isinstance(items, list):
+        raise ValidationError("Expected a list of stores.")
+    if not items:
+        raise ValidationError("Expected at least one store.")
+    if len(items) > BULK_CREATE_LIMIT:
+        raise ValidationError(
+            f"At most {BULK_CREATE_LIMIT} stores can be created per request."
+        )
+
+    users = CustomUser.objects.filter(pk__in=_referenced_user_ids(items))
+    context = {**context, "users_by_id": {user.pk: user for user in users}}
+    valid, errors = [], []
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            errors.append({"index": index, "errors": ["Expected an object."]})
+            continue
+        serializer = StoreSerializer(data=item, context=context)
+        if serializer.is_valid():
+            valid.append((index, serializer.validated_data))
+        else:
+            errors.append({"index": index, "errors": serializer.errors})
+    return valid, errors
+
+
+def insert_stores(stores, managers):
+    """Insert unsaved `stores`, linking each to its `managers` (user ids).
+
+    bulk_create skips Store.save and the signal handlers, so this writes the
+    StoreAccess, StoreSearch and StoreOpenInterval rows of the stores itself.
+    """
+    Through = Store.manager_ids.through
+    with transaction.atomic():
+        Store.objects.bulk_create(stores, batch_size=BULK_BATCH_SIZE)
+        links, access = [], []
+        for store, store_managers in zip(stores, managers):
+            access.append(
+                StoreAccess(
+                    store_id=store.pk, user_id=store.owner_id_id, role=StoreAccess.OWNER
+                )
+            )
+            for manager in dict.fromkeys(store_managers):
+                links.append(Through(store_id=store.pk, customuser_id=manager))
+                access.append(
+                    StoreAccess(
+                        store_id=store.pk, user_id=manager, role=StoreAccess.MANAGER
+                    )
+                )
+        Through.objects.bulk_create(links, batch_size=BULK_BATCH_SIZE)
+        StoreAccess.objects.bulk_create(access, batch_size=BULK_BATCH_SIZE)
+        for start in range(0, len(stores), BULK_BATCH_SIZE):
+            batch = [store.pk for store in stores[start : start + BULK_BATCH_SIZE]]
+            StoreSearch.refresh(batch)
+            StoreOpenInterval.refresh(batch)
+
+
+def bulk_create_stores(items, context):
+    """Create the valid stores in `items`, returning (created ids, errors)."""
+    valid, errors = validate_store_payloads(items, context)
+    if not valid:
+        return [], errors
+
+    stores, managers = [], []
+    for _, data in valid:
+        data = dict(data)
+        managers.append([manager.pk for manager in data.pop("manager_ids", [])])
+        stores.append(Store(**data))
+
+    with transaction.atomic():
+        insert_stores(stores, managers)
+        bump_generations([store.pk for store in stores])
+
+    created = [
+        {"index": index, "id": store.pk} for (index, _), store in zip(valid, stores)
+    ]
+    return created, errors
+
+
+def _require_values(values, fields):
+    # Without values nothing would be written, whatever the selection.
+    if not values:
+        raise ValidationError(f"Expected at least one of: {', '.join(fields)}.")
+
+
+def _selected(queryset, ids):
+    """`queryset` restricted to `ids` when given."""
+    if ids is None:
+        return queryset
+    if not isinstance(ids, list) or not ids:
+        raise ValidationError({"ids": "Expected a non-empty list of store ids."})
+    if not all(isinstance(pk, int) and not isinstance(pk, bool) for pk in ids):
+        raise ValidationError({"ids": "Store ids must be integers."})
+    return queryset.filter(pk__in=ids)
+
+
+def _visible_ids(queryset, ids):
+    """Ids of the stores in the selected `queryset`, checked against `ids`."""
+    found = list(queryset.order_by().values_list("pk", flat=True))
+    if ids is not None:
+        missing = sorted(set(ids) - set(found))
+        if missing:
+            raise NotFound(f"Stores not found: {missing}")
+    return sorted(set(found))
+
+
+def _update_in_batches(ids, **values):
+    values["updated_at"] = timezone.now()
+    with transaction.atomic():
+        for start in range(0, len(ids), BULK_BATCH_SIZE):
+            batch = ids[start : start + BULK_BATCH_SIZE]
+            Store.objects.filter(pk__in=batch).update(**values)
+            StoreOpenInterval.refresh(batch)
+        bump_generations(ids)
+
+
+def bulk_update_hours(queryset, ids, validated_data):
+    """Set opening/closing times on many stores with set-based UPDATEs."""
+    hours = {
+        field: validated_data[field] for field in HOUR_FIELDS if field in validated_data
+    }
+    _require_values(hours, HOUR_FIELDS)
+    queryset = _selected(queryset, ids)
+    ids = _visible_ids(queryset, ids)
+    opening_time = hours.get("opening_time")
+    closing_time = hours.get("closing_time")
+    # With only one time given, the other one comes from each store. The
+    # check runs on the selection itself rather than on its ids.
+    conflicts = queryset.none()
+    if opening_time and not closing_time:
+        conflicts = queryset.filter(closing_time__lte=opening_time)
+    elif closing_time and not opening_time:
+        conflicts = queryset.filter(opening_time__gte=closing_time)
+    conflicting = list(
+        conflicts.order_by("pk").values_list("pk", flat=True)[:BULK_BATCH_SIZE]
+    )
+    if conflicting:
+        raise ValidationError(
+            {
+                "closing_time": "Closing time must be later than opening time",
+                "ids": conflicting,
+            }
+        )
+    if ids:
+        _update_in_batches(ids, **hours)
+    return ids
+
+
+def bulk_update_days(queryset, ids, validated_data):
+    """Set day flags on many stores with set-based UPDATEs."""
+    days = {day: value for day, value in validated_data.items() if day in DAY_BITS}
+    _require_values(days, DAY_BITS)
+    ids = _visible_ids(_selected(queryset, ids), ids)
+    if ids:
+        _update_in_batches(ids, **days)
+    return ids
@@ -0,0 +1,178 @@
+"""
+Compiled read-only store serializers for list endpoints.
+
+`compiled_serializer(serializer_class, fieldset)` generates, once per serializer class and sparse fieldset, a function that builds the representation of a store from one `values_list` row: the dict `serializer_class(store).data` holds, restricted to the fieldset when one is given, with the same keys in the same order and the same values. No `Store` or `CustomUser` instances are built and no field objects are called for columns whose value already is their representation.
+
+`CompiledSerializer.rows(queryset)` selects the columns the serializer needs, plus the ones the list is ordered by so that cursor pagination can read its position from the rows. `CompiledSerializer.load(rows)` appends the managers of each store, read with one query over the manager through table, and `CompiledSerializer.data(rows)` returns the representations.
+
+Model columns, primary key relations, `manager_ids` and the `owner` and `managers` method fields are compiled. Any other field raises `ImproperlyConfigured` when the serializer is compiled.
+"""
+
+from collections import namedtuple
+from functools import cache, lru_cache
+from django.core.exceptions import FieldDoesNotExist, ImproperlyConfigured
+from rest_framework import serializers
+from rest_framework.relations import ManyRelatedField, RelatedField
+from ..models import Store
+
+# Every row carries what the ETag and Last-Modified validators need.
+VALIDATOR_COLUMNS = (
+    "id",
+    "updated_at",
+    "relations_version",
+    "relations_modified_at",
+)
+OWNER_COLUMNS = ("owner_id", "owner_id__first_name", "owner_id__last_name")
+MANAGERS_COLUMN = "store_managers"
+
+# Fields whose to_representation returns column values of these types as is.
+PASSTHROUGH_FIELDS = {
+    serializers.BooleanField,
+    serializers.CharField,
+    serializers.IntegerField,
+}
+
+
+def user_label(user_id, first_name, last_name):
+    # The text of CustomUser.__str__.
+    return f"{first_name} {last_name} (id: {user_id})"
+
+
+def managers_by_store(store_ids):
+    """{store id: [(manager id, label), ...]}, ordered by manager id."""
+    Through = Store.manager_ids.through
+    links = Through.objects.filter(store_id__in=store_ids).values_list(
+        "store_id",
+        "customuser_id",
+        "customuser__first_name",
+        "customuser__last_name",
+    )
+    managers = {}
+    for store_id, user_id, first_name, last_name in links.order_by("customuser_id"):
+        managers.setdefault(store_id, []).append(
+            (user_id, user_label(user_id, first_name, last_name))
+        )
+    return managers
+
+
+def spans_many(path):
+    """Whether the Store lookup `path` follows a to-many relation."""
+    model = Store
+    for name in path.split("__"):
+        try:
+            field = model._meta.get_field(name)
+        except FieldDoesNotExist:
+            # An annotation such as a search rank.
+            return False
+        if field.many_to_many or field.one_to_many:
+            return True
+        model = field.related_model or model
+    return False
+
+
+@cache
+def loaded_row_class(fields):
+    return namedtuple("Row", (*fields, MANAGERS_COLUMN))
+
+
+class CompiledSerializer:
+    def __init__(self, serializer_class, fieldset=None):
+        self.serializer_class = serializer_class
+        self.columns = list(VALIDATOR_COLUMNS)
+        self.uses_managers = False
+        namespace = {"user_label": user_label}
+        items = []
+        for name, field in serializer_class().fields.items():
+            if fieldset is not None and name not in fieldset:
+                continue
+            if not field.write_only:
+                expression = self.compile_field(name, field, namespace)
+                items.append(f"        {name!r}: {expression},")
+        self.source = "\n".join(
+            [
+                "def to_representation(row):",
+                "    managers = row[-1]",
+                "    return {",
+                *items,
+                "    }",
+            ]
+        )
+        code = compile(self.source, f"<compiled {serializer_class.__name__}>", "exec")
+        exec(code, namespace)
+        self.to_representation = namespace["to_representation"]
+
+    def column(self, name):
+        if name not in self.columns:
+            self.columns.append(name)
+        return f"row[{self.columns.index(name)}]"
+
+    def compile_field(self, name, field, namespace):
+        """The Python expression for `field`'s value in a row."""
+        if isinstance(field, serializers.SerializerMethodField):
+            if name == "owner":
+                return f"user_label({', '.join(map(self.column, OWNER_COLUMNS))})"
+            if name == "managers":
+                self.uses_managers = True
+                return "[label for _, label in managers]"
+        elif isinstance(field, ManyRelatedField):
+            if field.source == "manager_ids":
+                self.uses_managers = True
+                return "[pk for pk, _ in managers]"
+        elif isinstance(field, RelatedField):
+            if field.source == "owner_id":
+                return self.column("owner_id")
+        else:
+            try:
+                model_field = Store._meta.get_field(field.source)
+            except FieldDoesNotExist:
+                model_field = None
+            if model_field is not None and model_field.concrete:
+                value = self.column(field.source)
+                if type(field) in PASSTHROUGH_FIELDS:
+                    return value
+                converter = f"to_{name}"
+                namespace[converter] = field.to_representation
+                if model_field.null:
+                    return f"None if {value} is None else {converter}({value})"
+                return f"{converter}({value})"
+        raise ImproperlyConfigured(
+            f"{self.serializer_class.__name__}.{name} cannot be compiled."
+        )
+
+    def rows(self, queryset):
+        """`queryset` as named rows of the compiled columns and its ordering.
+
+        Orderings over managers are left out: selecting them would return a
+        row per manager, and cursor pagination rejects them anyway.
+        """
+        ordering = queryset.query.order_by or Store._meta.ordering
+        columns = list(self.columns)
+        for field in ordering:
+            if not isinstance(field, str):
+                continue
+            name = field.lstrip("-")
+            if name not in columns and not spans_many(name):
+                columns.append(name)
+        queryset = queryset.select_related(None).prefetch_related(None)
+        return queryset.values_list(*columns, named=True)
+
+    def load(self, rows):
+        """`rows` with the managers of each store as a last column."""
+        rows = list(rows)
+        if not rows:
+            return rows
+        managers = {}
+        if self.uses_managers:
+            managers = managers_by_store({row[0] for row in rows})
+        Row = loaded_row_class(rows[0]._fields)
+        return [Row(*row, managers.get(row[0], ())) for row in rows]
+
+    def data(self, rows):
+        to_representation = self.to_representation
+        return [to_representation(row) for row in rows]
+
+
+# One entry per serializer and requested sparse fieldset.
+@lru_cache(maxsize=256)
+def compiled_serializer(serializer_class, fieldset=None):
+    return CompiledSerializer(serializer_class, fieldset)
@@ -0,0 +1,47 @@
+"""
+Validators for conditional GET requests on store endpoints.
+
+Store representations only change when a store row changes (`updated_at`) or when its managers, or the names shown for its owner and managers, change (`relations_version` and `relations_modified_at`). All are known before serialization, so `If-None-Match` and `If-Modified-Since` can be answered with a 304 without serializing anything.
+
+The ETag of a list response also covers the query parameters and the pagination state (count and links), so adding or removing a store outside the current page still changes it. Clients should prefer `If-None-Match` for lists: `Last-Modified` is the newest change on the page and cannot express a store leaving it.
+"""
+
+import hashlib
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date
+
+
+def store_version(store):
+    return (store.id, store.updated_at.isoformat(), store.relations_version)
+
+
+def make_etag(*parts):
+    digest = hashlib.sha256(repr(parts).encode()).hexdigest()
+    return f'"{digest[:40]}"'
+
+
+def modified_at(store):
+    """When the representation of `store` last changed."""
+    if store.relations_modified_at is None:
+        return store.updated_at
+    return max(store.updated_at, store.relations_modified_at)
+
+
+def last_modified(stores):
+    timestamps = [modified_at(store).timestamp() for store in stores]
+    return int(max(timestamps)) if timestamps else None
+
+
+def not_modified_response(request, etag, modified):
+    """A 304 (or 412) response if the request's validators match, else None."""
+    response = get_conditional_response(request, etag=etag, last_modified=modified)
+    if response is not None:
+        set_validators(response, etag, modified)
+    return response
+
+
+def set_validators(response, etag, modified):
+    response["ETag"] = etag
+    if modified is not None:
+        response["Last-Modified"] = http_date(modified)
+    return response
@@ -0,0 +1,122 @@
+"""
+Streaming CSV and NDJSON export of stores.
+
+The `stream_stores` function turns a filtered store queryset into a `StreamingHttpResponse`. Rows are read with a server-side chunked iterator over `values_list`, and the managers of each chunk are fetched with one query, so memory use does not depend on the number of stores and no COUNT query is run.
+
+The `CSVExportRenderer` and `NDJSONExportRenderer` classes only exist so that content negotiation accepts `text/csv` and `application/x-ndjson`. Error responses are rendered as JSON.
+"""
+
+import csv
+from itertools import islice
+from django.http import StreamingHttpResponse
+from test_api.fast_json import JSONRenderer, dumps
+from .compiled import managers_by_store, user_label
+
+EXPORT_CHUNK_SIZE = 2000
+
+EXPORT_COLUMNS = [
+    "id",
+    "name",
+    "owner",
+    "managers",
+    "address",
+    "city",
+    "state_abbrv",
+    "plz",
+    "days_of_operation",
+    "opening_time",
+    "closing_time",
+]
+
+STORE_VALUES = [
+    "id",
+    "name",
+    "owner_id",
+    "owner_id__first_name",
+    "owner_id__last_name",
+    "address",
+    "city",
+    "state_abbrv",
+    "plz",
+    "days_of_operation",
+    "opening_time",
+    "closing_time",
+]
+
+
+class CSVExportRenderer(JSONRenderer):
+    media_type = "text/csv"
+    format = "csv"
+
+
+class NDJSONExportRenderer(JSONRenderer):
+    media_type = "application/x-ndjson"
+    format = "ndjson"
+
+
+def iter_store_records(queryset, chunk_size=EXPORT_CHUNK_SIZE):
+    """Yield one dict per store, keyed by EXPORT_COLUMNS."""
+    if not queryset.query.order_by:
+        queryset = queryset.order_by("id")
+    rows = queryset.prefetch_related(None).values_list(*STORE_VALUES)
+    rows = rows.iterator(chunk_size=chunk_size)
+    while True:
+        chunk = list(islice(rows, chunk_size))
+        if not chunk:
+            return
+        managers = managers_by_store([row[0] for row in chunk])
+        for row in chunk:
+            store = dict(zip(STORE_VALUES, row))
+            yield {
+                "id": store["id"],
+                "name": store["name"],
+                "owner": user_label(
+                    store["owner_id"],
+                    store["owner_id__first_name"],
+                    store["owner_id__last_name"],
+                ),
+                "managers": [label for _, label in managers.get(store["id"], ())],
+                "address": store["address"],
+                "city": store["city"],
+                "state_abbrv": store["state_abbrv"],
+                "plz": store["plz"],
+                "days_of_operation": store["days_of_operation"],
+                "opening_time": store["opening_time"],
+                "closing_time": store["closing_time"],
+            }
+
+
+class _Echo:
+    """File-like object whose write returns the line for csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def iter_csv(records):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(EXPORT_COLUMNS)
+    for record in records:
+        record["managers"] = "; ".join(record["managers"])
+        yield writer.writerow([record[column] for column in EXPORT_COLUMNS])
+
+
+def iter_ndjson(records):
+    for record in records:
+        yield dumps(record) + b"\n"
+
+
+EXPORT_FORMATS = {
+    "csv": (iter_csv, "text/csv; charset=utf-8"),
+    "ndjson": (iter_ndjson, "application/x-ndjson; charset=utf-8"),
+}
+
+
+def stream_stores(queryset, export_format):
+    encode, content_type = EXPORT_FORMATS[export_format]
+    response = StreamingHttpResponse(
+        encode(iter_store_records(queryset)), content_type=content_type
+    )
+    filename = f"stores.{export_format}"
+    response["Content-Disposition"] = f'attachment; filename="{filename}"'
+    return response
@@ -1,4 +1,4 @@
-from django.core.validators import MinValueValidator
+from django.core.validators import MinValueValidator, MaxValueValidator
 from django_filters.rest_framework import (
     FilterSet,
     NumberFilter,
@@ -8,118 +8,240 @@ from django_filters.rest_framework import (
     ChoiceFilter,
     TimeFilter,
 )
+from django.utils import timezone
+from django.utils.dateparse import parse_time
+from django_filters.constants import EMPTY_VALUES
 from rest_framework.exceptions import ValidationError
+from rest_framework.fields import BooleanField
 from datetime import datetime
-from ..models import Store
+from test_api.fieldsets import FIELDSET_PARAMS, fieldset_check, readable_fields
+from test_api.pagination import PAGINATION_PARAMS
+from users.models import CustomUser
+from ..search import contains_candidates, search_stores
+from ..models import (
+    Store,
+    StoreOpenInterval,
+    DAYS_OF_WEEK,
+    DAY_BITS,
+    week_minute,
+    days_to_mask,
+    masks_with_all,
+    masks_with_any,
+    masks_without_any,
+    masks_with_at_least,
+)
+from .included import INCLUDE_PARAM, check_include
 from .serializers import (
-    StoreSerializer,
     DaysSerializer,
     HoursSerializer,
     ManagersSerializer,
+    StoreSerializer,
 )
 
 
-class BaseFilterValidationMixin:
-    def _validate_parameter_names(self, params, allowed_params):
-        invalid_params = set(params) - allowed_params
-        if invalid_params:
-            raise ValidationError(
-                f"Invalid query parameter: {invalid_params.pop()}. Must be one of: {allowed_params}"
-            )
+class IndexedCharFilter(CharFilter):
+    """A CharFilter that first narrows the stores with the StoreSearch index.
+
+    The index returns a superset of the matches of `lookup_expr`, so the exact
+    lookup still decides, but only over the candidate stores.
+    """
+
+    def __init__(self, *args, search_column, **kwargs):
+        self.search_column = search_column
+        super().__init__(*args, **kwargs)
+
+    def filter(self, qs, value):
+        if value in EMPTY_VALUES:
+            return qs
+        qs = contains_candidates(qs, self.search_column, value)
+        return super().filter(qs, value)
+
+
+class IndexedTimeFilter(TimeFilter):
+    """A TimeFilter for ranges that reads the matching ids off the time index.
+
+    Given a one-sided range and the default ordering by id, SQLite prefers
+    walking the whole table in id order over the (time, id) index. Selecting
+    the ids in a subquery lets the index answer the range instead.
+    """
+
+    def filter(self, qs, value):
+        if value in EMPTY_VALUES:
+            return qs
+        lookup = f"{self.field_name}__{self.lookup_expr}"
+        ids = qs.model._default_manager.filter(**{lookup: value}).order_by()
+        return qs.filter(pk__in=ids.values("pk"))
+
+
+# Stages of query parameter validation, in the order their errors win.
+DUPLICATE, EMPTY, UNKNOWN, NAME, BOOLEAN, FIELD = range(6)
+
+
+def _check_name(field, value):
+    if not any(char.isalpha() for char in value):
+        return "Name must contain at least one letter"
+
+
+def _check_true_false(field, value):
+    if value.lower() not in {"true", "false"}:
+        return f"Invalid parameter, must be 'true' or 'false': {field}"
+
+
+class ValidationPlan:
+    """Query parameter checks for one FilterSet class, compiled once.
+
+    `validate` walks the parameters a single time. Each stage keeps its first
+    error and the error of the earliest stage is raised, so a request fails
+    with the same message as when every stage was a separate pass. Errors of
+    the FIELD stage are collected per parameter, like serializer errors.
+    """
+
+    def __init__(self, allowed_params, checks):
+        self.allowed_params = set(allowed_params)
+        # Parameter name -> tuple of (stage, check) pairs.
+        self.checks = checks
+
+    def validate(self, params):
+        """Raise the first error in `params`; return False if nothing filters."""
+        errors = {}
+        filtering = False
+        for field, values in params.lists():
+            if field not in PAGINATION_PARAMS:
+                filtering = True
+            if len(values) > 1 and DUPLICATE not in errors:
+                errors[DUPLICATE] = f"Duplicate query parameter found: {field}"
+            if not values or not all(values):
+                errors.setdefault(EMPTY, f"Empty values not allowed for {field}")
+                continue
+            if field not in self.allowed_params:
+                errors.setdefault(
+                    UNKNOWN,
+                    f"Invalid query parameter: {field}. Must be one of: {self.allowed_params}",
+                )
+                continue
+            for stage, check in self.checks.get(field, ()):
+                if stage == FIELD:
+                    field_errors = errors.setdefault(FIELD, {})
+                    if field not in field_errors:
+                        message = check(field, values[0].strip())
+                        if message is not None:
+                            field_errors[field] = [message]
+                elif stage not in errors:
+                    message = check(field, values[0])
+                    if message is not None:
+                        errors[stage] = message
+        errors = {stage: error for stage, error in errors.items() if error}
+        if filtering and errors:
+            raise ValidationError(errors[min(errors)])
+        return filtering
 
-    def _add_default_params(self, allowed_params):
-        return allowed_params | {"page", "page_size", "ordering"}
-
-    def _reject_all_empty(self, params):
-        for field in params.keys():
-            values = params.getlist(field)
-            self._reject_empty_values(field, values)
-
-    def _reject_empty_values(self, field, values):
-        if not values:
-            raise ValidationError(f"Empty values not allowed for {field}")
-        for value in values:
-            if not value:
-                raise ValidationError(f"Empty values not allowed for {field}")
-
-    # Originally from Manager Filter
-    def _validate_name(self, name):
-        if not any(char.isalpha() for char in name):
-            raise ValidationError("Name must contain at least one letter")
-
-    def _validate_names(self, params):
-        for field in set(params.keys()):
-            values = params.getlist(field)
-            # Validate names only for name-related fields
+
+class BaseFilterValidationMixin:
+    extra_allowed_params = (
+        PAGINATION_PARAMS | FIELDSET_PARAMS | {"ordering", INCLUDE_PARAM}
+    )
+    # Parameters whose value must be 'true' or 'false'.
+    boolean_params = ()
+    # Parameter name -> (stage, check) pairs run after the common checks.
+    value_checks = {}
+    # The serializer of the view, whose fields `fields` and `exclude` name.
+    serializer_class = None
+
+    @classmethod
+    def validation_plan(cls):
+        plan = cls.__dict__.get("_validation_plan")
+        if plan is None:
+            plan = cls._compile_validation_plan()
+            cls._validation_plan = plan
+        return plan
+
+    @classmethod
+    def _compile_validation_plan(cls):
+        allowed_params = set(cls.base_filters) | cls.extra_allowed_params
+        value_checks = {INCLUDE_PARAM: ((FIELD, check_include),), **cls.value_checks}
+        if cls.serializer_class is not None:
+            check = fieldset_check(readable_fields(cls.serializer_class))
+            for param in FIELDSET_PARAMS:
+                value_checks[param] = ((FIELD, check),)
+        checks = {}
+        for field in allowed_params:
+            field_checks = []
             if "name" in field:
-                self._validate_name(values[0])
+                field_checks.append((NAME, _check_name))
+            if field in cls.boolean_params:
+                field_checks.append((BOOLEAN, _check_true_false))
+            field_checks.extend(value_checks.get(field, ()))
+            if field_checks:
+                checks[field] = tuple(field_checks)
+        return ValidationPlan(allowed_params, checks)
 
-    # Originally from Days Filter
-    def _validate_day_fields(self, params, day_fields):
-        for field in day_fields:
-            values = params.getlist(field)
-            self._validate_boolean_value(field, values)
+    def validate_filters(self, params):
+        return self.validation_plan().validate(params)
+
+
+# Every day filter is answered by the indexed Store.days_mask column.
+class WeekdayFilterSet(FilterSet):
+    montag = BooleanFilter(method="filter_day")
+    dienstag = BooleanFilter(method="filter_day")
+    mittwoch = BooleanFilter(method="filter_day")
+    donnerstag = BooleanFilter(method="filter_day")
+    freitag = BooleanFilter(method="filter_day")
+    samstag = BooleanFilter(method="filter_day")
+    sonntag = BooleanFilter(method="filter_day")
+    days_all = CharFilter(method="filter_days_all")
+    days_any = CharFilter(method="filter_days_any")
+    min_days = NumberFilter(
+        method="filter_min_days",
+        validators=[
+            MinValueValidator(1, message="min_days must be between 1 and 7"),
+            MaxValueValidator(7, message="min_days must be between 1 and 7"),
+        ],
+    )
 
-    def _validate_boolean_value(self, field, values):
-        if values and values[0].lower() not in {"true", "false"}:
-            raise ValidationError(
-                f"Invalid parameter, must be 'true' or 'false': {field}"
-            )
+    def filter_day(self, queryset, name, value):
+        if value:
+            return queryset.filter(days_mask__in=masks_with_all(DAY_BITS[name]))
+        return queryset.filter(days_mask__in=masks_without_any(DAY_BITS[name]))
 
-    def _check_for_duplicate(self, field, values):
-        if len(values) > 1:
-            raise ValidationError(f"Duplicate query parameter found: {field}")
+    def filter_days_all(self, queryset, name, value):
+        mask = self._parse_days(name, value)
+        return queryset.filter(days_mask__in=masks_with_all(mask))
 
-    def _check_for_duplicates(self, params):
-        for field in params.keys():
-            values = params.getlist(field)
-            self._check_for_duplicate(field, values)
+    def filter_days_any(self, queryset, name, value):
+        mask = self._parse_days(name, value)
+        return queryset.filter(days_mask__in=masks_with_any(mask))
 
-    def _base_validation(self, params, allowed_params):
-        self._check_for_duplicates(params)
-        self._reject_all_empty(params)
-        self._validate_parameter_names(params, allowed_params)
+    def filter_min_days(self, queryset, name, value):
+        return queryset.filter(days_mask__in=masks_with_at_least(int(value)))
 
-    @property
-    def _extra_allowed_params(self):
-        return {"page", "page_size", "ordering"}
+    def _parse_days(self, name, value):
+        days = [day.strip().lower() for day in value.split(",")]
+        for day in days:
+            if day not in DAY_BITS:
+                raise ValidationError(
+                    f"Invalid day for {name}: {day}. Must be one of: {DAYS_OF_WEEK}"
+                )
+        return days_to_mask(days)
 
 
-class DaysFilter(FilterSet, BaseFilterValidationMixin):
-    montag = BooleanFilter()
-    dienstag = BooleanFilter()
-    mittwoch = BooleanFilter()
-    donnerstag = BooleanFilter()
-    freitag = BooleanFilter()
-    samstag = BooleanFilter()
-    sonntag = BooleanFilter()
+class DaysFilter(WeekdayFilterSet, BaseFilterValidationMixin):
+    boolean_params = DAYS_OF_WEEK
+    serializer_class = DaysSerializer
 
     def filter_queryset(self, queryset):
-        params = self.request.query_params
-        if self.request.method == "GET":
-            non_page_params = {
-                k for k in params.keys() if k not in {"page", "page_size"}
-            }
-            if non_page_params:
-                self.validate_filters(params)
+        if self.request.method in {"GET", "PATCH"}:
+            self.validate_filters(self.request.query_params)
         return super().filter_queryset(queryset)
 
-    def validate_filters(self, params):
-        params = self.request.query_params
-        day_fields = set(self.filters.keys())
-        allowed_params = self._add_default_params(day_fields)
-        self._base_validation(params, allowed_params)
-        self._validate_day_fields(params, day_fields)
-
 
 class HoursFilter(FilterSet, BaseFilterValidationMixin):
     opening_time = TimeFilter()
-    opening_time_lte = TimeFilter(field_name="opening_time", lookup_expr="lte")
-    opening_time_gte = TimeFilter(field_name="opening_time", lookup_expr="gte")
+    opening_time_lte = IndexedTimeFilter(field_name="opening_time", lookup_expr="lte")
+    opening_time_gte = IndexedTimeFilter(field_name="opening_time", lookup_expr="gte")
 
     closing_time = TimeFilter()
-    closing_time_lte = TimeFilter(field_name="closing_time", lookup_expr="lte")
-    closing_time_gte = TimeFilter(field_name="closing_time", lookup_expr="gte")
+    closing_time_lte = IndexedTimeFilter(field_name="closing_time", lookup_expr="lte")
+    closing_time_gte = IndexedTimeFilter(field_name="closing_time", lookup_expr="gte")
 
     ordering = OrderingFilter(
         fields=(
@@ -128,36 +250,34 @@ class HoursFilter(FilterSet, BaseFilterValidationMixin):
         )
     )
 
+    serializer_class = HoursSerializer
+
     class Meta:
         model = Store
         fields = ["opening_time", "closing_time"]
 
     def filter_queryset(self, queryset):
-        params = self.request.query_params
-        if self.request.method == "GET":
-            non_page_params = {
-                k for k in params.keys() if k not in {"page", "page_size"}
-            }
-            if non_page_params:
-                self.validate_filters(params)
+        if self.request.method in {"GET", "PATCH"}:
+            self.validate_filters(self.request.query_params)
         return super().filter_queryset(queryset)
 
-    def validate_filters(self, params):
-        time_fields = set(self.filters.keys())
-        allowed_params = time_fields | {"page", "page_size", "ordering"}
-        self._base_validation(params, allowed_params)
-
 
 class ManagersFilter(FilterSet, BaseFilterValidationMixin):
     manager_ids = NumberFilter(
         lookup_expr="exact",
         validators=[MinValueValidator(1, message="Invalid manager ID")],
     )
-    manager_first_name = CharFilter(
-        field_name="manager_ids__first_name", lookup_expr="icontains"
+    manager_first_name = IndexedCharFilter(
+        field_name="manager_ids__first_name",
+        lookup_expr="icontains",
+        distinct=True,
+        search_column="managers",
     )
-    manager_last_name = CharFilter(
-        field_name="manager_ids__last_name", lookup_expr="icontains"
+    manager_last_name = IndexedCharFilter(
+        field_name="manager_ids__last_name",
+        lookup_expr="icontains",
+        distinct=True,
+        search_column="managers",
     )
     ordering = OrderingFilter(
         fields=(
@@ -166,34 +286,83 @@ class ManagersFilter(FilterSet, BaseFilterValidationMixin):
         )
     )
 
+    serializer_class = ManagersSerializer
+
     class Meta:
         model = Store
         fields = ["manager_ids"]
 
     def filter_queryset(self, queryset):
-        params = self.request.query_params
-        if self.request.method == "GET":
-            non_page_params = {
-                k for k in params.keys() if k not in {"page", "page_size"}
-            }
-            if non_page_params:
-                self.validate_filters(params)
+        if self.request.method in {"GET", "PATCH"}:
+            self.validate_filters(self.request.query_params)
         return super().filter_queryset(queryset)
 
-    def validate_filters(self, params):
-        manager_fields = set(self.filters.keys())
-        allowed_params = self._add_default_params(manager_fields)
-        self._base_validation(params, allowed_params)
-        self._validate_names(params)
+
+# The FIELD checks below give the messages StoreSerializer gives for the same
+# values. Values arrive stripped, as CharField trims whitespace.
+def _check_not_blank(field, value):
+    if not value:
+        return "This field may not be blank."
+
+
+def _check_address(field, value):
+    has_number = any(char.isdigit() for char in value)
+    has_text = any(char.isalpha() for char in value)
+    if value and not (has_number and has_text):
+        return "Address must contain both numbers and text."
 
 
-class StoreFilter(FilterSet, BaseFilterValidationMixin):
-    name = CharFilter(lookup_expr="icontains")
-    city = CharFilter(lookup_expr="icontains")
-    address = CharFilter(lookup_expr="icontains")
+def _check_state_abbrv(field, value):
+    if len(value) > 2:
+        return "Ensure this field has no more than 2 characters."
+    if value and value not in Store.STATES:
+        return f"'{value}' is an invalid state abbreviation"
+
+
+def _check_plz(field, value):
+    if not value.isdigit():
+        return "PLZ must contain only numbers"
+    if len(value) != 5:
+        return "PLZ must be exactly 5 digits"
+
+
+BOOLEAN_VALUES = {
+    str(value) for value in BooleanField.TRUE_VALUES | BooleanField.FALSE_VALUES
+}
+
+
+def _check_boolean(field, value):
+    if value.lower() not in BOOLEAN_VALUES:
+        return "Must be a valid boolean."
+
+
+def parse_open_at(value):
+    """(day index, time) of a `<weekday>T<HH:MM>` value, or None if invalid."""
+    day, _, clock = value.partition("T")
+    try:
+        time_of_day = parse_time(clock)
+    except ValueError:
+        time_of_day = None
+    if day.lower() not in DAY_BITS or time_of_day is None:
+        return None
+    return DAYS_OF_WEEK.index(day.lower()), time_of_day
+
+
+def _check_open_at(field, value):
+    if parse_open_at(value) is None:
+        return (
+            f"Expected <weekday>T<HH:MM> with a weekday from {DAYS_OF_WEEK}, "
+            "for example samstagT19:30"
+        )
+
+
+class StoreFilter(WeekdayFilterSet, BaseFilterValidationMixin):
+    name = IndexedCharFilter(lookup_expr="icontains", search_column="name")
+    city = IndexedCharFilter(lookup_expr="icontains", search_column="city")
+    address = IndexedCharFilter(lookup_expr="icontains", search_column="address")
     state_choices = [(k, k + ": " + v) for k, v in Store.STATES.items()]
     state_choices.sort(key=lambda x: x[0])
-    state_abbrv = ChoiceFilter(choices=state_choices, lookup_expr="icontains")
+    state_abbrv = ChoiceFilter(choices=state_choices, lookup_expr="exact")
     plz = CharFilter(lookup_expr="exact")
 
     # Copied from ManagersFilter pattern
@@ -201,11 +370,15 @@ class StoreFilter(FilterSet, BaseFilterValidationMixin):
         lookup_expr="exact",
         validators=[MinValueValidator(1, message="Invalid owner ID")],
     )
-    owner_first_name = CharFilter(
-        field_name="owner_id__first_name", lookup_expr="icontains"
+    owner_first_name = IndexedCharFilter(
+        field_name="owner_id__first_name",
+        lookup_expr="icontains",
+        search_column="owner",
     )
-    owner_last_name = CharFilter(
-        field_name="owner_id__last_name", lookup_expr="icontains"
+    owner_last_name = IndexedCharFilter(
+        field_name="owner_id__last_name",
+        lookup_expr="icontains",
+        search_column="owner",
     )
 
     # From ManagersFilter
@@ -213,29 +386,48 @@ class StoreFilter(FilterSet, BaseFilterValidationMixin):
         lookup_expr="exact",
         validators=[MinValueValidator(1, message="Invalid manager ID")],
     )
-    manager_first_name = CharFilter(
-        field_name="manager_ids__first_name", lookup_expr="icontains"
+    manager_first_name = IndexedCharFilter(
+        field_name="manager_ids__first_name",
+        lookup_expr="icontains",
+        distinct=True,
+        search_column="managers",
     )
-    manager_last_name = CharFilter(
-        field_name="manager_ids__last_name", lookup_expr="icontains"
+    manager_last_name = IndexedCharFilter(
+        field_name="manager_ids__last_name",
+        lookup_expr="icontains",
+        distinct=True,
+        search_column="managers",
     )
 
     # From HoursFilter
     opening_time = TimeFilter()
-    opening_time_lte = TimeFilter(field_name="opening_time", lookup_expr="lte")
-    opening_time_gte = TimeFilter(field_name="opening_time", lookup_expr="gte")
+    opening_time_lte = IndexedTimeFilter(field_name="opening_time", lookup_expr="lte")
+    opening_time_gte = IndexedTimeFilter(field_name="opening_time", lookup_expr="gte")
     closing_time = TimeFilter()
-    closing_time_lte = TimeFilter(field_name="closing_time", lookup_expr="lte")
-    closing_time_gte = TimeFilter(field_name="closing_time", lookup_expr="gte")
-
-    # From DaysFilter
-    montag = BooleanFilter()
-    dienstag = BooleanFilter()
-    mittwoch = BooleanFilter()
-    donnerstag = BooleanFilter()
-    freitag = BooleanFilter()
-    samstag = BooleanFilter()
-    sonntag = BooleanFilter()
+    closing_time_lte = IndexedTimeFilter(field_name="closing_time", lookup_expr="lte")
+    closing_time_gte = IndexedTimeFilter(field_name="closing_time", lookup_expr="gte")
+
+    # Day filters come from WeekdayFilterSet
+
+    # Ranked substring search over name, city, address, owner and managers.
+    # An explicit `ordering` replaces the ranking.
+    search = CharFilter(method="filter_search")
+
+    # Stores open at a time of the week, or right now in settings.TIME_ZONE.
+    open_at = CharFilter(method="filter_open_at")
+    open_now = BooleanFilter(method="filter_open_now")
+
+    value_checks = {
+        "name": ((FIELD, _check_not_blank),),
+        "city": ((FIELD, _check_not_blank),),
+        "address": ((FIELD, _check_not_blank), (FIELD, _check_address)),
+        "state_abbrv": ((FIELD, _check_not_blank), (FIELD, _check_state_abbrv)),
+        "plz": ((FIELD, _check_not_blank), (FIELD, _check_plz)),
+        "search": ((FIELD, _check_not_blank),),
+        "open_at": ((FIELD, _check_open_at),),
+        "open_now": ((FIELD, _check_boolean),),
+        **{day: ((FIELD, _check_boolean),) for day in DAYS_OF_WEEK},
+    }
 
     ordering = OrderingFilter(
         fields=(
@@ -251,6 +443,8 @@ class StoreFilter(FilterSet, BaseFilterValidationMixin):
         )
     )
 
+    serializer_class = StoreSerializer
+
     class Meta:
         model = Store
 
@@ -282,27 +476,46 @@ class StoreFilter(FilterSet, BaseFilterValidationMixin):
         ]
 
     def filter_queryset(self, queryset):
-        params = self.request.query_params
-        if self.request.method == "GET":
-            non_page_params = {
-                k for k in params.keys() if k not in {"page", "page_size"}
-            }
-            if non_page_params:
-                self.validate_filters(params)
+        if self.request.method in {"GET", "PATCH"}:
+            self.validate_filters(self.request.query_params)
         return super().filter_queryset(queryset)
 
-    def validate_filters(self, params):
-        allowed_params = self.filters.keys()
-        allowed_params = self._add_default_params(self.filters.keys())
+    def filter_search(self, queryset, name, value):
+        return search_stores(queryset, value)
 
-        self._base_validation(params, allowed_params)
-        self._validate_names(params)
-        serializer_params = {
-            k: v for k, v in params.items() if k not in self._extra_allowed_params
-        }
+    def filter_open_at(self, queryset, name, value):
+        day_index, time_of_day = parse_open_at(value)
+        minute = week_minute(day_index, time_of_day)
+        return queryset.filter(pk__in=StoreOpenInterval.stores_open_at(minute))
 
-        serializer = StoreSerializer(
-            data=serializer_params, context={"request": self.request}
-        )
+    def filter_open_now(self, queryset, name, value):
+        now = timezone.localtime(timezone.now(), timezone.get_default_timezone())
+        open_ids = StoreOpenInterval.stores_open_at(week_minute(now.weekday(), now))
+        if value:
+            return queryset.filter(pk__in=open_ids)
+        return queryset.exclude(pk__in=open_ids)
 
-        serializer.is_valid(raise_exception=True)
+    def validate_filters(self, params):
+        if not super().validate_filters(params):
+            return False
+        self._check_times(params)
+        self._check_owner_exists(params)
+        return True
+
+    def _check_times(self, params):
+        try:
+            opening_time = parse_time(params.get("opening_time", ""))
+            closing_time = parse_time(params.get("closing_time", ""))
+        except ValueError:
+            return
+        if opening_time and closing_time and opening_time >= closing_time:
+            raise ValidationError(
+                {"closing_time": ["Closing time must be later than opening time"]}
+            )
+
+    def _check_owner_exists(self, params):
+        owner_id = params.get("owner_id", "")
+        if owner_id.isdigit() and not CustomUser.objects.filter(pk=owner_id).exists():
+            raise ValidationError(
+                {"owner_id": [f'Invalid pk "{owner_id}" - object does not exist.']}
+            )
@@ -0,0 +1,50 @@
+"""
+Side-loaded users for the `include` parameter of the store endpoints.
+
+`include=owner`, `include=managers` or `include=owner,managers` adds an `included` section with the users of the returned stores to a list or detail response: `{"users": [{"id": ..., "first_name": ..., "last_name": ..., "email": ...}, ...]}`. Every user appears once, ordered by id, however many stores they own or manage. The users of a page are read with one query, which selects the owners and managers of its stores in subqueries.
+"""
+
+from django.db.models import Q
+from rest_framework.exceptions import ValidationError
+from users.models import CustomUser
+from ..models import Store
+
+INCLUDE_PARAM = "include"
+INCLUDE_RELATIONS = ("owner", "managers")
+INCLUDED_USER_FIELDS = ("id", "first_name", "last_name", "email")
+
+
+def check_include(field, value):
+    names = [name.strip() for name in value.split(",") if name.strip()]
+    unknown = [name for name in names if name not in INCLUDE_RELATIONS]
+    if unknown or not names:
+        return (
+            f"Invalid include: {', '.join(unknown)}. "
+            f"Must be among: {', '.join(INCLUDE_RELATIONS)}"
+        )
+
+
+def parse_include(params):
+    """The relations requested by `params`, in INCLUDE_RELATIONS order."""
+    value = params.get(INCLUDE_PARAM)
+    if value is None:
+        return ()
+    message = check_include(INCLUDE_PARAM, value)
+    if message is not None:
+        raise ValidationError({INCLUDE_PARAM: [message]})
+    names = {name.strip() for name in value.split(",")}
+    return tuple(name for name in INCLUDE_RELATIONS if name in names)
+
+
+def included_users(store_ids, relations):
+    """The owners and/or managers of `store_ids` as dicts, ordered by id."""
+    users = Q(pk__in=[])
+    if "owner" in relations:
+        owners = Store.objects.filter(pk__in=store_ids).values("owner_id")
+        users |= Q(pk__in=owners)
+    if "managers" in relations:
+        Through = Store.manager_ids.through
+        managers = Through.objects.filter(store_id__in=store_ids)
+        users |= Q(pk__in=managers.values("customuser_id"))
+    queryset = CustomUser.objects.filter(users).order_by("id")
+    return list(queryset.values(*INCLUDED_USER_FIELDS))
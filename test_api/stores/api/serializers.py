@@ -1,4 +1,7 @@
 from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS
+from test_api.timing import TimedSerializerMixin
+from ..membership import MANAGER_OPERATIONS, TOGGLE, update_managers
 from ..models import Store, DAYS_OF_WEEK
 from users.models import CustomUser
 
@@ -46,10 +49,67 @@ class BaseCheckMixin:
                     )
 
 
-class StoreSerializer(serializers.ModelSerializer, BaseCheckMixin):
-    days_of_operation = serializers.SerializerMethodField()
+def user_pks(values):
+    """The values that can be user primary keys, as ints."""
+    pks = set()
+    for value in values:
+        if isinstance(value, int) and not isinstance(value, bool):
+            pks.add(value)
+        elif isinstance(value, str) and value.isdigit():
+            pks.add(int(value))
+    return pks
+
+
+class UserManyRelatedField(serializers.ManyRelatedField):
+    """Loads the users of a list of primary keys with one query."""
+
+    def to_internal_value(self, data):
+        child = self.child_relation
+        if child.context.get("users_by_id") is None and isinstance(data, list):
+            users = child.get_queryset().filter(pk__in=user_pks(data))
+            child.preloaded_users = {user.pk: user for user in users}
+        try:
+            return super().to_internal_value(data)
+        finally:
+            child.preloaded_users = None
+
+
+class UserPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    """Reads users from context["users_by_id"] when a bulk request preloaded them.
+
+    With many=True the users of the list are preloaded by UserManyRelatedField.
+    """
+
+    preloaded_users = None
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {"child_relation": cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return UserManyRelatedField(**list_kwargs)
+
+    def to_internal_value(self, data):
+        users_by_id = self.context.get("users_by_id", self.preloaded_users)
+        if users_by_id is None:
+            return super().to_internal_value(data)
+        try:
+            if isinstance(data, (bool, float)):
+                raise TypeError
+            return users_by_id[int(data)]
+        except KeyError:
+            self.fail("does_not_exist", pk_value=data)
+        except (TypeError, ValueError):
+            self.fail("incorrect_type", data_type=type(data).__name__)
+
+
+class StoreSerializer(
+    TimedSerializerMixin, serializers.ModelSerializer, BaseCheckMixin
+):
+    days_of_operation = serializers.CharField(read_only=True)
     owner = serializers.SerializerMethodField()
-    owner_id = serializers.PrimaryKeyRelatedField(
+    owner_id = UserPrimaryKeyRelatedField(
         queryset=CustomUser.objects.all(), required=False
     )
     managers = serializers.SerializerMethodField()
@@ -69,7 +129,7 @@ class StoreSerializer(serializers.ModelSerializer, BaseCheckMixin):
     freitag = serializers.BooleanField(required=False)
     samstag = serializers.BooleanField(required=False)
     sonntag = serializers.BooleanField(required=False)
-    manager_ids = serializers.PrimaryKeyRelatedField(
+    manager_ids = UserPrimaryKeyRelatedField(
         queryset=CustomUser.objects.all(), many=True, required=False
     )
 
@@ -77,7 +137,13 @@ class StoreSerializer(serializers.ModelSerializer, BaseCheckMixin):
         model = Store
         raise_unknown_fields = True
         include = ["days_of_operation"]
-        fields = "__all__"
+        exclude = [
+            "days_mask",
+            "relations_version",
+            "relations_modified_at",
+            "location",
+            "state",
+        ]
         write_only_fields = [
             "manger_ids",
             "montag",
@@ -89,9 +155,6 @@ class StoreSerializer(serializers.ModelSerializer, BaseCheckMixin):
             "sonntag",
         ]
 
-    def get_days_of_operation(self, obj):
-        return obj.days_open
-
     def get_owner(self, obj):
         return str(obj.owner_id)
 
@@ -99,13 +162,11 @@ class StoreSerializer(serializers.ModelSerializer, BaseCheckMixin):
         return [str(mng) for mng in obj.manager_ids.all()]
 
     def update(self, instance, validated_data):
-        managers_data = validated_data.pop("manager_ids", [])
-        old_managers = [mng.id for mng in instance.manager_ids.all()]
-        add_managers = [mng.id for mng in managers_data if mng.id not in old_managers]
-        remove_managers = [mng.id for mng in managers_data if mng.id in old_managers]
+        # Selecting a user that already is a manager removes them.
+        managers_data = validated_data.pop("manager_ids", None)
         instance = super().update(instance, validated_data)
-        instance.manager_ids.add(*add_managers)
-        instance.manager_ids.remove(*remove_managers)
+        if managers_data:
+            update_managers(instance, [mng.pk for mng in managers_data], TOGGLE)
         return instance
 
     def to_internal_value(self, data):
@@ -156,12 +217,12 @@ class StoreSerializer(serializers.ModelSerializer, BaseCheckMixin):
         return data
 
 
-class DaysSerializer(serializers.ModelSerializer):
+class DaysSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     id = serializers.IntegerField(read_only=True, required=False)
     name = serializers.CharField(read_only=True, required=False)
     owner = serializers.SerializerMethodField(required=False)
     managers = serializers.SerializerMethodField(required=False)
-    days_of_operation = serializers.SerializerMethodField(required=False)
+    days_of_operation = serializers.CharField(read_only=True)
     montag = serializers.BooleanField(required=False)
     dienstag = serializers.BooleanField(required=False)
     mittwoch = serializers.BooleanField(required=False)
@@ -194,9 +255,6 @@ class DaysSerializer(serializers.ModelSerializer):
     def get_managers(self, obj):
         return [str(mng) for mng in obj.manager_ids.all()]
 
-    def get_days_of_operation(self, obj):
-        return obj.days_open
-
     def check_unknown_fields(self, data):
         # Get the known fields from the serializer
         known_fields = set(self.fields.keys())
@@ -214,12 +272,14 @@ class DaysSerializer(serializers.ModelSerializer):
         return super().to_internal_value(data)
 
 
-class HoursSerializer(serializers.ModelSerializer, BaseCheckMixin):
+class HoursSerializer(
+    TimedSerializerMixin, serializers.ModelSerializer, BaseCheckMixin
+):
     id = serializers.IntegerField(read_only=True, required=False)
     name = serializers.CharField(read_only=True, required=False)
     owner = serializers.SerializerMethodField()
     managers = serializers.SerializerMethodField()
-    days_of_operation = serializers.SerializerMethodField()
+    days_of_operation = serializers.CharField(read_only=True)
     opening_time = serializers.TimeField(required=False)
     closing_time = serializers.TimeField(required=False)
 
@@ -242,9 +302,6 @@ class HoursSerializer(serializers.ModelSerializer, BaseCheckMixin):
     def get_managers(self, obj):
         return [str(mng) for mng in obj.manager_ids.all()]
 
-    def get_days_of_operation(self, obj):
-        return obj.days_open
-
     def validate(self, data):
         data = super().validate(data)
         opening_time = data.get("opening_time")
@@ -260,15 +317,20 @@ class HoursSerializer(serializers.ModelSerializer, BaseCheckMixin):
         return super().to_internal_value(data)
 
 
-class ManagersSerializer(serializers.ModelSerializer, BaseCheckMixin):
+class ManagersSerializer(
+    TimedSerializerMixin, serializers.ModelSerializer, BaseCheckMixin
+):
     id = serializers.IntegerField(read_only=True, required=False)
     name = serializers.CharField(read_only=True, required=False)
     owner = serializers.SerializerMethodField()
     managers = serializers.SerializerMethodField()
-    days_of_operation = serializers.SerializerMethodField()
-    manager_ids = serializers.PrimaryKeyRelatedField(
+    days_of_operation = serializers.CharField(read_only=True)
+    manager_ids = UserPrimaryKeyRelatedField(
         queryset=CustomUser.objects.all(), many=True, required=False
     )
+    operation = serializers.ChoiceField(
+        choices=MANAGER_OPERATIONS, default=TOGGLE, write_only=True
+    )
 
     class Meta:
         model = Store
@@ -278,6 +340,7 @@ class ManagersSerializer(serializers.ModelSerializer, BaseCheckMixin):
             "owner",
             "managers",
             "manager_ids",
+            "operation",
             "days_of_operation",
         ]
         raise_on_validation_error = True
@@ -288,17 +351,12 @@ class ManagersSerializer(serializers.ModelSerializer, BaseCheckMixin):
     def get_managers(self, obj):
         return [str(mng) for mng in obj.manager_ids.all()]
 
-    def get_days_of_operation(self, obj):
-        return obj.days_open
-
     def update(self, instance, validated_data):
-        managers_data = validated_data.pop("manager_ids", [])
-        old_managers = [mng.id for mng in instance.manager_ids.all()]
-        add_managers = [mng.id for mng in managers_data if mng.id not in old_managers]
-        remove_managers = [mng.id for mng in managers_data if mng.id in old_managers]
+        managers_data = validated_data.pop("manager_ids", None)
+        operation = validated_data.pop("operation", TOGGLE)
         instance = super().update(instance, validated_data)
-        instance.manager_ids.add(*add_managers)
-        instance.manager_ids.remove(*remove_managers)
+        if managers_data is not None:
+            update_managers(instance, [mng.pk for mng in managers_data], operation)
         return instance
 
     def to_internal_value(self, data):
@@ -0,0 +1,79 @@
+"""
+Grouped store counts for the `/stores/stats/` endpoint.
+
+The `store_stats` function counts the stores of a filtered queryset by state, city, days of operation, opening hour and closing hour with a single statement: a UNION ALL of one GROUP BY per dimension. Querysets whose filters join managers are counted over their distinct store ids. Only (dimension, key, count) rows are read, so no `Store` instances are built. Weekday counts are rolled up from the at most 128 `days_mask` groups.
+"""
+
+from django.db.models import CharField, Count, F, Value
+from django.db.models.functions import Cast, ExtractHour
+from ..models import DAY_BITS, DAYS_OF_WEEK, Store
+
+STATS_DIMENSIONS = {
+    "state": F("state_abbrv"),
+    "city": F("city"),
+    "days": F("days_mask"),
+    "opening_hour": ExtractHour("opening_time"),
+    "closing_hour": ExtractHour("closing_time"),
+}
+
+
+def _grouped_counts(queryset, dimension, expression):
+    return (
+        queryset.annotate(
+            stat_dimension=Value(dimension, output_field=CharField()),
+            stat_key=Cast(expression, output_field=CharField()),
+        )
+        .values("stat_dimension", "stat_key")
+        .annotate(stat_count=Count("pk"))
+        .order_by()
+    )
+
+
+def grouped_counts(queryset):
+    """{dimension: {key: count}} for every dimension in STATS_DIMENSIONS."""
+    queryset = queryset.select_related(None).prefetch_related(None).order_by()
+    if queryset.query.distinct:
+        # Filters joining managers repeat stores, and DISTINCT would apply to
+        # the groups rather than to the counted rows.
+        queryset = Store.objects.filter(pk__in=queryset.values("pk"))
+    parts = [
+        _grouped_counts(queryset, dimension, expression)
+        for dimension, expression in STATS_DIMENSIONS.items()
+    ]
+    counts = {dimension: {} for dimension in STATS_DIMENSIONS}
+    for row in parts[0].union(*parts[1:], all=True):
+        counts[row["stat_dimension"]][row["stat_key"]] = row["stat_count"]
+    return counts
+
+
+def _by_count(items, name):
+    return sorted(items, key=lambda item: (-item["count"], item[name]))
+
+
+def _hours(counts):
+    return sorted(
+        ({"hour": int(hour), "count": count} for hour, count in counts.items()),
+        key=lambda item: item["hour"],
+    )
+
+
+def store_stats(queryset):
+    counts = grouped_counts(queryset)
+    weekdays = dict.fromkeys(DAYS_OF_WEEK, 0)
+    for mask, count in counts["days"].items():
+        for day, bit in DAY_BITS.items():
+            if int(mask) & bit:
+                weekdays[day] += count
+    states = [
+        {"state_abbrv": abbrv, "state": Store.STATES.get(abbrv), "count": count}
+        for abbrv, count in counts["state"].items()
+    ]
+    cities = [{"city": city, "count": count} for city, count in counts["city"].items()]
+    return {
+        "total": sum(counts["state"].values()),
+        "by_state": _by_count(states, "state_abbrv"),
+        "by_city": _by_count(cities, "city"),
+        "by_weekday": weekdays,
+        "by_opening_hour": _hours(counts["opening_hour"]),
+        "by_closing_hour": _hours(counts["closing_hour"]),
+    }
@@ -4,14 +4,16 @@ from .views import (
     StoreDaysView,
     StoreHoursView,
 )
+from .async_views import with_async_reads
 from rest_framework.routers import DefaultRouter
+from django.conf import settings
 from django.urls import path, include
 
 router = DefaultRouter()
 router.register("stores", StoreViewSet, basename="stores")
 
-urlpatterns = [
-    path("", include(router.urls)),
+store_urlpatterns = router.urls
+view_urlpatterns = [
     path("days-list/", StoreDaysView.as_view(), name="store-days-list"),
     path("days-detail/<int:pk>/", StoreDaysView.as_view(), name="store-days-detail"),
     path("hours-list/", StoreHoursView.as_view(), name="store-hours-list"),
@@ -23,3 +25,9 @@ urlpatterns = [
         name="store-managers-detail",
     ),
 ]
+
+if settings.STORES_ASYNC_READS:
+    store_urlpatterns = with_async_reads(store_urlpatterns)
+    view_urlpatterns = with_async_reads(view_urlpatterns)
+
+urlpatterns = [path("", include(store_urlpatterns)), *view_urlpatterns]
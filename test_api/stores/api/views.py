@@ -1,20 +1,40 @@
 """
 This module contains the API views for the stores application.
 
-The `StoreViewSet` class is a ModelViewSet that provides CRUD operations for the `Store` model. It uses the `StoreSerializer` to serialize the data, and the `StoreFilter` to filter the queryset. The `StoreViewsPagination` class is used to paginate the results.
+The `StoreViewSet` class is a ModelViewSet that provides CRUD operations for the `Store` model. It uses the `StoreSerializer` to serialize the data, and the `StoreFilter` to filter the queryset. The `StoreViewsPagination` class is used to paginate the results; clients can opt in to cursor pagination with `pagination=cursor`. The `search` parameter returns the stores whose name, city, address, owner or managers contain every search term, best matches first; matching ignores case and umlaut spelling ("Bäcker" finds "Baecker"). The `open_at` (`<weekday>T<HH:MM>`, e.g. `samstagT19:30`) and `open_now` parameters return the stores open at that time of the week or right now in `TIME_ZONE`.
+
+Its `bulk_create` action (`POST /stores/bulk/`) creates a list of stores at once, reporting the created ids and the validation errors of each rejected item. Its `export` action (`GET /stores/export/csv/` or `/stores/export/ndjson/`) streams every store matching the `StoreFilter` parameters without pagination. Its `stats` action (`GET /stores/stats/`) returns the number of matching stores per state, city, weekday, opening hour and closing hour, computed in the database and cached like list responses.
 
 The `StoreDaysView` class is a GenericAPIView that provides GET, PUT, and PATCH operations for the days of operation of a store. It uses the `DaysSerializer` to serialize the data, and the `DaysFilter` to filter the queryset.
 
 The `StoreHoursView` class is a GenericAPIView that provides GET, PUT, and PATCH operations for the hours of operation of a store. It uses the `HoursSerializer` to serialize the data, and the `HoursFilter` to filter the queryset.
 
-The `StoreManagersView` class is a GenericAPIView that provides GET, PUT, and PATCH operations for the managers of a store. It uses the `ManagersSerializer` to serialize the data, and the `ManagersFilter` to filter the queryset.
+`PATCH` on the days and hours list URLs updates many stores at once through the `BulkScheduleMixin` class. Stores are selected by a list of `ids` in the body, by the view's filter parameters in the query string, or both.
+
+The `StoreManagersView` class is a GenericAPIView that provides GET, PUT, and PATCH operations for the managers of a store. It uses the `ManagersSerializer` to serialize the data, and the `ManagersFilter` to filter the queryset. Updates toggle the given `manager_ids` by default; an `operation` of `add`, `remove` or `replace` applies that change instead, with set-based writes through `stores.membership.update_managers`.
+
+The `CachedListMixin` class serves repeated list requests from a per-user response cache. Entries are keyed on the user's store generation, so any change to a store the user can see makes them unreachable.
+
+The `ConditionalGetMixin` class adds `ETag` and `Last-Modified` headers to list and detail responses and answers matching `If-None-Match` / `If-Modified-Since` requests with a 304 before serializing. List pages are read and serialized by the view's compiled serializer (`stores.api.compiled`) unless `STORES_COMPILED_SERIALIZERS` is off.
+
+The `StoreFieldsetMixin` class lets GET requests of all store views pick fields with `fields=` or drop them with `exclude=` (see `test_api.fieldsets`). Leaving out `owner` skips the owner join and leaving out `managers` and `manager_ids` skips the manager query.
+
+The `include` parameter of all store views (`owner`, `managers` or both) adds the users of the returned stores as an `included` section of list and detail responses, read with one query per response (see `stores.api.included`).
+
+The `AsyncReadMixin` class gives the store views async list and detail handlers with the same responses, which `stores.api.async_views` serves when the project runs under ASGI.
 
-The `get_user_stores` function is a helper function that returns the stores that the user has access to, based on their role (superuser or manager).
+The `get_user_stores` function is a helper function that returns the stores that the user has access to, based on their role (superuser or manager). Access is looked up in the materialized `StoreAccess` table.
+
+The `with_store_relations` function is a helper function that joins the owner and prefetches the managers of a store queryset, so that serializing a page of stores runs a constant number of queries.
 
 The `is_list_view` function is a helper function that checks if the current request is a list view.
+
+The `add_message` function is a helper function that adds the instructions message to a response that has a body.
 """
 
+from asgiref.sync import sync_to_async
 from rest_framework import status
+from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.viewsets import ModelViewSet
 from rest_framework.generics import GenericAPIView
@@ -25,10 +45,34 @@ from rest_framework.mixins import (
 )
 
 from rest_framework.permissions import IsAuthenticated, AllowAny
-from rest_framework.authentication import TokenAuthentication, SessionAuthentication
-from rest_framework.pagination import PageNumberPagination
-from django.db.models import Q
-from ..models import Store
+from rest_framework.authentication import SessionAuthentication
+from test_api.fast_json import JSONRenderer
+from test_api.fieldsets import FIELDSET_PARAMS, SparseFieldsetMixin
+from test_api.pagination import OptInKeysetPagination, PAGINATION_PARAMS
+from test_api.timing import phase
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ValidationError
+from django.http import Http404
+from django.utils.http import parse_http_date_safe
+from django.db.models import Q, Prefetch
+from users.api.authentication import CachedTokenAuthentication
+from users.models import CustomUser
+from ..cache import canonical_params, list_cache_key, list_cache_timeout
+from ..models import Store, StoreAccess
+from .async_views import authenticate_async
+from .compiled import compiled_serializer
+from .included import INCLUDE_PARAM, included_users, parse_include
+from .bulk import bulk_create_stores, bulk_update_days, bulk_update_hours
+from .export import CSVExportRenderer, NDJSONExportRenderer, stream_stores
+from .stats import store_stats
+from .conditional import (
+    last_modified,
+    make_etag,
+    not_modified_response,
+    set_validators,
+    store_version,
+)
 from .filters import StoreFilter, DaysFilter, HoursFilter, ManagersFilter
 from .serializers import (
     StoreSerializer,
@@ -38,43 +82,317 @@ from .serializers import (
 )
 
 
-class StoreViewsPagination(PageNumberPagination):
+# Query parameters that shape the response instead of selecting stores.
+RESPONSE_PARAMS = FIELDSET_PARAMS | {INCLUDE_PARAM}
+
+
+class StoreViewsPagination(OptInKeysetPagination):
     page_size = 3
     page_size_query_param = "page_size"
     max_page_size = 100
 
 
-class StoreViewSet(ModelViewSet):
+class CachedListMixin:
+    def list(self, request, *args, **kwargs):
+        key = self.get_list_cache_key(request)
+        response = self.cached_list_response(request, key)
+        if response is None:
+            response = super().list(request, *args, **kwargs)
+            self.cache_list_response(key, response)
+        return response
+
+    def get_list_cache_key(self, request):
+        return list_cache_key(request, type(self).__name__, self.filterset_class)
+
+    def cached_list_response(self, request, key):
+        cached = cache.get(key)
+        if cached is None:
+            return None
+        data, etag, modified = cached
+        response = not_modified_response(request, etag, modified)
+        if response is not None:
+            return response
+        return set_validators(Response(data), etag, modified)
+
+    def cache_list_response(self, key, response):
+        if response.status_code == status.HTTP_200_OK:
+            modified = parse_http_date_safe(response.get("Last-Modified"))
+            cached = (response.data, response.get("ETag"), modified)
+            cache.set(key, cached, list_cache_timeout())
+
+
+class ConditionalGetMixin:
+    def list(self, request, *args, **kwargs):
+        stores, paginated = self.get_list_page()
+        return self.list_response(
+            request, stores, paginated, self.get_included(stores)
+        )
+
+    def get_list_page(self):
+        """The stores of the requested page, and whether the list is paginated.
+
+        With a compiled serializer the stores are rows of its columns.
+        """
+        queryset = self.filter_queryset(self.get_queryset())
+        compiled = self.get_compiled_serializer()
+        if compiled is not None:
+            queryset = compiled.rows(queryset)
+        page = self.paginate_queryset(queryset)
+        stores = page if page is not None else list(queryset)
+        if compiled is not None:
+            stores = compiled.load(stores)
+        return stores, page is not None
+
+    def get_compiled_serializer(self):
+        if not settings.STORES_COMPILED_SERIALIZERS:
+            return None
+        return compiled_serializer(self.get_serializer_class(), self.get_fieldset())
+
+    def get_included(self, stores):
+        """The side-loaded users of `stores`, or None without `include`."""
+        if self.request.method not in {"GET", "HEAD"}:
+            return None
+        relations = parse_include(self.request.query_params)
+        if not relations:
+            return None
+        return {"users": included_users([store.id for store in stores], relations)}
+
+    def list_response(self, request, stores, paginated, included=None):
+        etag = self.get_list_etag(request, stores, paginated)
+        modified = last_modified(stores)
+        response = not_modified_response(request, etag, modified)
+        if response is not None:
+            return response
+
+        compiled = self.get_compiled_serializer()
+        if compiled is not None:
+            with phase("serialize"):
+                data = compiled.data(stores)
+        else:
+            data = self.get_serializer(stores, many=True).data
+        if paginated:
+            response = self.get_paginated_response(data)
+        else:
+            response = Response(data)
+        if included is not None:
+            response.data["included"] = included
+        return set_validators(response, etag, modified)
+
+    def retrieve(self, request, *args, **kwargs):
+        instance = self.get_object()
+        return self.retrieve_response(
+            request, instance, self.get_included([instance])
+        )
+
+    def retrieve_response(self, request, instance, included=None):
+        fieldset = self.get_fieldset()
+        etag = make_etag(
+            type(self).__name__,
+            request.accepted_renderer.format,
+            sorted(fieldset) if fieldset is not None else None,
+            parse_include(request.query_params),
+            store_version(instance),
+        )
+        modified = last_modified([instance])
+        response = not_modified_response(request, etag, modified)
+        if response is not None:
+            return response
+        serializer = self.get_serializer(instance)
+        response = Response(serializer.data)
+        if included is not None:
+            response.data["included"] = included
+        return set_validators(response, etag, modified)
+
+    def get_list_etag(self, request, stores, paginated):
+        # An empty page response carries the count and links without results.
+        pagination = self.get_paginated_response([]).data if paginated else None
+        return make_etag(
+            type(self).__name__,
+            request.accepted_renderer.format,
+            canonical_params(request.query_params, self.filterset_class),
+            pagination,
+            [store_version(store) for store in stores],
+        )
+
+
+class StoreFieldsetMixin(SparseFieldsetMixin):
+    def prune_queryset(self, queryset, fieldset):
+        if "owner" not in fieldset:
+            queryset = queryset.select_related(None)
+        if not fieldset & {"managers", "manager_ids"}:
+            queryset = queryset.prefetch_related(None)
+        return queryset
+
+
+class AsyncReadMixin:
+    """Async GET handling for views served by `stores.api.async_views`.
+
+    List and detail requests run the same steps as the sync handlers, but the
+    user and the store are loaded with the async ORM. Filtering, pagination and
+    the list cache run through sync_to_async, like the async ORM itself.
+    `detail_message` and `list_message` are added to the responses as `get`
+    does.
+    """
+
+    detail_message = None
+    list_message = None
+
+    async def dispatch_async(self, request, *args, **kwargs):
+        self.args = args
+        self.kwargs = kwargs
+        request = self.initialize_request(request, *args, **kwargs)
+        self.request = request
+        self.headers = self.default_response_headers
+        try:
+            await authenticate_async(request)
+            self.initial(request, *args, **kwargs)
+            action = getattr(self, "action", None) or "get"
+            response = await getattr(self, f"{action}_async")(request, *args, **kwargs)
+        except Exception as exc:
+            response = self.handle_exception(exc)
+        self.response = self.finalize_response(request, response, *args, **kwargs)
+        return self.response
+
+    async def get_async(self, request, *args, **kwargs):
+        if kwargs.get("pk", None):
+            return await self.retrieve_async(request, *args, **kwargs)
+        return await self.list_async(request, *args, **kwargs)
+
+    async def list_async(self, request, *args, **kwargs):
+        key = await sync_to_async(self.get_list_cache_key)(request)
+        response = await sync_to_async(self.cached_list_response)(request, key)
+        if response is None:
+            stores, paginated = await sync_to_async(self.get_list_page)()
+            included = None
+            if INCLUDE_PARAM in request.query_params:
+                included = await sync_to_async(self.get_included)(stores)
+            response = self.list_response(request, stores, paginated, included)
+            await sync_to_async(self.cache_list_response)(key, response)
+        if self.list_message is None:
+            return response
+        return add_message(response, self.list_message)
+
+    async def retrieve_async(self, request, *args, **kwargs):
+        instance = await self.get_object_async()
+        included = None
+        if INCLUDE_PARAM in request.query_params:
+            included = await sync_to_async(self.get_included)([instance])
+        response = self.retrieve_response(request, instance, included)
+        if self.detail_message is None:
+            return response
+        return add_message(response, self.detail_message)
+
+    async def get_object_async(self):
+        queryset = await sync_to_async(self.filter_queryset)(self.get_queryset())
+        lookup_url_kwarg = self.lookup_url_kwarg or self.lookup_field
+        lookup = {self.lookup_field: self.kwargs[lookup_url_kwarg]}
+        try:
+            obj = await queryset.aget(**lookup)
+        except (queryset.model.DoesNotExist, TypeError, ValueError, ValidationError):
+            raise Http404
+        self.check_object_permissions(self.request, obj)
+        return obj
+
+
+class BulkScheduleMixin:
+    bulk_update_function = None
+
+    def bulk_partial_update(self, request, *args, **kwargs):
+        if not isinstance(request.data, dict):
+            return Response(
+                {"detail": "Expected an object."}, status=status.HTTP_400_BAD_REQUEST
+            )
+        values = dict(request.data.items())
+        ids = values.pop("ids", None)
+        has_filter = set(request.query_params) - PAGINATION_PARAMS - RESPONSE_PARAMS
+        if ids is None and not has_filter:
+            msg = "Select stores with a list of ids or with filter parameters."
+            return Response({"detail": msg}, status=status.HTTP_400_BAD_REQUEST)
+
+        queryset = self.filter_queryset(self.get_queryset())
+        serializer = self.get_serializer(data=values, partial=True)
+        serializer.is_valid(raise_exception=True)
+        updated = self.bulk_update_function(queryset, ids, serializer.validated_data)
+        return Response({"updated": len(updated), "ids": updated})
+
+
+class StoreViewSet(
+    AsyncReadMixin,
+    StoreFieldsetMixin,
+    CachedListMixin,
+    ConditionalGetMixin,
+    ModelViewSet,
+):
     serializer_class = StoreSerializer
     permission_classes = [IsAuthenticated]
-    authentication_classes = [TokenAuthentication, SessionAuthentication]
+    authentication_classes = [CachedTokenAuthentication, SessionAuthentication]
     pagination_class = StoreViewsPagination
     filterset_class = StoreFilter
     http_method_names = ["get", "post", "put", "patch", "delete"]
+    detail_message = "Modify all aspects of a store by filling the relevant field."
+    list_message = "Create a store by filling the relevant fields."
 
     def get_queryset(self):
         return get_user_stores(self.request.user)
 
     def retrieve(self, request, *args, **kwargs):
         response = super().retrieve(request, *args, **kwargs)
-        msg = "Modify all aspects of a store by filling the relevant field."
-        response.data["message"] = msg
-        return response
+        return add_message(response, self.detail_message)
 
     def list(self, request, *args, **kwargs):
         response = super().list(request, *args, **kwargs)
-        msg = "Create a store by filling the relevant fields."
-        response.data["message"] = msg
-        return response
-
-
-class StoreDaysView(List, Retrieve, Update, GenericAPIView):
+        return add_message(response, self.list_message)
+
+    @action(detail=False, methods=["post"], url_path="bulk")
+    def bulk_create(self, request):
+        created, errors = bulk_create_stores(
+            request.data, self.get_serializer_context()
+        )
+        code = status.HTTP_201_CREATED if created else status.HTTP_400_BAD_REQUEST
+        return Response({"created": created, "errors": errors}, status=code)
+
+    @action(
+        detail=False,
+        methods=["get"],
+        url_path=r"export/(?P<export_format>csv|ndjson)",
+        renderer_classes=[JSONRenderer, CSVExportRenderer, NDJSONExportRenderer],
+    )
+    def export(self, request, export_format):
+        queryset = self.filter_queryset(self.get_queryset())
+        return stream_stores(queryset, export_format)
+
+    @action(detail=False, methods=["get"], url_path="stats")
+    def stats(self, request):
+        key = list_cache_key(request, "StoreStats", self.filterset_class)
+        data = cache.get(key)
+        if data is None:
+            data = store_stats(self.filter_queryset(self.get_queryset()))
+            cache.set(key, data, list_cache_timeout())
+        return Response(data)
+
+
+class StoreDaysView(
+    AsyncReadMixin,
+    StoreFieldsetMixin,
+    CachedListMixin,
+    ConditionalGetMixin,
+    BulkScheduleMixin,
+    List,
+    Retrieve,
+    Update,
+    GenericAPIView,
+):
     serializer_class = DaysSerializer
     permission_classes = [IsAuthenticated]
-    authentication_classes = [TokenAuthentication, SessionAuthentication]
+    authentication_classes = [CachedTokenAuthentication, SessionAuthentication]
     pagination_class = StoreViewsPagination
     filterset_class = DaysFilter
     http_method_names = ["get", "put", "patch"]
+    bulk_update_function = staticmethod(bulk_update_days)
+    detail_message = (
+        "Modify the days of operation by selecting or unselecting a given day."
+    )
+    list_message = "Select store to modify its days of operation."
 
     def get_queryset(self):
         return get_user_stores(self.request.user)
@@ -82,30 +400,36 @@ class StoreDaysView(List, Retrieve, Update, GenericAPIView):
     def get(self, request, *args, **kwargs):
         if kwargs.get("pk", None):
             response = self.retrieve(request, *args, **kwargs)
-            msg = (
-                "Modify the days of operation by selecting or unselecting a given day."
-            )
-            response.data["message"] = msg
-            return response
+            return add_message(response, self.detail_message)
 
         response = self.list(request, *args, **kwargs)
-        msg = "Select store to modify its days of operation."
-        response.data["message"] = msg
-        return response
+        return add_message(response, self.list_message)
 
     def patch(self, request, *args, **kwargs):
         if is_list_view(request):
-            return Response(status=status.HTTP_405_METHOD_NOT_ALLOWED)
+            return self.bulk_partial_update(request, *args, **kwargs)
         return self.partial_update(request, *args, **kwargs)
 
 
-class StoreHoursView(GenericAPIView, List, Retrieve, Update):
+class StoreHoursView(
+    AsyncReadMixin,
+    StoreFieldsetMixin,
+    CachedListMixin,
+    ConditionalGetMixin,
+    BulkScheduleMixin,
+    GenericAPIView,
+    List,
+    Retrieve,
+    Update,
+):
     serializer_class = HoursSerializer
     permission_classes = [IsAuthenticated]
-    authentication_classes = [TokenAuthentication, SessionAuthentication]
+    authentication_classes = [CachedTokenAuthentication, SessionAuthentication]
     pagination_class = StoreViewsPagination
     filterset_class = HoursFilter
     http_method_names = ["get", "put", "patch"]
+    bulk_update_function = staticmethod(bulk_update_hours)
+    detail_message = "Modify the hours of operation using the given fields."
 
     def get_queryset(self):
         return get_user_stores(self.request.user)
@@ -114,49 +438,56 @@ class StoreHoursView(GenericAPIView, List, Retrieve, Update):
         pk = kwargs.get("pk", None)
         if pk:
             response = self.retrieve(request, *args, **kwargs)
-            msg = "Modify the hours of operation using the given fields."
-            response.data["message"] = msg
-            return response
+            return add_message(response, self.detail_message)
         return self.list(request, *args, **kwargs)
 
     def put(self, request, *args, **kwargs):
         response = self.update(request, *args, **kwargs)
-        msg = "Modify the hours of operation using the given fields."
-        response.data["message"] = msg
+        response.data["message"] = self.detail_message
         return response
 
     def patch(self, request, *args, **kwargs):
         if is_list_view(request):
-            return Response(status=status.HTTP_405_METHOD_NOT)
+            return self.bulk_partial_update(request, *args, **kwargs)
         return self.partial_update(request, *args, **kwargs)
 
 
-class StoreManagersView(GenericAPIView, List, Retrieve, Update):
+class StoreManagersView(
+    AsyncReadMixin,
+    StoreFieldsetMixin,
+    CachedListMixin,
+    ConditionalGetMixin,
+    GenericAPIView,
+    List,
+    Retrieve,
+    Update,
+):
     serializer_class = ManagersSerializer
     permission_classes = [IsAuthenticated]
-    authentication_classes = [TokenAuthentication, SessionAuthentication]
+    authentication_classes = [CachedTokenAuthentication, SessionAuthentication]
     pagination_class = StoreViewsPagination
     filterset_class = ManagersFilter
     http_method_names = ["get", "put", "patch"]
+    detail_message = (
+        "Modify the managers of the store by selecting a given user."
+        " Selecting a user that is already a manager will remove their manager status."
+    )
 
     def get_queryset(self):
-        return Store.objects.filter(Q(owner_id=self.request.user))
+        return with_store_relations(
+            Store.objects.filter(Q(owner_id=self.request.user))
+        )
 
     def get(self, request, *args, **kwargs):
         pk = kwargs.get("pk", None)
         if pk:
             response = self.retrieve(request, *args, **kwargs)
-            msg = "Modify the managers of the store by selecting a given user."
-            msg += " Selecting a user that is already a manager will remove their manager status."
-            response.data["message"] = msg
-            return response
+            return add_message(response, self.detail_message)
         return self.list(request, *args, **kwargs)
 
     def put(self, request, *args, **kwargs):
         response = self.update(request, *args, **kwargs)
-        msg = "Modify the managers of the store by selecting a given user."
-        msg += " Selecting a user that is already a manager will remove their manager status."
-        response.data["message"] = msg
+        response.data["message"] = self.detail_message
         return response
 
     def patch(self, request, *args, **kwargs):
@@ -168,9 +499,31 @@ class StoreManagersView(GenericAPIView, List, Retrieve, Update):
 # Another approach would be to use a mixin class.
 def get_user_stores(user):
     if user.is_superuser:
-        return Store.objects.all()
-    return Store.objects.filter(Q(manager_ids__in=[user]) | Q(owner_id=user)).distinct()
+        return with_store_relations(Store.objects.all())
+    # StoreAccess holds one row per (user, store, role), so visibility is a
+    # single indexed semi-join and needs no DISTINCT.
+    access = StoreAccess.objects.filter(user=user).values("store_id")
+    return with_store_relations(Store.objects.filter(id__in=access))
+
+
+# Only the columns needed by CustomUser.__str__ are loaded for managers.
+MANAGER_STR_FIELDS = ("id", "first_name", "last_name")
+
+
+def with_store_relations(queryset):
+    # Ordered like the compiled serializers list managers.
+    managers = CustomUser.objects.only(*MANAGER_STR_FIELDS).order_by("id")
+    return queryset.select_related("owner_id").prefetch_related(
+        Prefetch("manager_ids", queryset=managers)
+    )
 
 
 def is_list_view(request):
     return "list" in request.path
+
+
+def add_message(response, msg):
+    # 304 and 412 responses to conditional requests have no body.
+    if response.status_code == status.HTTP_200_OK:
+        response.data["message"] = msg
+    return response
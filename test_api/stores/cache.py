@@ -0,0 +1,95 @@
+"""
+Generation counters and keys for the store list response cache.
+
+Every user has a generation counter, a `StoreListGeneration` row, that is
+bumped whenever a store they can see is saved or deleted or its managers
+change, and superusers share one. List responses are cached under the
+generation of the requesting user, so any change to a visible store makes
+older entries unreachable instead of having to find and delete them.
+
+The counters live in the database rather than in the cache: the cache may be
+local to a process, and a bump must reach every process serving the API. A
+bump is part of the transaction of the change, so no process sees the new
+data under the old generation after the commit.
+"""
+
+import hashlib
+from django.conf import settings
+from django.db.models import F
+from django.utils import timezone
+from django.utils.dateparse import parse_time
+from django_filters import BooleanFilter, TimeFilter
+from .models import StoreAccess, StoreListGeneration
+
+GENERATION_BATCH_SIZE = 500
+
+# Filters whose result changes with the clock. Keys of lists using them
+# include the current minute.
+CLOCK_PARAMS = {"open_now"}
+
+
+def batches(ids, size=GENERATION_BATCH_SIZE):
+    ids = list(ids)
+    for start in range(0, len(ids), size):
+        yield ids[start : start + size]
+
+
+def user_generation(user):
+    user_id = StoreListGeneration.SUPERUSERS if user.is_superuser else user.pk
+    generations = StoreListGeneration.objects.filter(user_id=user_id)
+    return generations.values_list("value", flat=True).first() or 0
+
+
+def bump_generations(store_ids, user_ids=()):
+    """Invalidate cached lists of the users of `store_ids` and of `user_ids`."""
+    user_ids = {user_id for user_id in user_ids if user_id is not None}
+    store_ids = [store_id for store_id in store_ids if store_id is not None]
+    for batch in batches(store_ids):
+        user_ids.update(
+            StoreAccess.objects.filter(store_id__in=batch).values_list(
+                "user_id", flat=True
+            )
+        )
+    user_ids.add(StoreListGeneration.SUPERUSERS)
+    # Rows are locked in id order, so concurrent bumps cannot deadlock.
+    for batch in batches(sorted(user_ids)):
+        StoreListGeneration.objects.bulk_create(
+            [StoreListGeneration(user_id=user_id) for user_id in batch],
+            ignore_conflicts=True,
+        )
+        StoreListGeneration.objects.filter(user_id__in=batch).update(
+            value=F("value") + 1
+        )
+
+
+def canonical_params(params, filterset_class=None):
+    """Sorted (key, value) pairs with booleans and times normalized."""
+    filters = getattr(filterset_class, "base_filters", {})
+    canonical = []
+    for key in sorted(params.keys()):
+        for value in sorted(params.getlist(key)):
+            filter_ = filters.get(key)
+            if isinstance(filter_, BooleanFilter):
+                value = value.lower()
+            elif isinstance(filter_, TimeFilter):
+                try:
+                    parsed = parse_time(value)
+                except ValueError:
+                    parsed = None
+                value = parsed.isoformat() if parsed else value
+            canonical.append((key, value))
+    return canonical
+
+
+def list_cache_key(request, view_name, filterset_class=None):
+    user = request.user
+    params = canonical_params(request.query_params, filterset_class)
+    if CLOCK_PARAMS & set(request.query_params):
+        params.append(("now", timezone.now().strftime("%Y-%m-%dT%H:%M")))
+    raw = repr((request.get_host(), request.path, params)).encode()
+    digest = hashlib.sha256(raw).hexdigest()
+    return f"stores:list:{view_name}:{user.pk}:{user_generation(user)}:{digest}"
+
+
+def list_cache_timeout():
+    return getattr(settings, "STORE_LIST_CACHE_TIMEOUT", 300)
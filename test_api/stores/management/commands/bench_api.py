@@ -0,0 +1,682 @@
+import json
+import logging
+import math
+import platform
+import re
+import sqlite3
+import subprocess
+import tempfile
+import time
+from collections import namedtuple
+from pathlib import Path
+from urllib.parse import urlencode
+import django
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, transaction
+from django.db.models import Count
+from django.test import Client, override_settings
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.authtoken.models import Token
+from stores.models import Store
+from test_api import load_data, timing
+
+User = get_user_model()
+
+SCENARIOS = ("uniform", "big_owner")
+# In the big_owner scenario one user owns this share of the stores, and each
+# of the heavy managers manages this share of them.
+BIG_OWNER_SHARE = 0.9
+HEAVY_MANAGERS = 3
+HEAVY_MANAGER_SHARE = 0.5
+SUPERUSER_EMAIL = "bench.admin@example.com"
+BIG_OWNER_EMAIL = "bench.owner@example.com"
+SIGNUP_EMAIL = "bench.signup@example.com"
+PERCENTILES = (50, 90, 99)
+SAVEPOINT_RE = re.compile(r"(RELEASE |ROLLBACK TO )?SAVEPOINT ")
+
+Case = namedtuple(
+    "Case",
+    "name method url_name kwargs params role body status max_requests",
+    defaults=(None, 200, None),
+)
+
+
+def parse_count(value):
+    """A number of stores such as 1000, 100k or 1m."""
+    multiplier = {"k": 1_000, "m": 1_000_000}.get(value[-1:].lower(), 1)
+    digits = value[:-1] if multiplier > 1 else value
+    try:
+        count = int(digits) * multiplier
+    except ValueError:
+        raise ValueError(f"Invalid store count: {value}")
+    if count < 1:
+        raise ValueError(f"Invalid store count: {value}")
+    return count
+
+
+def percentile(values, p):
+    """The nearest-rank `p`th percentile of sorted `values`."""
+    return values[max(0, math.ceil(p / 100 * len(values)) - 1)]
+
+
+def parse_server_timing(header):
+    """{metric: milliseconds} and the query count of a Server-Timing header."""
+    durations, queries = {}, None
+    for entry in filter(None, header.split(", ")):
+        name, *params = entry.split(";")
+        for param in params:
+            key, _, value = param.partition("=")
+            if key == "dur":
+                durations[name] = float(value)
+            elif key == "desc" and name == "db":
+                queries = int(value.strip('"').split()[0])
+    return durations, queries
+
+
+def revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"],
+            cwd=settings.BASE_DIR,
+            capture_output=True,
+            text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a benchmark database with a scenario of 1k to 1M stores, then "
+        "time every store and user endpoint with representative filters and "
+        "orderings and write latency percentiles and query counts as JSON. "
+        "Seeded databases are kept and reused; writes are rolled back."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--stores",
+            type=parse_count,
+            default="1k",
+            help="Number of stores, e.g. 1k, 100k or 1m.",
+        )
+        parser.add_argument("--scenario", choices=SCENARIOS, default="uniform")
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument(
+            "--workers",
+            type=int,
+            help="Processes generating the data, one per CPU by default.",
+        )
+        parser.add_argument("--requests", type=int, default=20)
+        parser.add_argument("--warmup", type=int, default=2)
+        parser.add_argument(
+            "--database",
+            help="SQLite file of the seeded database. Defaults to one per "
+            "scenario, size and seed in the temporary directory.",
+        )
+        parser.add_argument(
+            "--reseed", action="store_true", help="Recreate the database."
+        )
+        parser.add_argument(
+            "--cache",
+            action="store_true",
+            help="Keep the store list response cache on.",
+        )
+        parser.add_argument(
+            "--case", action="append", help="Only run cases whose name contains this."
+        )
+        parser.add_argument("--label", help="Name of the run, e.g. a release.")
+        parser.add_argument(
+            "--output", default="-", help="File for the JSON report, - for stdout."
+        )
+
+    def handle(self, *args, **options):
+        if connection.vendor != "sqlite":
+            raise CommandError("The benchmark creates its own SQLite database.")
+        name = f"bench-{options['scenario']}-{options['stores']}-{options['seed']}"
+        database = options["database"] or str(
+            Path(tempfile.gettempdir()) / f"{name}.sqlite3"
+        )
+        keep = not options["reseed"] and Path(database).exists()
+        old_name = connection.settings_dict["NAME"]
+        connection.settings_dict.setdefault("TEST", {})["NAME"] = database
+        connection.creation.create_test_db(
+            verbosity=0, autoclobber=True, serialize=False, keepdb=keep
+        )
+        try:
+            seconds_to_seed = None
+            if not Store.objects.exists():
+                self.log(f"Seeding {options['stores']} stores into {database}")
+                start = time.perf_counter()
+                self.seed(
+                    options["scenario"],
+                    options["stores"],
+                    options["seed"],
+                    options["workers"],
+                )
+                seconds_to_seed = round(time.perf_counter() - start, 1)
+                self.log(f"Seeded in {seconds_to_seed} s")
+            report = self.run(options, database, seconds_to_seed)
+        finally:
+            connection.creation.destroy_test_db(old_name, verbosity=0, keepdb=True)
+
+        text = json.dumps(report, indent=2)
+        if options["output"] == "-":
+            self.stdout.write(text)
+        else:
+            Path(options["output"]).write_text(text + "\n")
+            self.write_table(report["cases"])
+
+    def log(self, message):
+        self.stderr.write(message)
+
+    # Seeding
+
+    def seed(self, scenario, num_stores, seed, workers):
+        with transaction.atomic():
+            User.objects.create_superuser(
+                email=SUPERUSER_EMAIL,
+                password=load_data.PASSWORD,
+                first_name="Bench",
+                last_name="Admin",
+            )
+            options = {}
+            if scenario == "big_owner":
+                options = {
+                    "big_owner": User.objects.create_user(
+                        email=BIG_OWNER_EMAIL,
+                        password=load_data.PASSWORD,
+                        first_name="Bench",
+                        last_name="Owner",
+                    ),
+                    "big_owner_share": BIG_OWNER_SHARE,
+                    "heavy_managers": HEAVY_MANAGERS,
+                    "heavy_manager_share": HEAVY_MANAGER_SHARE,
+                }
+            load_data.populate(
+                num_stores,
+                num_stores + num_stores // 2,
+                seed=seed,
+                workers=workers,
+                **options,
+            )
+
+    # Measuring
+
+    def roles(self):
+        """The superuser, the user owning most stores and the one managing most."""
+        superuser = User.objects.get(email=SUPERUSER_EMAIL)
+        owner = (
+            Store.objects.values("owner_id")
+            .annotate(stores=Count("id"))
+            .order_by("-stores", "owner_id")
+            .first()
+        )
+        manager = (
+            Store.manager_ids.through.objects.values("customuser_id")
+            .annotate(stores=Count("id"))
+            .order_by("-stores", "customuser_id")
+            .first()
+        )
+        return {
+            "superuser": {"id": superuser.pk, "stores": Store.objects.count()},
+            "owner": {"id": owner["owner_id"], "stores": owner["stores"]},
+            "manager": {"id": manager["customuser_id"], "stores": manager["stores"]},
+        }
+
+    def cases(self, roles):
+        owner_id, manager_id = roles["owner"]["id"], roles["manager"]["id"]
+        owned = Store.objects.filter(owner_id=owner_id).order_by("id")
+        owned_store = owned.values_list("id", flat=True).first()
+        managed_store = (
+            Store.manager_ids.through.objects.filter(customuser_id=manager_id)
+            .order_by("store_id")
+            .values_list("store_id", flat=True)
+            .first()
+        )
+        middle_store = Store.objects.order_by("id").values_list("id", flat=True)[
+            roles["superuser"]["stores"] // 2
+        ]
+        deep_page = max(1, roles["superuser"]["stores"] // 200)
+        owner_user = User.objects.get(pk=owner_id)
+        new_store = {
+            "name": "Bench Bäckerei",
+            "address": "1 Hauptstraße",
+            "city": "Berlin",
+            "state_abbrv": "BE",
+            "plz": "10115",
+            "owner_id": owner_id,
+            "manager_ids": [manager_id],
+            "opening_time": "07:00:00",
+            "closing_time": "19:00:00",
+            "montag": True,
+            "samstag": True,
+        }
+        owned = {"pk": owned_store}
+        schedule = {"opening_time": "07:00:00", "closing_time": "19:00:00"}
+        signup = {
+            "first_name": "Bench",
+            "last_name": "Signup",
+            "email": SIGNUP_EMAIL,
+            "password": load_data.PASSWORD,
+        }
+        login = {"email": owner_user.email, "password": load_data.PASSWORD}
+
+        def get(name, url_name, params=None, role="superuser", **kwargs):
+            return Case(name, "GET", url_name, kwargs, params or {}, role)
+
+        return [
+            get("stores list", "stores-list"),
+            get("stores list page_size=100", "stores-list", {"page_size": 100}),
+            get(
+                "stores list deep page",
+                "stores-list",
+                {"page_size": 100, "page": deep_page},
+            ),
+            get(
+                "stores list cursor",
+                "stores-list",
+                {"pagination": "cursor", "page_size": 100},
+            ),
+            get(
+                "stores list city ordered by name",
+                "stores-list",
+                {"city": "Berlin", "ordering": "name"},
+            ),
+            get(
+                "stores list state ordered by -opens",
+                "stores-list",
+                {"state_abbrv": "BE", "ordering": "-opens"},
+            ),
+            get("stores list name", "stores-list", {"name": "brezel"}),
+            get(
+                "stores list owner name ordered",
+                "stores-list",
+                {"owner_last_name": "Schmidt", "ordering": "owner_last_name"},
+            ),
+            get(
+                "stores list manager name",
+                "stores-list",
+                {"manager_last_name": "Weber"},
+            ),
+            get(
+                "stores list days",
+                "stores-list",
+                {"montag": "true", "sonntag": "false"},
+            ),
+            get("stores list min_days", "stores-list", {"min_days": 6}),
+            get(
+                "stores list hours ordered by closes",
+                "stores-list",
+                {
+                    "opening_time_lte": "07:00",
+                    "closing_time_gte": "20:00",
+                    "ordering": "closes",
+                },
+            ),
+            get("stores list search", "stores-list", {"search": "Bäcker Berlin"}),
+            get("stores list open_at", "stores-list", {"open_at": "samstagT19:30"}),
+            get(
+                "stores list fields",
+                "stores-list",
+                {"fields": "id,name,city", "page_size": 100},
+            ),
+            get(
+                "stores list include",
+                "stores-list",
+                {"include": "owner,managers", "page_size": 100},
+            ),
+            get("stores list as owner", "stores-list", {"page_size": 100}, "owner"),
+            get(
+                "stores list as owner ordered by name",
+                "stores-list",
+                {"ordering": "name", "page_size": 100},
+                "owner",
+            ),
+            get("stores list as manager", "stores-list", {"page_size": 100}, "manager"),
+            get(
+                "stores list as manager search",
+                "stores-list",
+                {"search": "brot"},
+                "manager",
+            ),
+            Case(
+                "stores create",
+                "POST",
+                "stores-list",
+                {},
+                {},
+                "owner",
+                new_store,
+                201,
+            ),
+            get("stores detail", "stores-detail", pk=middle_store),
+            get(
+                "stores detail as owner include",
+                "stores-detail",
+                {"include": "owner,managers"},
+                "owner",
+                pk=owned_store,
+            ),
+            get(
+                "stores detail as manager",
+                "stores-detail",
+                role="manager",
+                pk=managed_store,
+            ),
+            Case(
+                "stores detail patch",
+                "PATCH",
+                "stores-detail",
+                owned,
+                {},
+                "owner",
+                {"name": "Bench Backstube"},
+            ),
+            Case(
+                "stores detail put",
+                "PUT",
+                "stores-detail",
+                owned,
+                {},
+                "owner",
+                new_store,
+            ),
+            Case(
+                "stores detail delete",
+                "DELETE",
+                "stores-detail",
+                owned,
+                {},
+                "owner",
+                status=204,
+            ),
+            Case(
+                "stores bulk create 100",
+                "POST",
+                "stores-bulk-create",
+                {},
+                {},
+                "owner",
+                [new_store] * 100,
+                201,
+            ),
+            Case(
+                "stores export csv as owner",
+                "GET",
+                "stores-export",
+                {"export_format": "csv"},
+                {},
+                "owner",
+                max_requests=5,
+            ),
+            Case(
+                "stores export ndjson city",
+                "GET",
+                "stores-export",
+                {"export_format": "ndjson"},
+                {"city": "Berlin"},
+                "superuser",
+                max_requests=5,
+            ),
+            get("stores stats", "stores-stats"),
+            get(
+                "stores stats as owner city",
+                "stores-stats",
+                {"city": "Berlin"},
+                "owner",
+            ),
+            get("days list as owner", "store-days-list", {"page_size": 100}, "owner"),
+            get(
+                "days list days_all",
+                "store-days-list",
+                {"days_all": "montag,samstag"},
+            ),
+            Case(
+                "days list bulk patch",
+                "PATCH",
+                "store-days-list",
+                {},
+                {"montag": "true"},
+                "owner",
+                {"sonntag": True},
+                max_requests=5,
+            ),
+            get("days detail", "store-days-detail", role="owner", pk=owned_store),
+            Case(
+                "days detail patch",
+                "PATCH",
+                "store-days-detail",
+                owned,
+                {},
+                "owner",
+                {"sonntag": True},
+            ),
+            get(
+                "hours list ordered by opens",
+                "store-hours-list",
+                {"ordering": "opens", "page_size": 100},
+                "owner",
+            ),
+            get("hours list range", "store-hours-list", {"opening_time_lte": "07:00"}),
+            Case(
+                "hours list bulk patch",
+                "PATCH",
+                "store-hours-list",
+                {},
+                {"opening_time_lte": "07:00"},
+                "owner",
+                {"closing_time": "21:00:00"},
+                max_requests=5,
+            ),
+            get("hours detail", "store-hours-detail", role="owner", pk=owned_store),
+            Case(
+                "hours detail put",
+                "PUT",
+                "store-hours-detail",
+                owned,
+                {},
+                "owner",
+                schedule,
+            ),
+            get("managers list", "store-managers-list", {"page_size": 100}, "owner"),
+            get(
+                "managers list manager name",
+                "store-managers-list",
+                {"manager_last_name": "Weber"},
+                "owner",
+            ),
+            get(
+                "managers detail",
+                "store-managers-detail",
+                role="owner",
+                pk=owned_store,
+            ),
+            Case(
+                "managers detail add",
+                "PATCH",
+                "store-managers-detail",
+                owned,
+                {},
+                "owner",
+                {"manager_ids": [manager_id], "operation": "add"},
+            ),
+            get("users list", "customuser-list"),
+            get(
+                "users list ordered by last_name",
+                "customuser-list",
+                {"last_name__icontains": "schm", "ordering": "last_name"},
+            ),
+            get("users list fields", "customuser-list", {"fields": "id,email"}),
+            get("users detail", "customuser-detail", pk=owner_id),
+            Case(
+                "users detail patch",
+                "PATCH",
+                "customuser-detail",
+                {"pk": owner_id},
+                {},
+                "superuser",
+                {"first_name": "Bench"},
+            ),
+            Case("login", "POST", "login", {}, {}, None, login),
+            Case("signup", "POST", "signup", {}, {}, None, signup, 201),
+        ]
+
+    def run(self, options, database, seconds_to_seed):
+        roles = self.roles()
+        tokens = dict(
+            Token.objects.filter(
+                user_id__in=[role["id"] for role in roles.values()]
+            ).values_list("user_id", "key")
+        )
+        cases = self.cases(roles)
+        if options["case"]:
+            cases = [
+                case
+                for case in cases
+                if any(part in case.name for part in options["case"])
+            ]
+        overrides = {"DEBUG": False, "ALLOWED_HOSTS": ["testserver"]}
+        if not options["cache"]:
+            overrides["STORE_LIST_CACHE_TIMEOUT"] = 0
+        timing_logger = logging.getLogger(timing.__name__)
+        level = timing_logger.level
+        # The report flags requests over budget; skip the per-request warnings.
+        timing_logger.setLevel(logging.ERROR)
+        results = []
+        try:
+            with override_settings(**overrides):
+                for case in cases:
+                    role = roles.get(case.role)
+                    token = tokens[role["id"]] if role else None
+                    self.log(f"{case.method} {case.name}")
+                    results.append(self.measure(case, token, options))
+        finally:
+            timing_logger.setLevel(level)
+        return {
+            "meta": {
+                "label": options["label"],
+                "revision": revision(),
+                "created": timezone.now().isoformat(),
+                "scenario": options["scenario"],
+                "seed": options["seed"],
+                "requests": options["requests"],
+                "warmup": options["warmup"],
+                "cache": options["cache"],
+                "database": database,
+                "seconds_to_seed": seconds_to_seed,
+                "python": platform.python_version(),
+                "django": django.get_version(),
+                "sqlite": sqlite3.sqlite_version,
+            },
+            "dataset": {
+                "stores": roles["superuser"]["stores"],
+                "users": User.objects.count(),
+                "manager_links": Store.manager_ids.through.objects.count(),
+                "roles": roles,
+            },
+            "cases": results,
+        }
+
+    def measure(self, case, token, options):
+        client = Client()
+        path = reverse(case.url_name, kwargs=case.kwargs)
+        if case.params:
+            path += "?" + urlencode(case.params)
+        headers = {"accept": "application/json"}
+        if token is not None:
+            headers["authorization"] = f"Token {token}"
+        body = {}
+        if case.body is not None:
+            body = {"data": json.dumps(case.body), "content_type": "application/json"}
+        queries = [0]
+
+        def count_query(execute, sql, params, many, context):
+            # Leave out the savepoints that rolling back writes adds.
+            if not SAVEPOINT_RE.match(sql):
+                queries[0] += 1
+            return execute(sql, params, many, context)
+
+        def request():
+            queries[0] = 0
+            start = time.perf_counter()
+            # Writes are rolled back, so every request sees the seeded data.
+            with transaction.atomic():
+                with connection.execute_wrapper(count_query):
+                    response = client.generic(
+                        case.method,
+                        path,
+                        headers=headers,
+                        **body,
+                    )
+                    if response.streaming:
+                        b"".join(response.streaming_content)
+                transaction.set_rollback(True)
+            return response, time.perf_counter() - start, queries[0]
+
+        requests = options["requests"]
+        if case.max_requests is not None:
+            requests = min(requests, case.max_requests)
+        for _ in range(options["warmup"]):
+            request()
+        latencies, counts, phases, statuses = [], [], {}, set()
+        for _ in range(requests):
+            response, elapsed, count = request()
+            statuses.add(response.status_code)
+            latencies.append(elapsed * 1e3)
+            counts.append(count)
+            durations, _ = parse_server_timing(response.get("Server-Timing", ""))
+            for name, duration in durations.items():
+                phases.setdefault(name, []).append(duration)
+        latencies.sort()
+        budget = timing.get_budget(case.method, case.url_name)
+        over_budget = False
+        if budget is not None:
+            db_ms = sorted(phases.get("db", [0.0]))
+            over_budget = max(counts) > budget.get("queries", math.inf) or percentile(
+                db_ms, 50
+            ) > budget.get("db_ms", math.inf)
+        if statuses != {case.status}:
+            self.log(f"  expected status {case.status}, got {sorted(statuses)}")
+        return {
+            "name": case.name,
+            "method": case.method,
+            "url_name": case.url_name,
+            "path": path,
+            "params": case.params,
+            "role": case.role,
+            "requests": requests,
+            "statuses": sorted(statuses),
+            "ok": statuses == {case.status},
+            "latency_ms": {
+                **{f"p{p}": round(percentile(latencies, p), 3) for p in PERCENTILES},
+                "mean": round(sum(latencies) / len(latencies), 3),
+                "min": round(latencies[0], 3),
+                "max": round(latencies[-1], 3),
+            },
+            "queries": {"min": min(counts), "max": max(counts)},
+            "server_timing_p50_ms": {
+                name: round(percentile(sorted(values), 50), 3)
+                for name, values in phases.items()
+            },
+            "budget": budget,
+            "over_budget": over_budget,
+        }
+
+    def write_table(self, cases):
+        self.stdout.write(
+            f"{'case':<40}{'p50 ms':>10}{'p90 ms':>10}{'p99 ms':>10}{'queries':>9}"
+        )
+        for case in cases:
+            latency = case["latency_ms"]
+            flags = ("" if case["ok"] else " status") + (
+                " over budget" if case["over_budget"] else ""
+            )
+            self.stdout.write(
+                f"{case['name']:<40}{latency['p50']:>10.2f}{latency['p90']:>10.2f}"
+                f"{latency['p99']:>10.2f}{case['queries']['max']:>9}{flags}"
+            )
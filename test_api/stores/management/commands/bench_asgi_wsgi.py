@@ -0,0 +1,164 @@
+import asyncio
+import importlib
+import time
+from concurrent.futures import ThreadPoolExecutor
+from wsgiref.util import setup_testing_defaults
+from django.core.handlers.asgi import ASGIHandler
+from django.core.handlers.wsgi import WSGIHandler
+from django.core.management.base import BaseCommand, CommandError
+from django.test import override_settings
+from django.urls import clear_url_caches
+from rest_framework.authtoken.models import Token
+from stores.models import Store
+
+HOST = "localhost"
+
+
+def reload_store_urls():
+    importlib.reload(importlib.import_module("stores.api.urls"))
+    importlib.reload(importlib.import_module("test_api.urls"))
+    clear_url_caches()
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the throughput of a store endpoint served by the WSGI handler "
+        "with a pool of worker threads against the ASGI handler with async "
+        "store views, for many concurrent clients that are slow to read."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--path", default="/stores/")
+        parser.add_argument("--query", default="page_size=10")
+        parser.add_argument("--clients", type=int, default=200)
+        parser.add_argument("--requests", type=int, default=2000)
+        parser.add_argument("--threads", type=int, default=8)
+        parser.add_argument(
+            "--client-delay",
+            type=float,
+            default=0.05,
+            help="Seconds each client takes to read a response.",
+        )
+
+    def handle(self, *args, **options):
+        store = Store.objects.select_related("owner_id").first()
+        if store is None:
+            raise CommandError("No stores to request.")
+        token, _ = Token.objects.get_or_create(user=store.owner_id)
+        self.headers = {
+            "authorization": f"Token {token.key}",
+            "accept": "application/json",
+        }
+        self.options = options
+        per_client = max(1, options["requests"] // options["clients"])
+        self.stdout.write(
+            f"{options['clients']} clients x {per_client} requests of "
+            f"{options['path']}?{options['query']}, "
+            f"{options['client_delay'] * 1000:.0f} ms client delay"
+        )
+        self.report(f"wsgi ({options['threads']} threads)", *self.run_wsgi(per_client))
+        with override_settings(STORES_ASYNC_READS=True):
+            reload_store_urls()
+            try:
+                self.report("asgi", *asyncio.run(self.run_asgi(per_client)))
+            finally:
+                reload_store_urls()
+
+    def report(self, name, elapsed, results):
+        errors = results.count(False)
+        self.stdout.write(
+            f"{name:<20}{len(results) / elapsed:10.1f} req/s{elapsed:10.2f} s"
+            f"{errors:6d} errors"
+        )
+
+    def run_wsgi(self, per_client):
+        application = WSGIHandler()
+        options = self.options
+
+        def request():
+            environ = {
+                "REQUEST_METHOD": "GET",
+                "PATH_INFO": options["path"],
+                "QUERY_STRING": options["query"],
+                "HTTP_HOST": HOST,
+                **{
+                    "HTTP_" + key.upper(): value for key, value in self.headers.items()
+                },
+            }
+            setup_testing_defaults(environ)
+            statuses = []
+            body = application(environ, lambda status, headers: statuses.append(status))
+            b"".join(body)
+            # A slow client keeps the worker thread until it has read the body.
+            time.sleep(options["client_delay"])
+            body.close()
+            return statuses[0].startswith("200")
+
+        def client():
+            return [request() for _ in range(per_client)]
+
+        start = time.perf_counter()
+        with ThreadPoolExecutor(options["threads"]) as pool:
+            results = [
+                result
+                for results in pool.map(lambda _: client(), range(options["clients"]))
+                for result in results
+            ]
+        return time.perf_counter() - start, results
+
+    async def run_asgi(self, per_client):
+        application = ASGIHandler()
+        options = self.options
+        headers = [(b"host", HOST.encode())] + [
+            (key.encode(), value.encode()) for key, value in self.headers.items()
+        ]
+
+        async def request():
+            done = asyncio.Event()
+            statuses = []
+            messages = iter([{"type": "http.request", "body": b"", "more_body": False}])
+
+            async def receive():
+                message = next(messages, None)
+                if message is not None:
+                    return message
+                await done.wait()
+                return {"type": "http.disconnect"}
+
+            async def send(message):
+                if message["type"] == "http.response.start":
+                    statuses.append(message["status"])
+                elif not message.get("more_body"):
+                    # The slow client only holds this coroutine, not a thread.
+                    await asyncio.sleep(options["client_delay"])
+
+            scope = {
+                "type": "http",
+                "asgi": {"version": "3.0"},
+                "http_version": "1.1",
+                "method": "GET",
+                "scheme": "http",
+                "path": options["path"],
+                "raw_path": options["path"].encode(),
+                "query_string": options["query"].encode(),
+                "root_path": "",
+                "headers": headers,
+                "client": ("127.0.0.1", 0),
+                "server": (HOST, 80),
+            }
+            await application(scope, receive, send)
+            done.set()
+            return statuses == [200]
+
+        async def client():
+            return [await request() for _ in range(per_client)]
+
+        start = time.perf_counter()
+        results = [
+            result
+            for results in await asyncio.gather(
+                *(client() for _ in range(options["clients"]))
+            )
+            for result in results
+        ]
+        return time.perf_counter() - start, results
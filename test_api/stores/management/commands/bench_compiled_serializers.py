@@ -0,0 +1,55 @@
+from timeit import repeat
+from django.core.management.base import BaseCommand
+from stores.api.compiled import compiled_serializer
+from stores.api.serializers import (
+    DaysSerializer,
+    HoursSerializer,
+    ManagersSerializer,
+    StoreSerializer,
+)
+from stores.api.views import with_store_relations
+from stores.models import Store
+
+
+class Command(BaseCommand):
+    help = (
+        "Time reading and serializing a page of stores with the compiled "
+        "serializers against serializing model instances."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--stores", type=int, default=100)
+        parser.add_argument("--number", type=int, default=20)
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        queryset = with_store_relations(Store.objects.order_by("id"))
+        count = queryset[: options["stores"]].count()
+        if not count:
+            self.stderr.write("No stores to serialize.")
+            return
+        self.stdout.write(f"{count} stores per list")
+        for serializer_class in (
+            StoreSerializer,
+            DaysSerializer,
+            HoursSerializer,
+            ManagersSerializer,
+        ):
+            compiled = compiled_serializer(serializer_class)
+
+            def instances():
+                stores = list(queryset[: options["stores"]])
+                return serializer_class(stores, many=True).data
+
+            def rows():
+                page = compiled.rows(queryset)[: options["stores"]]
+                return compiled.data(compiled.load(page))
+
+            for name, func in (("instances", instances), ("compiled", rows)):
+                best = min(
+                    repeat(func, number=options["number"], repeat=options["repeat"])
+                )
+                per_call = best / options["number"] * 1e3
+                self.stdout.write(
+                    f"{serializer_class.__name__:<20}{name:<11}{per_call:10.2f} ms/list"
+                )
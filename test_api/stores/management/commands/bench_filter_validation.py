@@ -0,0 +1,48 @@
+from timeit import repeat
+from django.core.management.base import BaseCommand
+from django.http import QueryDict
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from stores.api.filters import StoreFilter
+from stores.api.serializers import StoreSerializer
+
+QUERY = (
+    "name=Store&city=Berlin&address=Main+Street+1&state_abbrv=BE&plz=10115"
+    "&montag=true&freitag=false&opening_time=08:00&closing_time=18:00"
+    "&ordering=name&page_size=10"
+)
+
+
+class Command(BaseCommand):
+    help = (
+        "Time the compiled StoreFilter validation plan against validating the "
+        "same query parameters with a StoreSerializer."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--number", type=int, default=2000)
+        parser.add_argument("--repeat", type=int, default=5)
+        parser.add_argument("--query", default=QUERY)
+
+    def handle(self, *args, **options):
+        params = QueryDict(options["query"])
+        request = Request(APIRequestFactory().get("/stores/", params))
+        filterset = StoreFilter(params, queryset=None, request=request)
+        serializer_params = {
+            key: value
+            for key, value in params.items()
+            if key not in StoreFilter.extra_allowed_params
+        }
+
+        def plan():
+            filterset.validate_filters(params)
+
+        def serializer():
+            StoreSerializer(
+                data=serializer_params, context={"request": request}
+            ).is_valid(raise_exception=True)
+
+        for name, func in (("plan", plan), ("serializer", serializer)):
+            best = min(repeat(func, number=options["number"], repeat=options["repeat"]))
+            per_call = best / options["number"] * 1e6
+            self.stdout.write(f"{name:<12}{per_call:10.1f} us/request")
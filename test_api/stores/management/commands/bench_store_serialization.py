@@ -0,0 +1,75 @@
+from timeit import repeat
+from django.core.management.base import BaseCommand
+from rest_framework import serializers
+from rest_framework.request import Request
+from rest_framework.test import APIRequestFactory
+from stores.api.serializers import (
+    DaysSerializer,
+    HoursSerializer,
+    ManagersSerializer,
+    StoreSerializer,
+)
+from stores.models import DAYS_OF_WEEK, Store
+
+
+def computed_days_of_operation(store):
+    # How days_of_operation was built before it became a generated column.
+    return str([day.capitalize() for day in DAYS_OF_WEEK if getattr(store, day)])
+
+
+def with_computed_days(serializer_class):
+    """`serializer_class` building days_of_operation per row, as before."""
+
+    class ComputedSerializer(serializer_class):
+        days_of_operation = serializers.SerializerMethodField()
+
+        def get_days_of_operation(self, obj):
+            return computed_days_of_operation(obj)
+
+    ComputedSerializer.__name__ = f"Computed{serializer_class.__name__}"
+    return ComputedSerializer
+
+
+class Command(BaseCommand):
+    help = (
+        "Time list serialization of stores reading the generated "
+        "days_of_operation column against building it per row."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument("--stores", type=int, default=100)
+        parser.add_argument("--number", type=int, default=20)
+        parser.add_argument("--repeat", type=int, default=5)
+
+    def handle(self, *args, **options):
+        request = Request(APIRequestFactory().get("/stores/"))
+        stores = list(
+            Store.objects.select_related("owner_id").prefetch_related("manager_ids")[
+                : options["stores"]
+            ]
+        )
+        if not stores:
+            self.stderr.write("No stores to serialize.")
+            return
+        self.stdout.write(f"{len(stores)} stores per list")
+        for serializer_class in (
+            StoreSerializer,
+            DaysSerializer,
+            HoursSerializer,
+            ManagersSerializer,
+        ):
+            for name, cls in (
+                ("computed", with_computed_days(serializer_class)),
+                ("column", serializer_class),
+            ):
+
+                def serialize():
+                    return cls(stores, many=True, context={"request": request}).data
+
+                best = min(
+                    repeat(serialize, number=options["number"], repeat=options["repeat"])
+                )
+                per_call = best / options["number"] * 1e3
+                self.stdout.write(
+                    f"{serializer_class.__name__:<20}{name:<10}{per_call:10.2f} ms/list"
+                )
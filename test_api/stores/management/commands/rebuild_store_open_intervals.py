@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from stores.models import StoreOpenInterval
+
+
+class Command(BaseCommand):
+    help = "Rebuild the store opening intervals from store days and hours."
+
+    def add_arguments(self, parser):
+        parser.add_argument("--batch-size", type=int, default=2000)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            count = StoreOpenInterval.rebuild(batch_size=options["batch_size"])
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt {count} store opening intervals."))
@@ -0,0 +1,76 @@
+"""
+Set-based updates of the managers of a store.
+
+`update_managers` applies one membership operation to a store: the diff
+against the `Store.manager_ids` through table is read with one query, and the
+changes are written with one bulk INSERT and one bulk DELETE on the through
+table and on `StoreAccess`, inside a transaction. The writes bypass
+`m2m_changed`, so the relations version, search row and cache generations are
+refreshed here, as the signal handler does for `add` and `remove`.
+"""
+
+from django.db import transaction
+from .models import Store, StoreAccess
+from .signals import refresh_manager_relations
+
+# toggle adds the users that are not managers and removes the ones that are,
+# replace makes the users the only managers.
+TOGGLE = "toggle"
+ADD = "add"
+REMOVE = "remove"
+REPLACE = "replace"
+MANAGER_OPERATIONS = (TOGGLE, ADD, REMOVE, REPLACE)
+
+
+def manager_diff(store_id, user_ids, operation=TOGGLE):
+    """(user ids to add, user ids to remove) for `operation` on `store_id`."""
+    user_ids = set(user_ids)
+    links = Store.manager_ids.through.objects.filter(store_id=store_id)
+    if operation != REPLACE:
+        links = links.filter(customuser_id__in=user_ids)
+    current = set(links.values_list("customuser_id", flat=True))
+    if operation == ADD:
+        return user_ids - current, set()
+    if operation == REMOVE:
+        return set(), current
+    if operation == REPLACE:
+        return user_ids - current, current - user_ids
+    return user_ids - current, current
+
+
+def update_managers(store, user_ids, operation=TOGGLE):
+    """Apply `operation` with `user_ids` to the managers of `store`.
+
+    Returns the sets of added and removed user ids.
+    """
+    if operation not in MANAGER_OPERATIONS:
+        raise ValueError(f"Unknown manager operation {operation!r}")
+    if not user_ids and operation != REPLACE:
+        return set(), set()
+    Through = Store.manager_ids.through
+    with transaction.atomic():
+        added, removed = manager_diff(store.pk, user_ids, operation)
+        if added:
+            Through.objects.bulk_create(
+                [Through(store_id=store.pk, customuser_id=pk) for pk in sorted(added)],
+                ignore_conflicts=True,
+            )
+            StoreAccess.objects.bulk_create(
+                [
+                    StoreAccess(store_id=store.pk, user_id=pk, role=StoreAccess.MANAGER)
+                    for pk in sorted(added)
+                ],
+                ignore_conflicts=True,
+            )
+        if removed:
+            Through.objects.filter(
+                store_id=store.pk, customuser_id__in=removed
+            ).delete()
+            StoreAccess.objects.filter(
+                store_id=store.pk, user_id__in=removed, role=StoreAccess.MANAGER
+            ).delete()
+        if added or removed:
+            refresh_manager_relations([(store.pk, pk) for pk in added | removed])
+    # Like RelatedManager.add/remove, drop managers prefetched on the instance.
+    getattr(store, "_prefetched_objects_cache", {}).pop("manager_ids", None)
+    return added, removed
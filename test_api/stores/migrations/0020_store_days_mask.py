@@ -0,0 +1,44 @@
+# Generated by Django 5.1.6 on 2026-10-17 18:02
+
+from django.db import migrations, models
+
+DAYS_OF_WEEK = [
+    "montag",
+    "dienstag",
+    "mittwoch",
+    "donnerstag",
+    "freitag",
+    "samstag",
+    "sonntag",
+]
+
+
+def backfill_days_mask(apps, schema_editor):
+    Store = apps.get_model("stores", "Store")
+    stores = Store.objects.only("id", *DAYS_OF_WEEK)
+    batch = []
+    for store in stores.iterator(chunk_size=2000):
+        store.days_mask = sum(
+            1 << index for index, day in enumerate(DAYS_OF_WEEK) if getattr(store, day)
+        )
+        batch.append(store)
+        if len(batch) == 2000:
+            Store.objects.bulk_update(batch, ["days_mask"])
+            batch = []
+    Store.objects.bulk_update(batch, ["days_mask"])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stores', '0019_alter_store_plz'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='store',
+            name='days_mask',
+            field=models.PositiveSmallIntegerField(db_index=True, default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_days_mask, migrations.RunPython.noop),
+    ]
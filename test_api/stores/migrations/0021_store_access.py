@@ -0,0 +1,45 @@
+# Generated by Django 5.1.6 on 2026-10-17 18:03
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+def populate_store_access(apps, schema_editor):
+    Store = apps.get_model("stores", "Store")
+    StoreAccess = apps.get_model("stores", "StoreAccess")
+    rows = [
+        StoreAccess(user_id=owner_id, store_id=store_id, role="owner")
+        for store_id, owner_id in Store.objects.values_list("id", "owner_id")
+    ]
+    rows += [
+        StoreAccess(user_id=manager_id, store_id=store_id, role="manager")
+        for store_id, manager_id in Store.manager_ids.through.objects.values_list(
+            "store_id", "customuser_id"
+        )
+    ]
+    StoreAccess.objects.bulk_create(rows, batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stores', '0020_store_days_mask'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoreAccess',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('role', models.CharField(choices=[('owner', 'Owner'), ('manager', 'Manager')], max_length=7)),
+                ('store', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='access', to='stores.store')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='store_access', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'constraints': [models.UniqueConstraint(fields=('user', 'store', 'role'), name='unique_store_access')],
+            },
+        ),
+        migrations.RunPython(populate_store_access, migrations.RunPython.noop),
+    ]
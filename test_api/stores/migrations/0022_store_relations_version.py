@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-17 18:06
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stores', '0021_store_access'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='store',
+            name='relations_version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
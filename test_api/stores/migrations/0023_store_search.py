@@ -0,0 +1,133 @@
+# Generated by Django 5.1.6 on 2026-10-17 18:16
+
+import unicodedata
+import django.db.models.deletion
+from django.db import migrations, models
+
+COLUMNS = ("name", "city", "address", "owner", "managers")
+
+# A frozen copy of stores.models.normalize_search_text.
+SEARCH_FOLDING = {"ä": "ae", "ö": "oe", "ü": "ue"}
+
+
+def normalize_search_text(text):
+    folded = []
+    for char in text.casefold():
+        char = SEARCH_FOLDING.get(char, char)
+        folded.append(
+            "".join(
+                part
+                for part in unicodedata.normalize("NFKD", char)
+                if not unicodedata.combining(part)
+            )
+        )
+    return "".join(folded)
+
+
+SQLITE_INDEX = [
+    """
+    CREATE VIRTUAL TABLE stores_storesearch_fts USING fts5(
+        name, city, address, owner, managers,
+        content='stores_storesearch', content_rowid='store_id',
+        tokenize='trigram'
+    )
+    """,
+    """
+    CREATE TRIGGER stores_storesearch_ai AFTER INSERT ON stores_storesearch BEGIN
+        INSERT INTO stores_storesearch_fts(rowid, name, city, address, owner, managers)
+        VALUES (new.store_id, new.name, new.city, new.address, new.owner, new.managers);
+    END
+    """,
+    """
+    CREATE TRIGGER stores_storesearch_ad AFTER DELETE ON stores_storesearch BEGIN
+        INSERT INTO stores_storesearch_fts(stores_storesearch_fts, rowid, name, city, address, owner, managers)
+        VALUES ('delete', old.store_id, old.name, old.city, old.address, old.owner, old.managers);
+    END
+    """,
+    """
+    CREATE TRIGGER stores_storesearch_au AFTER UPDATE ON stores_storesearch BEGIN
+        INSERT INTO stores_storesearch_fts(stores_storesearch_fts, rowid, name, city, address, owner, managers)
+        VALUES ('delete', old.store_id, old.name, old.city, old.address, old.owner, old.managers);
+        INSERT INTO stores_storesearch_fts(rowid, name, city, address, owner, managers)
+        VALUES (new.store_id, new.name, new.city, new.address, new.owner, new.managers);
+    END
+    """,
+]
+
+SQLITE_DROP = [
+    "DROP TRIGGER IF EXISTS stores_storesearch_au",
+    "DROP TRIGGER IF EXISTS stores_storesearch_ad",
+    "DROP TRIGGER IF EXISTS stores_storesearch_ai",
+    "DROP TABLE IF EXISTS stores_storesearch_fts",
+]
+
+POSTGRES_INDEX = ["CREATE EXTENSION IF NOT EXISTS pg_trgm"] + [
+    f"CREATE INDEX stores_storesearch_{column}_trgm "
+    f"ON stores_storesearch USING gin ({column} gin_trgm_ops)"
+    for column in COLUMNS
+]
+
+POSTGRES_DROP = [
+    f"DROP INDEX IF EXISTS stores_storesearch_{column}_trgm" for column in COLUMNS
+]
+
+
+def _run(schema_editor, statements):
+    vendor = schema_editor.connection.vendor
+    for statement in statements.get(vendor, ()):
+        schema_editor.execute(statement)
+
+
+def create_search_index(apps, schema_editor):
+    _run(schema_editor, {"sqlite": SQLITE_INDEX, "postgresql": POSTGRES_INDEX})
+
+
+def drop_search_index(apps, schema_editor):
+    _run(schema_editor, {"sqlite": SQLITE_DROP, "postgresql": POSTGRES_DROP})
+
+
+def populate_store_search(apps, schema_editor):
+    Store = apps.get_model("stores", "Store")
+    StoreSearch = apps.get_model("stores", "StoreSearch")
+    managers = {}
+    for store_id, first_name, last_name in Store.manager_ids.through.objects.values_list(
+        "store_id", "customuser__first_name", "customuser__last_name"
+    ):
+        managers.setdefault(store_id, []).append(f"{first_name} {last_name}")
+    rows = [
+        StoreSearch(
+            store_id=store_id,
+            name=normalize_search_text(name),
+            city=normalize_search_text(city),
+            address=normalize_search_text(address),
+            owner=normalize_search_text(f"{first_name} {last_name}"),
+            managers=normalize_search_text(" | ".join(managers.get(store_id, []))),
+        )
+        for store_id, name, city, address, first_name, last_name in Store.objects.values_list(
+            "id", "name", "city", "address", "owner_id__first_name", "owner_id__last_name"
+        )
+    ]
+    StoreSearch.objects.bulk_create(rows, batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stores', '0022_store_relations_version'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoreSearch',
+            fields=[
+                ('store', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search', serialize=False, to='stores.store')),
+                ('name', models.TextField()),
+                ('city', models.TextField()),
+                ('address', models.TextField()),
+                ('owner', models.TextField()),
+                ('managers', models.TextField()),
+            ],
+        ),
+        migrations.RunPython(create_search_index, drop_search_index),
+        migrations.RunPython(populate_store_search, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,65 @@
+# Generated by Django 5.1.6 on 2026-10-17 18:22
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+# Frozen copies of the day constants and week_minute of stores.models.
+DAYS_OF_WEEK = [
+    "montag",
+    "dienstag",
+    "mittwoch",
+    "donnerstag",
+    "freitag",
+    "samstag",
+    "sonntag",
+]
+DAY_BITS = {day: 1 << index for index, day in enumerate(DAYS_OF_WEEK)}
+MINUTES_PER_DAY = 24 * 60
+
+
+def week_minute(day_index, time_of_day):
+    return day_index * MINUTES_PER_DAY + time_of_day.hour * 60 + time_of_day.minute
+
+
+def populate_open_intervals(apps, schema_editor):
+    Store = apps.get_model("stores", "Store")
+    StoreOpenInterval = apps.get_model("stores", "StoreOpenInterval")
+    rows = []
+    for store_id, days_mask, opening_time, closing_time in Store.objects.values_list(
+        "id", "days_mask", "opening_time", "closing_time"
+    ):
+        if opening_time >= closing_time:
+            continue
+        rows += [
+            StoreOpenInterval(
+                store_id=store_id,
+                start_minute=week_minute(index, opening_time),
+                end_minute=week_minute(index, closing_time),
+            )
+            for index, day in enumerate(DAYS_OF_WEEK)
+            if days_mask & DAY_BITS[day]
+        ]
+    StoreOpenInterval.objects.bulk_create(rows, batch_size=2000)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stores', '0024_store_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoreOpenInterval',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('start_minute', models.PositiveSmallIntegerField()),
+                ('end_minute', models.PositiveSmallIntegerField()),
+                ('store', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='open_intervals', to='stores.store')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['start_minute', 'end_minute', 'store'], name='store_open_interval_idx')],
+            },
+        ),
+        migrations.RunPython(populate_open_intervals, migrations.RunPython.noop),
+    ]
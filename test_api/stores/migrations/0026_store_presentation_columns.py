@@ -0,0 +1,29 @@
+# Generated by Django 5.1.6 on 2026-10-17 18:26
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stores', '0025_store_open_interval'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='store',
+            name='days_of_operation',
+            field=models.GeneratedField(db_persist=True, expression=models.Case(models.When(days_mask=0, then=models.Value('[]')), models.When(days_mask=1, then=models.Value("['Montag']")), models.When(days_mask=2, then=models.Value("['Dienstag']")), models.When(days_mask=3, then=models.Value("['Montag', 'Dienstag']")), models.When(days_mask=4, then=models.Value("['Mittwoch']")), models.When(days_mask=5, then=models.Value("['Montag', 'Mittwoch']")), models.When(days_mask=6, then=models.Value("['Dienstag', 'Mittwoch']")), models.When(days_mask=7, then=models.Value("['Montag', 'Dienstag', 'Mittwoch']")), models.When(days_mask=8, then=models.Value("['Donnerstag']")), models.When(days_mask=9, then=models.Value("['Montag', 'Donnerstag']")), models.When(days_mask=10, then=models.Value("['Dienstag', 'Donnerstag']")), models.When(days_mask=11, then=models.Value("['Montag', 'Dienstag', 'Donnerstag']")), models.When(days_mask=12, then=models.Value("['Mittwoch', 'Donnerstag']")), models.When(days_mask=13, then=models.Value("['Montag', 'Mittwoch', 'Donnerstag']")), models.When(days_mask=14, then=models.Value("['Dienstag', 'Mittwoch', 'Donnerstag']")), models.When(days_mask=15, then=models.Value("['Montag', 'Dienstag', 'Mittwoch', 'Donnerstag']")), models.When(days_mask=16, then=models.Value("['Freitag']")), models.When(days_mask=17, then=models.Value("['Montag', 'Freitag']")), models.When(days_mask=18, then=models.Value("['Dienstag', 'Freitag']")), models.When(days_mask=19, then=models.Value("['Montag', 'Dienstag', 'Freitag']")), models.When(days_mask=20, then=models.Value("['Mittwoch', 'Freitag']")), models.When(days_mask=21, then=models.Value("['Montag', 'Mittwoch', 'Freitag']")), models.When(days_mask=22, then=models.Value("['Dienstag', 'Mittwoch', 'Freitag']")), models.When(days_mask=23, then=models.Value("['Montag', 'Dienstag', 'Mittwoch', 'Freitag']")), models.When(days_mask=24, then=models.Value("['Donnerstag', 'Freitag']")), models.When(days_mask=25, then=models.Value("['Montag', 'Donnerstag', 'Freitag']")), models.When(days_mask=26, then=models.Value("['Dienstag', 'Donnerstag', 'Freitag']")), models.When(days_mask=27, then=models.Value("['Montag', 'Dienstag', 'Donnerstag', 'Freitag']")), models.When(days_mask=28, then=models.Value("['Mittwoch', 'Donnerstag', 'Freitag']")), models.When(days_mask=29, then=models.Value("['Montag', 'Mittwoch', 'Donnerstag', 'Freitag']")), models.When(days_mask=30, then=models.Value("['Dienstag', 'Mittwoch', 'Donnerstag', 'Freitag']")), models.When(days_mask=31, then=models.Value("['Montag', 'Dienstag', 'Mittwoch', 'Donnerstag', 'Freitag']")), models.When(days_mask=32, then=models.Value("['Samstag']")), models.When(days_mask=33, then=models.Value("['Montag', 'Samstag']")), models.When(days_mask=34, then=models.Value("['Dienstag', 'Samstag']")), models.When(days_mask=35, then=models.Value("['Montag', 'Dienstag', 'Samstag']")), models.When(days_mask=36, then=models.Value("['Mittwoch', 'Samstag']")), models.When(days_mask=37, then=models.Value("['Montag', 'Mittwoch', 'Samstag']")), models.When(days_mask=38, then=models.Value("['Dienstag', 'Mittwoch', 'Samstag']")), models.When(days_mask=39, then=models.Value("['Montag', 'Dienstag', 'Mittwoch', 'Samstag']")), models.When(days_mask=40, then=models.Value("['Donnerstag', 'Samstag']")), models.When(days_mask=41, then=models.Value("['Montag', 'Donnerstag', 'Samstag']")), models.When(days_mask=42, then=models.Value("['Dienstag', 'Donnerstag', 'Samstag']")), models.When(days_mask=43, then=models.Value("['Montag', 'Dienstag', 'Donnerstag', 'Samstag']")), models.When(days_mask=44, then=models.Value("['Mittwoch', 'Donnerstag', 'Samstag']")), models.When(days_mask=45, then=models.Value("['Montag', 'Mittwoch', 'Donnerstag', 'Samstag']")), models.When(days_mask=46, then=models.Value("['Dienstag', 'Mittwoch', 'Donnerstag', 'Samstag']")), models.When(days_mask=47, then=models.Value("['Montag', 'Dienstag', 'Mittwoch', 'Donnerstag', 'Samstag']")), models.When(days_mask=48, then=models.Value("['Freitag', 'Samstag']")), models.When(days_mask=49, then=models.Value("['Montag', 'Freitag', 'Samstag']")), models.When(days_mask=50, then=models.Value("['Dienstag', 'Freitag', 'Samstag']")), models.When(days_mask=51, then=models.Value("['Montag', 'Dienstag', 'Freitag', 'Samstag']")), models.When(days_mask=52, then=models.Value("['Mittwoch', 'Freitag', 'Samstag']")), models.When(days_mask=53, then=models.Value("['Montag', 'Mittwoch', 'Freitag', 'Samstag']")), models.When(days_mask=54, then=models.Value("['Dienstag', 'Mittwoch', 'Freitag', 'Samstag']")), models.When(days_mask=55, then=models.Value("['Montag', 'Dienstag', 'Mittwoch', 'Freitag', 'Samstag']")), models.When(days_mask=56, then=models.Value("['Donnerstag', 'Freitag', 'Samstag']")), models.When(days_mask=57, then=models.Value("['Montag', 'Donnerstag', 'Freitag', 'Samstag']")), models.When(days_mask=58, then=models.Value("['Dienstag', 'Donnerstag', 'Freitag', 'Samstag']")), models.When(days_mask=59, then=models.Value("['Montag', 'Dienstag', 'Donnerstag', 'Freitag', 'Samstag']")), models.When(days_mask=60, then=models.Value("['Mittwoch', 'Donnerstag', 'Freitag', 'Samstag']")), models.When(days_mask=61, then=models.Value("['Montag', 'Mittwoch', 'Donnerstag', 'Freitag', 'Samstag']")), models.When(days_mask=62, then=models.Value("['Dienstag', 'Mittwoch', 'Donnerstag', 'Freitag', 'Samstag']")), models.When(days_mask=63, then=models.Value("['Montag', 'Dienstag', 'Mittwoch', 'Donnerstag', 'Freitag', 'Samstag']")), models.When(days_mask=64, then=models.Value("['Sonntag']")), models.When(days_mask=65, then=models.Value("['Montag', 'Sonntag']")), models.When(days_mask=66, then=models.Value("['Dienstag', 'Sonntag']")), models.When(days_mask=67, then=models.Value("['Montag', 'Dienstag', 'Sonntag']")), models.When(days_mask=68, then=models.Value("['Mittwoch', 'Sonntag']")), models.When(days_mask=69, then=models.Value("['Montag', 'Mittwoch', 'Sonntag']")), models.When(days_mask=70, then=models.Value("['Dienstag', 'Mittwoch', 'Sonntag']")), models.When(days_mask=71, then=models.Value("['Montag', 'Dienstag', 'Mittwoch', 'Sonntag']")), models.When(days_mask=72, then=models.Value("['Donnerstag', 'Sonntag']")), models.When(days_mask=73, then=models.Value("['Montag', 'Donnerstag', 'Sonntag']")), models.When(days_mask=74, then=models.Value("['Dienstag', 'Donnerstag', 'Sonntag']")), models.When(days_mask=75, then=models.Value("['Montag', 'Dienstag', 'Donnerstag', 'Sonntag']")), models.When(days_mask=76, then=models.Value("['Mittwoch', 'Donnerstag', 'Sonntag']")), models.When(days_mask=77, then=models.Value("['Montag', 'Mittwoch', 'Donnerstag', 'Sonntag']")), models.When(days_mask=78, then=models.Value("['Dienstag', 'Mittwoch', 'Donnerstag', 'Sonntag']")), models.When(days_mask=79, then=models.Value("['Montag', 'Dienstag', 'Mittwoch', 'Donnerstag', 'Sonntag']")), models.When(days_mask=80, then=models.Value("['Freitag', 'Sonntag']")), models.When(days_mask=81, then=models.Value("['Montag', 'Freitag', 'Sonntag']")), models.When(days_mask=82, then=models.Value("['Dienstag', 'Freitag', 'Sonntag']")), models.When(days_mask=83, then=models.Value("['Montag', 'Dienstag', 'Freitag', 'Sonntag']")), models.When(days_mask=84, then=models.Value("['Mittwoch', 'Freitag', 'Sonntag']")), models.When(days_mask=85, then=models.Value("['Montag', 'Mittwoch', 'Freitag', 'Sonntag']")), models.When(days_mask=86, then=models.Value("['Dienstag', 'Mittwoch', 'Freitag', 'Sonntag']")), models.When(days_mask=87, then=models.Value("['Montag', 'Dienstag', 'Mittwoch', 'Freitag', 'Sonntag']")), models.When(days_mask=88, then=models.Value("['Donnerstag', 'Freitag', 'Sonntag']")), models.When(days_mask=89, then=models.Value("['Montag', 'Donnerstag', 'Freitag', 'Sonntag']")), models.When(days_mask=90, then=models.Value("['Dienstag', 'Donnerstag', 'Freitag', 'Sonntag']")), models.When(days_mask=91, then=models.Value("['Montag', 'Dienstag', 'Donnerstag', 'Freitag', 'Sonntag']")), models.When(days_mask=92, then=models.Value("['Mittwoch', 'Donnerstag', 'Freitag', 'Sonntag']")), models.When(days_mask=93, then=models.Value("['Montag', 'Mittwoch', 'Donnerstag', 'Freitag', 'Sonntag']")), models.When(days_mask=94, then=models.Value("['Dienstag', 'Mittwoch', 'Donnerstag', 'Freitag', 'Sonntag']")), models.When(days_mask=95, then=models.Value("['Montag', 'Dienstag', 'Mittwoch', 'Donnerstag', 'Freitag', 'Sonntag']")), models.When(days_mask=96, then=models.Value("['Samstag', 'Sonntag']")), models.When(days_mask=97, then=models.Value("['Montag', 'Samstag', 'Sonntag']")), models.When(days_mask=98, then=models.Value("['Dienstag', 'Samstag', 'Sonntag']")), models.When(days_mask=99, then=models.Value("['Montag', 'Dienstag', 'Samstag', 'Sonntag']")), models.When(days_mask=100, then=models.Value("['Mittwoch', 'Samstag', 'Sonntag']")), models.When(days_mask=101, then=models.Value("['Montag', 'Mittwoch', 'Samstag', 'Sonntag']")), models.When(days_mask=102, then=models.Value("['Dienstag', 'Mittwoch', 'Samstag', 'Sonntag']")), models.When(days_mask=103, then=models.Value("['Montag', 'Dienstag', 'Mittwoch', 'Samstag', 'Sonntag']")), models.When(days_mask=104, then=models.Value("['Donnerstag', 'Samstag', 'Sonntag']")), models.When(days_mask=105, then=models.Value("['Montag', 'Donnerstag', 'Samstag', 'Sonntag']")), models.When(days_mask=106, then=models.Value("['Dienstag', 'Donnerstag', 'Samstag', 'Sonntag']")), models.When(days_mask=107, then=models.Value("['Montag', 'Dienstag', 'Donnerstag', 'Samstag', 'Sonntag']")), models.When(days_mask=108, then=models.Value("['Mittwoch', 'Donnerstag', 'Samstag', 'Sonntag']")), models.When(days_mask=109, then=models.Value("['Montag', 'Mittwoch', 'Donnerstag', 'Samstag', 'Sonntag']")), models.When(days_mask=110, then=models.Value("['Dienstag', 'Mittwoch', 'Donnerstag', 'Samstag', 'Sonntag']")), models.When(days_mask=111, then=models.Value("['Montag', 'Dienstag', 'Mittwoch', 'Donnerstag', 'Samstag', 'Sonntag']")), models.When(days_mask=112, then=models.Value("['Freitag', 'Samstag', 'Sonntag']")), models.When(days_mask=113, then=models.Value("['Montag', 'Freitag', 'Samstag', 'Sonntag']")), models.When(days_mask=114, then=models.Value("['Dienstag', 'Freitag', 'Samstag', 'Sonntag']")), models.When(days_mask=115, then=models.Value("['Montag', 'Dienstag', 'Freitag', 'Samstag', 'Sonntag']")), models.When(days_mask=116, then=models.Value("['Mittwoch', 'Freitag', 'Samstag', 'Sonntag']")), models.When(days_mask=117, then=models.Value("['Montag', 'Mittwoch', 'Freitag', 'Samstag', 'Sonntag']")), models.When(days_mask=118, then=models.Value("['Dienstag', 'Mittwoch', 'Freitag', 'Samstag', 'Sonntag']")), models.When(days_mask=119, then=models.Value("['Montag', 'Dienstag', 'Mittwoch', 'Freitag', 'Samstag', 'Sonntag']")), models.When(days_mask=120, then=models.Value("['Donnerstag', 'Freitag', 'Samstag', 'Sonntag']")), models.When(days_mask=121, then=models.Value("['Montag', 'Donnerstag', 'Freitag', 'Samstag', 'Sonntag']")), models.When(days_mask=122, then=models.Value("['Dienstag', 'Donnerstag', 'Freitag', 'Samstag', 'Sonntag']")), models.When(days_mask=123, then=models.Value("['Montag', 'Dienstag', 'Donnerstag', 'Freitag', 'Samstag', 'Sonntag']")), models.When(days_mask=124, then=models.Value("['Mittwoch', 'Donnerstag', 'Freitag', 'Samstag', 'Sonntag']")), models.When(days_mask=125, then=models.Value("['Montag', 'Mittwoch', 'Donnerstag', 'Freitag', 'Samstag', 'Sonntag']")), models.When(days_mask=126, then=models.Value("['Dienstag', 'Mittwoch', 'Donnerstag', 'Freitag', 'Samstag', 'Sonntag']")), models.When(days_mask=127, then=models.Value("['Montag', 'Dienstag', 'Mittwoch', 'Donnerstag', 'Freitag', 'Samstag', 'Sonntag']")), default=models.Value('[]')), output_field=models.CharField(max_length=81)),
+        ),
+        migrations.AddField(
+            model_name='store',
+            name='location',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.functions.text.Concat('address', models.Value(', '), 'city', models.Value(', '), 'state_abbrv', output_field=models.TextField()), output_field=models.TextField()),
+        ),
+        migrations.AddField(
+            model_name='store',
+            name='state',
+            field=models.GeneratedField(db_persist=True, expression=models.Case(models.When(state_abbrv='BW', then=models.Value('Baden-Württemberg')), models.When(state_abbrv='BY', then=models.Value('Bayern')), models.When(state_abbrv='BE', then=models.Value('Berlin')), models.When(state_abbrv='BB', then=models.Value('Brandenburg')), models.When(state_abbrv='HB', then=models.Value('Bremen')), models.When(state_abbrv='HH', then=models.Value('Hamburg')), models.When(state_abbrv='HE', then=models.Value('Hessen')), models.When(state_abbrv='MV', then=models.Value('Mecklenburg-Vorpommern')), models.When(state_abbrv='NI', then=models.Value('Niedersachsen')), models.When(state_abbrv='NW', then=models.Value('Nordrhein-Westfalen')), models.When(state_abbrv='RP', then=models.Value('Rheinland-Pfalz')), models.When(state_abbrv='SL', then=models.Value('Saarland')), models.When(state_abbrv='SN', then=models.Value('Sachsen')), models.When(state_abbrv='ST', then=models.Value('Sachsen-Anhalt')), models.When(state_abbrv='SH', then=models.Value('Schleswig-Holstein')), models.When(state_abbrv='TH', then=models.Value('Thüringen')), default=models.Value('')), output_field=models.CharField(max_length=22)),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 5.1.6 on 2026-10-17 19:41
+
+import django.db.models.expressions
+import django.db.models.functions.text
+from django.db import migrations, models
+
+
+# A column cannot be altered into a generated one, so both day columns are
+# dropped and added back; the database fills in their values.
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stores', '0026_store_presentation_columns'),
+    ]
+
+    operations = [
+        migrations.RemoveField(
+            model_name='store',
+            name='days_of_operation',
+        ),
+        migrations.RemoveField(
+            model_name='store',
+            name='days_mask',
+        ),
+        migrations.AddField(
+            model_name='store',
+            name='days_mask',
+            field=models.GeneratedField(db_index=True, db_persist=True, expression=django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(django.db.models.expressions.CombinedExpression(models.Case(models.When(montag=True, then=models.Value(1)), default=models.Value(0)), '+', models.Case(models.When(dienstag=True, then=models.Value(2)), default=models.Value(0))), '+', models.Case(models.When(mittwoch=True, then=models.Value(4)), default=models.Value(0))), '+', models.Case(models.When(donnerstag=True, then=models.Value(8)), default=models.Value(0))), '+', models.Case(models.When(freitag=True, then=models.Value(16)), default=models.Value(0))), '+', models.Case(models.When(samstag=True, then=models.Value(32)), default=models.Value(0))), '+', models.Case(models.When(sonntag=True, then=models.Value(64)), default=models.Value(0))), output_field=models.PositiveSmallIntegerField()),
+        ),
+        migrations.AddField(
+            model_name='store',
+            name='days_of_operation',
+            field=models.GeneratedField(db_persist=True, expression=django.db.models.functions.text.Concat(models.Value('['), django.db.models.functions.text.Substr(django.db.models.functions.text.Concat(models.Case(models.When(montag=True, then=models.Value(", 'Montag'")), default=models.Value('')), models.Case(models.When(dienstag=True, then=models.Value(", 'Dienstag'")), default=models.Value('')), models.Case(models.When(mittwoch=True, then=models.Value(", 'Mittwoch'")), default=models.Value('')), models.Case(models.When(donnerstag=True, then=models.Value(", 'Donnerstag'")), default=models.Value('')), models.Case(models.When(freitag=True, then=models.Value(", 'Freitag'")), default=models.Value('')), models.Case(models.When(samstag=True, then=models.Value(", 'Samstag'")), default=models.Value('')), models.Case(models.When(sonntag=True, then=models.Value(", 'Sonntag'")), default=models.Value('')), output_field=models.TextField()), 3), models.Value(']'), output_field=models.TextField()), output_field=models.CharField(max_length=81)),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 5.1.6 on 2026-10-17 19:43
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stores', '0027_store_generated_days_mask'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='StoreListGeneration',
+            fields=[
+                ('user_id', models.PositiveBigIntegerField(primary_key=True, serialize=False)),
+                ('value', models.PositiveBigIntegerField(default=0)),
+            ],
+        ),
+    ]
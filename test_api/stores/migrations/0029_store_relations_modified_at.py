@@ -0,0 +1,18 @@
+# Generated by Django 5.1.6 on 2026-10-17 19:45
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('stores', '0028_store_list_generation'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='store',
+            name='relations_modified_at',
+            field=models.DateTimeField(editable=False, null=True),
+        ),
+    ]
@@ -1,4 +1,8 @@
+import operator
+import unicodedata
+from functools import reduce
 from django.db import models
+from django.db.models.functions import Concat, Substr
 from users.models import CustomUser
 
 
@@ -14,6 +18,105 @@ DAYS_OF_WEEK = [
     "sonntag",
 ]
 
+# Each weekday is one bit of Store.days_mask, montag being the lowest bit.
+DAY_BITS = {day: 1 << index for index, day in enumerate(DAYS_OF_WEEK)}
+ALL_DAY_MASKS = range(1 << len(DAYS_OF_WEEK))
+
+# days_open for every possible mask, so it is a lookup instead of a rebuild.
+DAYS_OPEN_LABELS = tuple(
+    str([day.capitalize() for day in DAYS_OF_WEEK if mask & DAY_BITS[day]])
+    for mask in ALL_DAY_MASKS
+)
+
+
+# Longest DAYS_OPEN_LABELS entry, the one with every day set.
+DAYS_OPEN_LABEL_LENGTH = max(map(len, DAYS_OPEN_LABELS))
+
+
+def day_case(day, value, default):
+    return models.Case(
+        models.When(**{day: True}, then=models.Value(value)),
+        default=models.Value(default),
+    )
+
+
+# Store.days_mask, the sum of the bits of the days a store is open.
+DAYS_MASK_EXPRESSION = reduce(
+    operator.add, (day_case(day, bit, 0) for day, bit in DAY_BITS.items())
+)
+
+# Store.days_of_operation, DAYS_OPEN_LABELS[days_mask] built from the day
+# flags: ", 'Day'" per open day, without the first ", ", in brackets.
+# PostgreSQL does not let a generated column read another one.
+DAYS_OPEN_EXPRESSION = Concat(
+    models.Value("["),
+    Substr(
+        Concat(
+            *(day_case(day, f", '{day.capitalize()}'", "") for day in DAYS_OF_WEEK),
+            output_field=models.TextField(),
+        ),
+        3,
+    ),
+    models.Value("]"),
+    output_field=models.TextField(),
+)
+
+
+def days_to_mask(days):
+    mask = 0
+    for day in days:
+        mask |= DAY_BITS[day]
+    return mask
+
+
+# With only 128 possible masks, every day query is an IN over the indexed
+# days_mask column.
+def masks_with_all(mask):
+    return [value for value in ALL_DAY_MASKS if value & mask == mask]
+
+
+def masks_with_any(mask):
+    return [value for value in ALL_DAY_MASKS if value & mask]
+
+
+def masks_without_any(mask):
+    return [value for value in ALL_DAY_MASKS if not value & mask]
+
+
+def masks_with_at_least(count):
+    return [value for value in ALL_DAY_MASKS if value.bit_count() >= count]
+
+
+MINUTES_PER_DAY = 24 * 60
+
+
+def week_minute(day_index, time_of_day):
+    """Minutes since montag 00:00 of `time_of_day` on DAYS_OF_WEEK[day_index]."""
+    return day_index * MINUTES_PER_DAY + time_of_day.hour * 60 + time_of_day.minute
+
+
+# Umlauts fold to their two-letter spelling, so "Bäcker" and "Baecker" match.
+SEARCH_FOLDING = {"ä": "ae", "ö": "oe", "ü": "ue"}
+
+
+def normalize_search_text(text):
+    """Casefold `text`, fold umlauts and drop other accents.
+
+    Characters are folded one at a time, so a substring of a text always
+    normalizes to a substring of the normalized text.
+    """
+    folded = []
+    for char in text.casefold():
+        char = SEARCH_FOLDING.get(char, char)
+        folded.append(
+            "".join(
+                part
+                for part in unicodedata.normalize("NFKD", char)
+                if not unicodedata.combining(part)
+            )
+        )
+    return "".join(folded)
+
 
 class Store(models.Model):
     STATES = {
@@ -53,22 +156,294 @@ class Store(models.Model):
     freitag = models.BooleanField(default=False)
     samstag = models.BooleanField(default=False)
     sonntag = models.BooleanField(default=False)
+    # Computed by the database, so queryset updates and raw SQL writes of the
+    # day flags keep it in sync.
+    days_mask = models.GeneratedField(
+        expression=DAYS_MASK_EXPRESSION,
+        output_field=models.PositiveSmallIntegerField(),
+        db_persist=True,
+        db_index=True,
+    )
     opening_time = models.TimeField(default="07:00:00")
     closing_time = models.TimeField(default="17:00:00")
     created_at = models.DateTimeField(auto_now_add=True)
     updated_at = models.DateTimeField(auto_now=True)
+    # Bumped when the managers or the owner/manager names shown with the store
+    # change, which do not touch updated_at on their own. Last-Modified is the
+    # later of updated_at and relations_modified_at.
+    relations_version = models.PositiveIntegerField(default=0, editable=False)
+    relations_modified_at = models.DateTimeField(null=True, editable=False)
+    # Presentation values kept by the database, so listing stores reads them
+    # instead of building them per row.
+    days_of_operation = models.GeneratedField(
+        expression=DAYS_OPEN_EXPRESSION,
+        output_field=models.CharField(max_length=DAYS_OPEN_LABEL_LENGTH),
+        db_persist=True,
+    )
+    location = models.GeneratedField(
+        expression=Concat(
+            "address",
+            models.Value(", "),
+            "city",
+            models.Value(", "),
+            "state_abbrv",
+            output_field=models.TextField(),
+        ),
+        output_field=models.TextField(),
+        db_persist=True,
+    )
+    state = models.GeneratedField(
+        expression=models.Case(
+            *(
+                models.When(state_abbrv=abbrv, then=models.Value(name))
+                for abbrv, name in STATES.items()
+            ),
+            default=models.Value(""),
+        ),
+        output_field=models.CharField(max_length=max(map(len, STATES.values()))),
+        db_persist=True,
+    )
 
     class Meta:
         ordering = ["id"]
+        # One index per StoreFilter lookup and OrderingFilter key. The id
+        # column keeps rows with equal values in default (id) order, so a page
+        # is read off the index without a sort.
+        indexes = [
+            models.Index(fields=["plz", "id"], name="store_plz_idx"),
+            models.Index(fields=["state_abbrv", "city"], name="store_state_city_idx"),
+            models.Index(fields=["name", "id"], name="store_name_idx"),
+            models.Index(fields=["city", "id"], name="store_city_idx"),
+            models.Index(fields=["opening_time", "id"], name="store_opening_idx"),
+            models.Index(fields=["closing_time", "id"], name="store_closing_idx"),
+        ]
 
     @property
-    def location(self):
-        return f"{self.address}, {self.city}, {self.state_abbrv}"
+    def days_open(self):
+        return self.days_of_operation
 
-    @property
-    def state(self):
-        return self.STATES[self.state_abbrv]
+    def compute_days_mask(self):
+        return days_to_mask(day for day in DAYS_OF_WEEK if getattr(self, day))
 
-    @property
-    def days_open(self):
-        return str([day.capitalize() for day in DAYS_OF_WEEK if getattr(self, day)])
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self.set_presentation_values()
+
+    def set_presentation_values(self):
+        # save() does not read the generated columns back; their values are
+        # cheap to mirror here instead of costing a query on the next access.
+        self.days_mask = self.compute_days_mask()
+        self.days_of_operation = DAYS_OPEN_LABELS[self.days_mask]
+        self.location = f"{self.address}, {self.city}, {self.state_abbrv}"
+        self.state = self.STATES.get(self.state_abbrv, "")
+
+
+class StoreAccess(models.Model):
+    """Materialized (user, store, role) rows that decide store visibility.
+
+    Maintained by the signal handlers in stores.signals; rebuild it with
+    `python manage.py rebuild_store_access`.
+    """
+
+    OWNER = "owner"
+    MANAGER = "manager"
+    ROLES = {OWNER: "Owner", MANAGER: "Manager"}
+
+    user = models.ForeignKey(
+        CustomUser, on_delete=models.CASCADE, related_name="store_access"
+    )
+    store = models.ForeignKey(Store, on_delete=models.CASCADE, related_name="access")
+    role = models.CharField(max_length=7, choices=ROLES.items())
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(
+                fields=["user", "store", "role"], name="unique_store_access"
+            ),
+        ]
+
+    @classmethod
+    def rebuild(cls, batch_size=2000):
+        """Recreate every row from Store.owner_id and Store.manager_ids."""
+        cls.objects.all().delete()
+        owners = Store.objects.values_list("id", "owner_id")
+        managers = Store.manager_ids.through.objects.values_list(
+            "store_id", "customuser_id"
+        )
+        batch = []
+        for role, pairs in ((cls.OWNER, owners), (cls.MANAGER, managers)):
+            for store_id, user_id in pairs.iterator(chunk_size=batch_size):
+                batch.append(cls(user_id=user_id, store_id=store_id, role=role))
+                if len(batch) == batch_size:
+                    cls.objects.bulk_create(batch)
+                    batch = []
+        cls.objects.bulk_create(batch)
+        return cls.objects.count()
+
+
+class StoreSearch(models.Model):
+    """Normalized copies of the searchable text of a store, one row per store.
+
+    On SQLite the stores_storesearch_fts FTS5 table (trigram tokenizer) is kept
+    in sync with this table by triggers, on PostgreSQL every column has a
+    pg_trgm GIN index. Both are created by migration 0023. Maintained by the
+    signal handlers in stores.signals; rebuild it with
+    `python manage.py rebuild_store_search`.
+    """
+
+    COLUMNS = ("name", "city", "address", "owner", "managers")
+
+    store = models.OneToOneField(
+        Store, on_delete=models.CASCADE, primary_key=True, related_name="search"
+    )
+    name = models.TextField()
+    city = models.TextField()
+    address = models.TextField()
+    owner = models.TextField()
+    managers = models.TextField()
+
+    @classmethod
+    def refresh(cls, store_ids):
+        """Recompute the rows of `store_ids` with two queries and one upsert."""
+        store_ids = list(store_ids)
+        if not store_ids:
+            return
+        managers = {}
+        links = Store.manager_ids.through.objects.filter(store_id__in=store_ids)
+        for store_id, first_name, last_name in links.values_list(
+            "store_id", "customuser__first_name", "customuser__last_name"
+        ):
+            managers.setdefault(store_id, []).append(f"{first_name} {last_name}")
+        stores = Store.objects.filter(pk__in=store_ids).values_list(
+            "id",
+            "name",
+            "city",
+            "address",
+            "owner_id__first_name",
+            "owner_id__last_name",
+        )
+        rows = [
+            cls(
+                store_id=store_id,
+                name=normalize_search_text(name),
+                city=normalize_search_text(city),
+                address=normalize_search_text(address),
+                owner=normalize_search_text(f"{first_name} {last_name}"),
+                managers=normalize_search_text(" | ".join(managers.get(store_id, []))),
+            )
+            for store_id, name, city, address, first_name, last_name in stores
+        ]
+        cls.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=["store"],
+            update_fields=list(cls.COLUMNS),
+        )
+
+    @classmethod
+    def rebuild(cls, batch_size=2000):
+        """Recreate every row from the stores and their owners and managers."""
+        cls.objects.all().delete()
+        store_ids = Store.objects.values_list("id", flat=True).order_by("id")
+        batch = []
+        for store_id in store_ids.iterator(chunk_size=batch_size):
+            batch.append(store_id)
+            if len(batch) == batch_size:
+                cls.refresh(batch)
+                batch = []
+        cls.refresh(batch)
+        return cls.objects.count()
+
+
+class StoreOpenInterval(models.Model):
+    """One opening interval of a store, in minutes since montag 00:00.
+
+    A store has one row per open day, [opening_time, closing_time) of that
+    day, so "open at minute m" is the range lookup in `stores_open_at`.
+    Maintained by the signal handlers in stores.signals and by the bulk
+    schedule updates; rebuild it with `python manage.py rebuild_store_open_intervals`.
+    """
+
+    store = models.ForeignKey(
+        Store, on_delete=models.CASCADE, related_name="open_intervals"
+    )
+    start_minute = models.PositiveSmallIntegerField()
+    end_minute = models.PositiveSmallIntegerField()
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=["start_minute", "end_minute", "store"],
+                name="store_open_interval_idx",
+            ),
+        ]
+
+    @classmethod
+    def intervals(cls, store_id, days_mask, opening_time, closing_time):
+        if opening_time >= closing_time:
+            return []
+        return [
+            cls(
+                store_id=store_id,
+                start_minute=week_minute(index, opening_time),
+                end_minute=week_minute(index, closing_time),
+            )
+            for index, day in enumerate(DAYS_OF_WEEK)
+            if days_mask & DAY_BITS[day]
+        ]
+
+    @classmethod
+    def refresh(cls, store_ids):
+        """Recompute the intervals of `store_ids` from their days and hours."""
+        store_ids = list(store_ids)
+        if not store_ids:
+            return
+        stores = Store.objects.filter(pk__in=store_ids).values_list(
+            "id", "days_mask", "opening_time", "closing_time"
+        )
+        rows = [row for store in stores for row in cls.intervals(*store)]
+        cls.objects.filter(store_id__in=store_ids).delete()
+        cls.objects.bulk_create(rows)
+
+    @classmethod
+    def rebuild(cls, batch_size=2000):
+        """Recreate every row from the stores' days and hours."""
+        cls.objects.all().delete()
+        stores = Store.objects.values_list(
+            "id", "days_mask", "opening_time", "closing_time"
+        )
+        batch = []
+        for store in stores.iterator(chunk_size=batch_size):
+            batch.extend(cls.intervals(*store))
+            if len(batch) >= batch_size:
+                cls.objects.bulk_create(batch)
+                batch = []
+        cls.objects.bulk_create(batch)
+        return cls.objects.count()
+
+    @classmethod
+    def stores_open_at(cls, minute):
+        """Ids of the stores open at `minute` of the week.
+
+        Intervals never span more than a day, so only intervals starting in
+        the day before `minute` are read from the index.
+        """
+        return cls.objects.filter(
+            start_minute__lte=minute,
+            start_minute__gt=minute - MINUTES_PER_DAY,
+            end_minute__gt=minute,
+        ).values("store_id")
+
+
+class StoreListGeneration(models.Model):
+    """Generation counter of the cached store lists of one user.
+
+    Kept in the database, so every process sees a bump together with the
+    changes it covers. The row with user_id 0 is shared by all superusers.
+    Maintained by stores.cache.
+    """
+
+    SUPERUSERS = 0
+
+    user_id = models.PositiveBigIntegerField(primary_key=True)
+    value = models.PositiveBigIntegerField(default=0)
@@ -0,0 +1,99 @@
+"""
+Substring search over store names, cities, addresses, owners and managers.
+
+The text is looked up in StoreSearch, whose columns hold casefolded copies
+with umlauts folded (see `normalize_search_text`). On SQLite the lookup is a
+MATCH against the trigram FTS5 table stores_storesearch_fts, on PostgreSQL a
+LIKE that the pg_trgm GIN index of each column answers. Terms shorter than a
+trigram cannot use either index and fall back to LIKE.
+
+`search_stores` implements the ranked `search` parameter. `contains_candidates`
+narrows the stores for an `icontains` filter to those the index can match,
+which is a superset of the exact matches, so the exact lookup only runs on
+the candidates.
+"""
+
+from functools import reduce
+from operator import add
+from django.db import connections
+from django.db.models import Case, Q, Value, When
+from django.db.models.expressions import RawSQL
+from .models import StoreSearch, normalize_search_text
+
+FTS_TABLE = "stores_storesearch_fts"
+MIN_INDEXED_LENGTH = 3
+
+# Points a term scores for each column it occurs in; a name starting with the
+# term scores NAME_PREFIX_WEIGHT on top.
+COLUMN_WEIGHTS = {"name": 8, "city": 4, "address": 2, "owner": 1, "managers": 1}
+NAME_PREFIX_WEIGHT = 4
+
+
+def search_terms(query):
+    return normalize_search_text(query).split()
+
+
+def _fts_phrase(term):
+    return '"' + term.replace('"', '""') + '"'
+
+
+def _uses_fts(queryset):
+    return connections[queryset.db].vendor == "sqlite"
+
+
+def _fts_match(expression):
+    sql = f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s"
+    return Q(id__in=RawSQL(sql, [expression]))
+
+
+def contains_candidates(queryset, column, value):
+    """Stores whose StoreSearch `column` contains the normalized `value`."""
+    term = normalize_search_text(value)
+    if len(term) < MIN_INDEXED_LENGTH:
+        return queryset
+    if _uses_fts(queryset):
+        return queryset.filter(_fts_match(f"{column} : {_fts_phrase(term)}"))
+    return queryset.filter(**{f"search__{column}__contains": term})
+
+
+def _in_any_column(term):
+    return reduce(
+        lambda left, right: left | right,
+        (Q(**{f"search__{column}__contains": term}) for column in StoreSearch.COLUMNS),
+    )
+
+
+def search_rank(terms):
+    scores = []
+    for term in terms:
+        scores.append(
+            Case(
+                When(search__name__startswith=term, then=Value(NAME_PREFIX_WEIGHT)),
+                default=Value(0),
+            )
+        )
+        for column, weight in COLUMN_WEIGHTS.items():
+            scores.append(
+                Case(
+                    When(**{f"search__{column}__contains": term}, then=Value(weight)),
+                    default=Value(0),
+                )
+            )
+    return reduce(add, scores) if scores else Value(0)
+
+
+def search_stores(queryset, query):
+    """Stores containing every term of `query`, best matches first."""
+    terms = search_terms(query)
+    indexed = [term for term in terms if len(term) >= MIN_INDEXED_LENGTH]
+    if indexed and _uses_fts(queryset):
+        # Implicit AND: every phrase has to occur in some column.
+        queryset = queryset.filter(_fts_match(" ".join(map(_fts_phrase, indexed))))
+        unindexed = [term for term in terms if term not in indexed]
+    else:
+        unindexed = terms
+    for term in unindexed:
+        queryset = queryset.filter(_in_any_column(term))
+    return queryset.annotate(search_rank=search_rank(terms)).order_by(
+        "-search_rank", "id"
+    )
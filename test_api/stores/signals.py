@@ -0,0 +1,156 @@
+from django.db.models import F
+from django.db.models.signals import (
+    m2m_changed,
+    post_delete,
+    post_save,
+    pre_delete,
+    pre_save,
+)
+from django.dispatch import receiver
+from django.utils import timezone
+from users.models import CustomUser
+from .cache import batches, bump_generations
+from .models import Store, StoreAccess, StoreOpenInterval, StoreSearch
+
+# Store responses render owners and managers with CustomUser.__str__ and
+# side-load their names and emails with `include`.
+USER_DISPLAY_FIELDS = ("first_name", "last_name", "email")
+
+
+def touch_store_relations(store_ids):
+    """Mark related data of `store_ids` as changed for ETags and Last-Modified."""
+    Store.objects.filter(pk__in=store_ids).update(
+        relations_version=F("relations_version") + 1,
+        relations_modified_at=timezone.now(),
+    )
+
+
+def refresh_manager_relations(pairs):
+    """Refresh what depends on the added or removed (store id, manager id) pairs."""
+    # Removed managers no longer have an access row, so name them explicitly.
+    store_ids = {store_id for store_id, _ in pairs}
+    user_ids = {user_id for _, user_id in pairs}
+    touch_store_relations(store_ids)
+    StoreSearch.refresh(store_ids)
+    bump_generations(store_ids, user_ids)
+
+
+@receiver(post_save, sender=Store)
+def sync_owner_access(sender, instance, raw=False, **kwargs):
+    if raw:
+        return
+    previous_owners = list(
+        StoreAccess.objects.filter(
+            store_id=instance.pk, role=StoreAccess.OWNER
+        ).values_list("user_id", flat=True)
+    )
+    StoreAccess.objects.update_or_create(
+        store_id=instance.pk,
+        role=StoreAccess.OWNER,
+        defaults={"user_id": instance.owner_id_id},
+    )
+    StoreSearch.refresh([instance.pk])
+    bump_generations([instance.pk], previous_owners)
+
+
+@receiver(post_save, sender=Store)
+def sync_open_intervals(sender, instance, raw=False, **kwargs):
+    if not raw:
+        StoreOpenInterval.refresh([instance.pk])
+
+
+@receiver(pre_delete, sender=Store)
+def remember_store_access(sender, instance, **kwargs):
+    # The access rows are gone by post_delete, so collect their users now.
+    instance._access_user_ids = list(
+        StoreAccess.objects.filter(store_id=instance.pk).values_list(
+            "user_id", flat=True
+        )
+    )
+
+
+@receiver(post_delete, sender=Store)
+def invalidate_deleted_store(sender, instance, **kwargs):
+    bump_generations([instance.pk], getattr(instance, "_access_user_ids", ()))
+
+
+@receiver(m2m_changed, sender=Store.manager_ids.through)
+def sync_manager_access(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == "pre_clear":
+        # pk_set is empty on clear, so remember who is about to be removed.
+        if reverse:
+            instance._cleared_store_ids = list(
+                instance.managed_stores.values_list("id", flat=True)
+            )
+        else:
+            instance._cleared_manager_ids = list(
+                instance.manager_ids.values_list("id", flat=True)
+            )
+        return
+    if action not in {"post_add", "post_remove", "post_clear"}:
+        return
+    if reverse:
+        # instance is a user and pk_set holds store ids.
+        pairs = [(pk, instance.pk) for pk in pk_set or ()]
+        rows = StoreAccess.objects.filter(user_id=instance.pk, store_id__in=pk_set or ())
+        clear_rows = StoreAccess.objects.filter(user_id=instance.pk)
+    else:
+        pairs = [(instance.pk, pk) for pk in pk_set or ()]
+        rows = StoreAccess.objects.filter(store_id=instance.pk, user_id__in=pk_set or ())
+        clear_rows = StoreAccess.objects.filter(store_id=instance.pk)
+
+    if action == "post_add":
+        StoreAccess.objects.bulk_create(
+            [
+                StoreAccess(store_id=store_id, user_id=user_id, role=StoreAccess.MANAGER)
+                for store_id, user_id in pairs
+            ],
+            ignore_conflicts=True,
+        )
+    elif action == "post_remove":
+        rows.filter(role=StoreAccess.MANAGER).delete()
+    else:
+        clear_rows.filter(role=StoreAccess.MANAGER).delete()
+        if reverse:
+            pairs = [(pk, instance.pk) for pk in instance._cleared_store_ids]
+        else:
+            pairs = [(instance.pk, pk) for pk in instance._cleared_manager_ids]
+
+    refresh_manager_relations(pairs)
+
+
+def user_display_values(user):
+    return tuple(getattr(user, field) for field in USER_DISPLAY_FIELDS)
+
+
+@receiver(pre_save, sender=CustomUser)
+def remember_user_display(sender, instance, raw=False, update_fields=None, **kwargs):
+    # Password, flag and login saves leave the stores of the user alone, so
+    # post_save compares against the stored values instead of always
+    # refreshing them.
+    instance._stored_display_values = None
+    if raw or instance._state.adding:
+        return
+    if update_fields is not None and not set(USER_DISPLAY_FIELDS) & set(update_fields):
+        return
+    instance._stored_display_values = (
+        CustomUser.objects.filter(pk=instance.pk)
+        .values_list(*USER_DISPLAY_FIELDS)
+        .first()
+    )
+
+
+@receiver(post_save, sender=CustomUser)
+def invalidate_user_stores(sender, instance, created, **kwargs):
+    stored = getattr(instance, "_stored_display_values", None)
+    if created or stored is None or stored == user_display_values(instance):
+        return
+    store_ids = list(
+        StoreAccess.objects.filter(user_id=instance.pk)
+        .values_list("store_id", flat=True)
+        .distinct()
+    )
+    for batch in batches(store_ids):
+        touch_store_relations(batch)
+        StoreSearch.refresh(batch)
+    bump_generations(store_ids, [instance.pk])
@@ -1,8 +1,31 @@
 from django.test import TestCase
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
+from concurrent.futures import ThreadPoolExecutor
 from datetime import time
-from stores.models import Store
+from django.core.management import call_command
+from django.db.models import Max
+from io import StringIO
+from unittest import mock
+from rest_framework.authtoken.models import Token
+from stores.membership import (
+    ADD,
+    REMOVE,
+    REPLACE,
+    TOGGLE,
+    manager_diff,
+    update_managers,
+)
+from stores.models import (
+    DAY_BITS,
+    DAYS_OPEN_LABELS,
+    Store,
+    StoreAccess,
+    StoreOpenInterval,
+    StoreSearch,
+    normalize_search_text,
+)
+from test_api import load_data
 
 
 # Test data for users and store
@@ -71,6 +94,47 @@ class StoreModelTest(BaseTestCase):
         self.store.save()
         self.assertEqual(self.store.days_open, str([day.capitalize() for day in days]))
 
+    def test_days_mask_kept_in_sync(self):
+        self.assertEqual(self.store.days_mask, 0)
+        self.store.montag = True
+        self.store.sonntag = True
+        self.store.save()
+        self.store.refresh_from_db()
+        self.assertEqual(self.store.days_mask, 0b1000001)
+        self.store.montag = False
+        self.store.save(update_fields=["montag"])
+        self.store.refresh_from_db()
+        self.assertEqual(self.store.days_mask, 0b1000000)
+        self.assertEqual(self.store.days_open, str(["Sonntag"]))
+
+    def test_presentation_columns_follow_queryset_updates(self):
+        Store.objects.filter(pk=self.store.pk).update(
+            city="Hamburg", state_abbrv="HH", montag=True, sonntag=True
+        )
+        store = Store.objects.get(pk=self.store.pk)
+        self.assertEqual(store.days_mask, 0b1000001)
+        self.assertEqual(store.location, "123 Main St, Hamburg, HH")
+        self.assertEqual(store.state, "Hamburg")
+        self.assertEqual(store.days_of_operation, str(["Montag", "Sonntag"]))
+
+    def test_presentation_columns_match_every_mask(self):
+        for mask, label in enumerate(DAYS_OPEN_LABELS):
+            Store.objects.filter(pk=self.store.pk).update(
+                **{day: bool(mask & bit) for day, bit in DAY_BITS.items()}
+            )
+            self.store.refresh_from_db(fields=["days_mask", "days_of_operation"])
+            self.assertEqual(self.store.days_mask, mask)
+            self.assertEqual(self.store.days_of_operation, label)
+
+    def test_presentation_values_set_on_save(self):
+        self.store.state_abbrv = "BY"
+        self.store.samstag = True
+        self.store.save()
+        with self.assertNumQueries(0):
+            self.assertEqual(self.store.state, "Bayern")
+            self.assertEqual(self.store.location, "123 Main St, Test City, BY")
+            self.assertEqual(self.store.days_open, str(["Samstag"]))
+
     # Validation Tests
     def test_invalid_state_abbreviation(self):
         with self.assertRaises(ValidationError) as e:
@@ -188,3 +252,275 @@ class StoreModelTest(BaseTestCase):
         self.owner.delete()
         # Store should be deleted when owner is deleted due to CASCADE
         self.assertFalse(Store.objects.filter(id=store_id).exists())
+
+
+class StoreAccessTest(BaseTestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(**OWNER_DATA)
+        self.manager = User.objects.create_user(**MANAGER_DATA)
+        self.store = Store.objects.create(owner_id=self.owner, **STORE_DATA)
+
+    def access_rows(self):
+        return set(
+            StoreAccess.objects.filter(store=self.store).values_list("user_id", "role")
+        )
+
+    def test_owner_row_created_and_moved(self):
+        self.assertEqual(self.access_rows(), {(self.owner.id, StoreAccess.OWNER)})
+        self.store.owner_id = self.manager
+        self.store.save()
+        self.assertEqual(self.access_rows(), {(self.manager.id, StoreAccess.OWNER)})
+
+    def test_manager_rows_follow_m2m_changes(self):
+        self.store.manager_ids.add(self.manager)
+        self.assertIn((self.manager.id, StoreAccess.MANAGER), self.access_rows())
+        self.store.manager_ids.remove(self.manager)
+        self.assertNotIn((self.manager.id, StoreAccess.MANAGER), self.access_rows())
+        self.manager.managed_stores.add(self.store)
+        self.assertIn((self.manager.id, StoreAccess.MANAGER), self.access_rows())
+        self.manager.managed_stores.clear()
+        self.assertEqual(self.access_rows(), {(self.owner.id, StoreAccess.OWNER)})
+
+    def test_owner_who_is_also_manager(self):
+        self.store.manager_ids.add(self.owner)
+        self.assertEqual(len(self.access_rows()), 2)
+        self.store.manager_ids.clear()
+        self.assertEqual(self.access_rows(), {(self.owner.id, StoreAccess.OWNER)})
+
+    def test_rows_deleted_with_store(self):
+        self.store.manager_ids.add(self.manager)
+        self.store.delete()
+        self.assertFalse(StoreAccess.objects.exists())
+
+    def test_rebuild_command(self):
+        self.store.manager_ids.add(self.manager)
+        expected = self.access_rows()
+        StoreAccess.objects.all().delete()
+        out = StringIO()
+        call_command("rebuild_store_access", stdout=out)
+        self.assertEqual(self.access_rows(), expected)
+        self.assertIn("Rebuilt 2 store access rows", out.getvalue())
+
+
+class ManagerMembershipTest(BaseTestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(**OWNER_DATA)
+        self.manager = User.objects.create_user(**MANAGER_DATA)
+        self.other = User.objects.create_user(
+            **{**MANAGER_DATA, "email": "other@example.com"}
+        )
+        self.store = Store.objects.create(owner_id=self.owner, **STORE_DATA)
+        self.store.manager_ids.add(self.manager)
+
+    def managers(self):
+        return set(self.store.manager_ids.values_list("id", flat=True))
+
+    def manager_access(self):
+        return set(
+            StoreAccess.objects.filter(
+                store=self.store, role=StoreAccess.MANAGER
+            ).values_list("user_id", flat=True)
+        )
+
+    def test_diff_per_operation(self):
+        users = [self.manager.id, self.other.id]
+        self.assertEqual(
+            manager_diff(self.store.pk, users, TOGGLE), ({self.other.id}, {self.manager.id})
+        )
+        self.assertEqual(manager_diff(self.store.pk, users, ADD), ({self.other.id}, set()))
+        self.assertEqual(
+            manager_diff(self.store.pk, users, REMOVE), (set(), {self.manager.id})
+        )
+        self.assertEqual(
+            manager_diff(self.store.pk, [self.other.id], REPLACE),
+            ({self.other.id}, {self.manager.id}),
+        )
+
+    def test_toggle_keeps_access_and_search_in_sync(self):
+        self.store.refresh_from_db()
+        version = self.store.relations_version
+        added, removed = update_managers(self.store, [self.manager.id, self.other.id])
+        self.assertEqual((added, removed), ({self.other.id}, {self.manager.id}))
+        self.assertEqual(self.managers(), {self.other.id})
+        self.assertEqual(self.manager_access(), {self.other.id})
+        self.store.refresh_from_db()
+        self.assertEqual(self.store.relations_version, version + 1)
+        self.assertEqual(
+            self.store.search.managers, normalize_search_text(f"{self.other.first_name} {self.other.last_name}")
+        )
+
+    def test_replace_and_noop(self):
+        update_managers(self.store, [], REPLACE)
+        self.assertEqual(self.managers(), set())
+        self.assertEqual(self.manager_access(), set())
+        with self.assertNumQueries(0):
+            self.assertEqual(update_managers(self.store, [], ADD), (set(), set()))
+
+    def test_unknown_operation(self):
+        with self.assertRaises(ValueError):
+            update_managers(self.store, [self.other.id], "merge")
+
+
+class StoreSearchTest(BaseTestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(**OWNER_DATA)
+        self.manager = User.objects.create_user(**MANAGER_DATA)
+        self.store = Store.objects.create(owner_id=self.owner, **STORE_DATA)
+
+    def search_row(self):
+        return StoreSearch.objects.get(store=self.store)
+
+    def test_normalize_search_text(self):
+        self.assertEqual(normalize_search_text("Bäcker"), "baecker")
+        self.assertEqual(normalize_search_text("BAECKER"), "baecker")
+        self.assertEqual(normalize_search_text("Straße"), "strasse")
+        self.assertEqual(normalize_search_text("Café Größe"), "cafe groesse")
+
+    def test_row_follows_store_and_people(self):
+        self.assertEqual(self.search_row().name, "test store")
+        self.assertEqual(self.search_row().owner, "owner test")
+        self.store.name = "Bäckerei"
+        self.store.save()
+        self.assertEqual(self.search_row().name, "baeckerei")
+        self.store.manager_ids.add(self.manager)
+        self.assertEqual(self.search_row().managers, "manager test")
+        self.manager.first_name = "Jürgen"
+        self.manager.save()
+        self.assertEqual(self.search_row().managers, "juergen test")
+        self.store.manager_ids.clear()
+        self.assertEqual(self.search_row().managers, "")
+
+    def test_row_deleted_with_store(self):
+        self.store.delete()
+        self.assertFalse(StoreSearch.objects.exists())
+
+    def test_user_saves_without_name_changes_leave_stores_alone(self):
+        self.store.refresh_from_db()
+        version = self.store.relations_version
+        self.owner.is_staff = True
+        self.owner.set_password("ANOTHER_password123")
+        with self.assertNumQueries(2):
+            self.owner.save()
+        self.store.refresh_from_db()
+        self.assertEqual(self.store.relations_version, version)
+        self.owner.email = "renamed@example.com"
+        self.owner.save()
+        self.store.refresh_from_db()
+        self.assertEqual(self.store.relations_version, version + 1)
+
+    def test_rebuild_command(self):
+        StoreSearch.objects.all().delete()
+        out = StringIO()
+        call_command("rebuild_store_search", stdout=out)
+        self.assertEqual(self.search_row().city, "test city")
+        self.assertIn("Rebuilt 1 store search rows", out.getvalue())
+
+
+class StoreOpenIntervalTest(BaseTestCase):
+    def setUp(self):
+        self.owner = User.objects.create_user(**OWNER_DATA)
+        self.store = Store.objects.create(
+            owner_id=self.owner, montag=True, samstag=True, **STORE_DATA
+        )
+
+    def intervals(self):
+        return list(
+            StoreOpenInterval.objects.filter(store=self.store)
+            .order_by("start_minute")
+            .values_list("start_minute", "end_minute")
+        )
+
+    def test_intervals_follow_days_and_hours(self):
+        # montag and samstag, 09:00 to 17:00
+        self.assertEqual(self.intervals(), [(540, 1020), (7740, 8220)])
+        self.store.samstag = False
+        self.store.closing_time = time(18, 30)
+        self.store.save()
+        self.assertEqual(self.intervals(), [(540, 1110)])
+
+    def test_stores_open_at(self):
+        def is_open(minute):
+            open_ids = StoreOpenInterval.stores_open_at(minute)
+            return Store.objects.filter(pk__in=open_ids).exists()
+
+        self.assertTrue(is_open(540))
+        self.assertTrue(is_open(1019))
+        self.assertFalse(is_open(1020))
+        self.assertFalse(is_open(539))
+        self.assertFalse(is_open(1440 + 600))
+        self.assertTrue(is_open(5 * 1440 + 600))
+
+    def test_rebuild_command(self):
+        StoreOpenInterval.objects.all().delete()
+        out = StringIO()
+        call_command("rebuild_store_open_intervals", stdout=out)
+        self.assertEqual(len(self.intervals()), 2)
+        self.assertIn("Rebuilt 2 store opening intervals", out.getvalue())
+
+
+class PopulateTest(TestCase):
+    def store_values(self, store_ids):
+        stores = Store.objects.filter(pk__in=store_ids).order_by("id")
+        return list(stores.values_list(*load_data.STORE_FIELDS))
+
+    def derived_rows(self):
+        return (
+            set(StoreAccess.objects.values_list("user", "store", "role")),
+            list(StoreSearch.objects.order_by("store").values()),
+            set(StoreOpenInterval.objects.values_list("store", "start_minute")),
+        )
+
+    def test_populate(self):
+        store_ids, user_ids = load_data.populate(30, 45, seed=1)
+        self.assertEqual(len(store_ids), 30)
+        self.assertEqual(Token.objects.filter(user__in=user_ids).count(), 45)
+        stores = Store.objects.filter(pk__in=store_ids)
+        self.assertEqual(len({store.owner_id_id for store in stores}), 30)
+        for store in stores:
+            self.assertEqual(store.days_mask, store.compute_days_mask())
+            self.assertGreaterEqual(len(store.days_open.split(",")), 3)
+            self.assertTrue(1 <= store.manager_ids.count() <= 4)
+        self.assertTrue(
+            User.objects.get(pk=user_ids[0]).check_password(load_data.PASSWORD)
+        )
+
+        # The rows the skipped signal handlers would write match a rebuild.
+        rows = self.derived_rows()
+        StoreAccess.rebuild()
+        StoreSearch.rebuild()
+        StoreOpenInterval.rebuild()
+        self.assertEqual(self.derived_rows(), rows)
+
+    def test_deterministic_across_workers(self):
+        with mock.patch.object(load_data, "CHUNK_SIZE", 10):
+            first, _ = load_data.populate(25, 40, seed=2, workers=1)
+            second, _ = load_data.populate(25, 40, seed=2, workers=2)
+        self.assertEqual(self.store_values(first), self.store_values(second))
+        third, _ = load_data.populate(25, 40, seed=3, workers=1)
+        self.assertNotEqual(self.store_values(first), self.store_values(third))
+
+    def test_tokens_follow_the_seed(self):
+        first_index = (User.objects.aggregate(last=Max("pk"))["last"] or 0) + 1
+        _, user_ids = load_data.populate(3, 5, seed=4)
+        tokens = Token.objects.filter(user__in=user_ids).order_by("user")
+        rows = load_data.user_rows((0, 5), seed=4, first_index=first_index)
+        self.assertEqual(
+            list(tokens.values_list("key", flat=True)), [row[3] for row in rows]
+        )
+
+    def test_bounded_map_keeps_order(self):
+        with ThreadPoolExecutor(2) as executor:
+            results = load_data.bounded_map(executor, abs, range(0, -9, -1), limit=2)
+            self.assertEqual(list(results), list(range(9)))
+
+    def test_big_owner(self):
+        owner = User.objects.create_user(**OWNER_DATA)
+        store_ids, _ = load_data.bulk_populate(20, 25, big_owner=owner)
+        self.assertEqual(
+            set(
+                Store.objects.filter(pk__in=store_ids).values_list(
+                    "owner_id", flat=True
+                )
+            ),
+            {owner.pk},
+        )
@@ -1,13 +1,48 @@
+import csv
+import importlib
+import io
+import json
+import re
+from asyncio import iscoroutinefunction
+from datetime import date, datetime, time, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from uuid import UUID
 from django.urls import reverse
 from django.contrib.auth import get_user_model
-from rest_framework import status
+from rest_framework import serializers, status
 from rest_framework.test import APITestCase
 from rest_framework.authtoken.models import Token
-from unittest import skip
-from django.urls import clear_url_caches
-
-from stores.models import Store
-from test_api import load_data as ldb
+from rest_framework.exceptions import ErrorDetail, ParseError
+from rest_framework.settings import api_settings
+from unittest import mock, skip, skipUnless
+from django.urls import clear_url_caches, resolve
+from django.core.cache import cache
+from django.db import connection
+from django.db.models import F
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase, override_settings
+from django.utils.http import parse_http_date
+from django.utils.translation import gettext_lazy
+from django.test.utils import CaptureQueriesContext
+
+from stores.api.filters import StoreFilter
+from stores.api.compiled import CompiledSerializer, compiled_serializer
+from stores.api.serializers import (
+    DaysSerializer,
+    HoursSerializer,
+    ManagersSerializer,
+    StoreSerializer,
+)
+from stores.api.views import (
+    StoreDaysView,
+    StoreHoursView,
+    StoreManagersView,
+    StoreViewSet,
+    get_user_stores,
+)
+from stores.models import Store, StoreListGeneration
+from test_api import fast_json, load_data as ldb, timing
+from users.api.authentication import token_cache
 
 User = get_user_model()
 
@@ -62,6 +97,7 @@ class BaseTestCase(APITestCase):
 
     def setUp(self):
         clear_url_caches()
+        cache.clear()
         self.owner1 = User.objects.create_user(**OWNER1_DATA)
         self.owner2 = User.objects.create_user(**OWNER2_DATA)
         self.manager1 = User.objects.create_user(**MANAGER1_DATA)
@@ -705,6 +741,48 @@ class StoreViewSetTestCase(BaseTestCase):
             response = self.client.get(url)
             self.assertEqual(response.status_code, status.HTTP_200_OK)
 
+    def test_filter_related_and_range_params(self):
+        self.switch_to_superuser()
+        test_cases = (
+            ("owner_first_name=Owner", {"owner_id__first_name__icontains": "Owner"}),
+            ("manager_last_name=Test", {"manager_ids__last_name__icontains": "Test"}),
+            ("opening_time_lte=08:00", {"opening_time__lte": "08:00"}),
+            ("closing_time_gte=12:00", {"closing_time__gte": "12:00"}),
+        )
+
+        for query, lookup in test_cases:
+            response = self.client.get(self.url_list + "?" + query)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            expected_count = Store.objects.filter(**lookup).distinct().count()
+            self.assertEqual(response.data["count"], expected_count)
+
+    def test_filter_field_errors_are_collected(self):
+        self.switch_to_superuser()
+        response = self.client.get(self.url_list + "?plz=123&address=OnlyText")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("exactly 5 digits", str(response.data["plz"]))
+        self.assertIn("numbers and text", str(response.data["address"]))
+
+    def test_filter_invalid_hours_and_days(self):
+        self.switch_to_superuser()
+        test_cases = (
+            ("opening_time=18:00&closing_time=08:00", "closing_time", "later"),
+            ("montag=maybe", "montag", "valid boolean"),
+        )
+
+        for query, field, error_msg in test_cases:
+            response = self.client.get(self.url_list + "?" + query)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn(error_msg, str(response.data[field]))
+
+    def test_filter_validation_does_not_use_serializer(self):
+        self.switch_to_superuser()
+        self.assertIs(StoreFilter.validation_plan(), StoreFilter.validation_plan())
+        with mock.patch.object(StoreSerializer, "is_valid") as is_valid:
+            response = self.client.get(self.url_list + "?name=Test&plz=12345")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        is_valid.assert_not_called()
+
 
 class StoreDaysViewTests(BaseTestCase):
     def setUp(self):
@@ -937,6 +1015,57 @@ class StoreDaysViewTests(BaseTestCase):
             self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
             self.assertIn("Invalid query parameter", str(response.data))
 
+    def test_filter_days_all_any_and_min_days(self):
+        self.switch_to_superuser()
+        stores = Store.objects.all()
+        cases = [
+            (
+                "days_all=montag,freitag",
+                [s for s in stores if s.montag and s.freitag],
+            ),
+            (
+                "days_any=samstag,sonntag",
+                [s for s in stores if s.samstag or s.sonntag],
+            ),
+            (
+                "min_days=4",
+                [s for s in stores if sum(getattr(s, d) for d in self.days_list) >= 4],
+            ),
+            (
+                "days_all=montag&min_days=3",
+                [
+                    s
+                    for s in stores
+                    if s.montag and sum(getattr(s, d) for d in self.days_list) >= 3
+                ],
+            ),
+        ]
+        for query, expected in cases:
+            with self.subTest(query=query):
+                response = self.client.get(self.url_list + "?" + query)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertEqual(response.data["count"], len(expected))
+
+    def test_filter_days_invalid_values(self):
+        self.switch_to_superuser()
+        invalid_queries = [
+            ("?days_all=montag,funday", "Invalid day for days_all"),
+            ("?days_any=weekend", "Invalid day for days_any"),
+            ("?min_days=0", "min_days must be between 1 and 7"),
+            ("?min_days=8", "min_days must be between 1 and 7"),
+        ]
+        for query, error_msg in invalid_queries:
+            response = self.client.get(self.url_list + query)
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+            self.assertIn(error_msg, str(response.data))
+
+    def test_store_list_accepts_day_mask_filters(self):
+        response = self.client.get(
+            reverse("stores-list"), {"days_all": "montag,dienstag"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 2)
+
 
 class StoreHoursViewTests(BaseTestCase):
     def setUp(self):
@@ -1311,6 +1440,83 @@ class StoreManagersViewTests(BaseTestCase):
         response = self.client.put(self.url_detail, data)
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
 
+    def manager_ids(self):
+        return set(self.store1.manager_ids.values_list("id", flat=True))
+
+    def test_manager_operations(self):
+        users = [self.manager1.id, self.manager2.id]
+        response = self.client.patch(
+            self.url_detail, {"manager_ids": users, "operation": "add"}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(set(response.data["manager_ids"]), set(users))
+        self.assertNotIn("operation", response.data)
+
+        self.client.patch(
+            self.url_detail,
+            {"manager_ids": [self.manager1.id, self.owner2.id], "operation": "remove"},
+            format="json",
+        )
+        self.assertEqual(self.manager_ids(), {self.manager2.id})
+
+        self.client.patch(
+            self.url_detail,
+            {"manager_ids": [self.owner2.id, self.manager1.id], "operation": "replace"},
+            format="json",
+        )
+        self.assertEqual(self.manager_ids(), {self.owner2.id, self.manager1.id})
+        self.assertFalse(self.store1.access.filter(user=self.manager2).exists())
+
+        self.client.patch(
+            self.url_detail, {"manager_ids": [], "operation": "replace"}, format="json"
+        )
+        self.assertEqual(self.manager_ids(), set())
+
+    def test_toggle_is_default_operation(self):
+        response = self.client.patch(
+            self.url_detail,
+            {"manager_ids": [self.manager1.id, self.manager2.id]},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["manager_ids"], [self.manager2.id])
+
+    def test_invalid_manager_operation(self):
+        response = self.client.patch(
+            self.url_detail,
+            {"manager_ids": [self.manager2.id], "operation": "merge"},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("operation", response.data)
+        self.assertEqual(self.manager_ids(), {self.manager1.id})
+
+    def test_manager_ids_loaded_with_one_query(self):
+        users = [
+            User.objects.create_user(
+                email=f"user{index}@example.com",
+                password="STRONG_password123",
+                first_name="User",
+                last_name=str(index),
+            )
+            for index in range(5)
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.patch(
+                self.url_detail,
+                {"manager_ids": [user.id for user in users], "operation": "add"},
+                format="json",
+            )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        user_lookups = [
+            query
+            for query in queries
+            if re.match(r'SELECT .* FROM "users_customuser"', query["sql"])
+            and '"users_customuser"."id" IN' in query["sql"]
+        ]
+        self.assertEqual(len(user_lookups), 1)
+        self.assertEqual(self.manager_ids(), {self.manager1.id, *(u.id for u in users)})
+
     def test_update_managers_nonexistent_store(self):
         url = reverse("store-managers-detail", kwargs={"pk": 999})
         data = {"manager_ids": [self.manager2.id]}
@@ -1468,3 +1674,1489 @@ class StoreManagersViewTests(BaseTestCase):
             response = self.client.get(url)
             self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
             self.assertIn("Empty values not allowed", str(response.data))
+
+
+class StoreQueryCountTests(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        for i in range(10):
+            store = Store.objects.create(
+                owner_id=self.owner1,
+                name=f"Query Store {i}",
+                address=f"{i + 1} Query St",
+                city="Query City",
+                state_abbrv="BE",
+                plz="12345",
+            )
+            store.manager_ids.add(self.manager1, self.manager2)
+        self.list_urls = (
+            reverse("stores-list"),
+            reverse("store-days-list"),
+            reverse("store-hours-list"),
+            reverse("store-managers-list"),
+        )
+
+    def _count_queries(self, url, page_size):
+        # Every request looks up its token.
+        token_cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, {"page_size": page_size})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(len(response.data["results"]), page_size)
+        return len(context.captured_queries)
+
+    def test_list_query_count_is_constant(self):
+        for url in self.list_urls:
+            with self.subTest(url=url):
+                small_page = self._count_queries(url, 2)
+                large_page = self._count_queries(url, 10)
+                self.assertEqual(small_page, large_page)
+
+    def test_list_query_count_as_manager(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token3.key}")
+        url = reverse("stores-list")
+        self.assertEqual(self._count_queries(url, 2), self._count_queries(url, 10))
+
+    def test_visibility_query_has_no_distinct(self):
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(reverse("stores-list"))
+        store_queries = [
+            q["sql"] for q in context.captured_queries if "stores_store" in q["sql"]
+        ]
+        self.assertTrue(store_queries)
+        for sql in store_queries:
+            self.assertNotIn("DISTINCT", sql)
+
+    def test_list_serializes_owner_and_managers(self):
+        response = self.client.get(reverse("stores-list"), {"page_size": 12})
+        for store in response.data["results"]:
+            self.assertEqual(store["owner"], str(self.owner1))
+        last_store = response.data["results"][-1]
+        self.assertEqual(
+            set(last_store["managers"]), {str(self.manager1), str(self.manager2)}
+        )
+
+
+class StoreCompiledSerializerTests(BaseTestCase):
+    serializer_classes = (
+        StoreSerializer,
+        DaysSerializer,
+        HoursSerializer,
+        ManagersSerializer,
+    )
+
+    def setUp(self):
+        super().setUp()
+        self.switch_to_superuser()
+        self.store3.manager_ids.add(self.manager2, self.manager1)
+
+    def _get(self, url, params, compiled):
+        cache.clear()
+        with override_settings(STORES_COMPILED_SERIALIZERS=compiled):
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response
+
+    def test_compiled_data_renders_byte_identical_json(self):
+        renderer = fast_json.JSONRenderer()
+        queryset = get_user_stores(self.super_user).order_by("id")
+        for serializer_class in self.serializer_classes:
+            with self.subTest(serializer=serializer_class.__name__):
+                compiled = compiled_serializer(serializer_class)
+                data = compiled.data(compiled.load(compiled.rows(queryset)))
+                expected = serializer_class(queryset, many=True).data
+                self.assertEqual(renderer.render(data), renderer.render(expected))
+
+    def test_list_responses_are_byte_identical(self):
+        queries = {
+            reverse("stores-list"): (
+                {},
+                {"page_size": 100},
+                {"ordering": "-manager_last_name", "page_size": 100},
+                {"search": "Test", "page_size": 5},
+                {"pagination": "cursor", "ordering": "-owner_first_name"},
+            ),
+            reverse("store-days-list"): (
+                {},
+                {"montag": "true", "page_size": 100},
+                {"pagination": "cursor"},
+            ),
+            reverse("store-hours-list"): (
+                {},
+                {"ordering": "-closes", "page_size": 100},
+                {"pagination": "cursor", "ordering": "opens"},
+            ),
+        }
+        for url, params_list in queries.items():
+            for params in params_list:
+                with self.subTest(url=url, params=params):
+                    compiled = self._get(url, params, compiled=True)
+                    expected = self._get(url, params, compiled=False)
+                    self.assertEqual(compiled.content, expected.content)
+                    self.assertEqual(compiled["ETag"], expected["ETag"])
+
+    def test_managers_list_is_byte_identical(self):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token1.key}")
+        url = reverse("store-managers-list")
+        for params in ({}, {"ordering": "first_name"}, {"pagination": "cursor"}):
+            with self.subTest(params=params):
+                compiled = self._get(url, params, compiled=True)
+                expected = self._get(url, params, compiled=False)
+                self.assertEqual(compiled.content, expected.content)
+
+    def test_cursor_pages_follow_compiled_rows(self):
+        url = reverse("stores-list")
+        params = {"pagination": "cursor", "ordering": "city", "page_size": 4}
+        ids = []
+        response = self._get(url, params, compiled=True)
+        while True:
+            ids.extend(store["id"] for store in response.data["results"])
+            if not response.data["next"]:
+                break
+            response = self._get(response.data["next"], {}, compiled=True)
+        expected = Store.objects.order_by("city", "id").values_list("id", flat=True)
+        self.assertEqual(ids, list(expected))
+
+    def test_unknown_method_field_cannot_be_compiled(self):
+        class CountingSerializer(DaysSerializer):
+            manager_count = serializers.SerializerMethodField()
+
+            class Meta(DaysSerializer.Meta):
+                fields = DaysSerializer.Meta.fields + ["manager_count"]
+
+        with self.assertRaisesMessage(ImproperlyConfigured, "manager_count"):
+            CompiledSerializer(CountingSerializer)
+
+
+class StoreSparseFieldsetTests(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.url_list = reverse("stores-list")
+        self.url_detail = reverse("stores-detail", kwargs={"pk": self.store1.pk})
+
+    def _sql(self, url, params):
+        cache.clear()
+        with CaptureQueriesContext(connection) as context:
+            response = self.client.get(url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # Leave out the token lookup of authentication, which joins the user.
+        sql = [query["sql"] for query in context.captured_queries]
+        return response, " ".join(q for q in sql if "authtoken_token" not in q)
+
+    def test_fields_select_list_fields_in_serializer_order(self):
+        params = {"fields": "days_of_operation,name,id"}
+        for compiled in (True, False):
+            with self.subTest(compiled=compiled):
+                with override_settings(STORES_COMPILED_SERIALIZERS=compiled):
+                    response, _ = self._sql(self.url_list, params)
+                for store in response.data["results"]:
+                    self.assertEqual(list(store), ["id", "days_of_operation", "name"])
+
+    def test_exclude_drops_fields(self):
+        response, _ = self._sql(self.url_list, {"exclude": "owner,managers"})
+        store = response.data["results"][0]
+        self.assertNotIn("owner", store)
+        self.assertNotIn("managers", store)
+        self.assertIn("manager_ids", store)
+
+    def test_skipped_relations_are_not_queried(self):
+        params = {"fields": "id,name,days_of_operation"}
+        for compiled in (True, False):
+            with self.subTest(compiled=compiled):
+                with override_settings(STORES_COMPILED_SERIALIZERS=compiled):
+                    _, sql = self._sql(self.url_list, params)
+                    _, detail_sql = self._sql(self.url_detail, params)
+                for sql in (sql, detail_sql):
+                    self.assertNotIn("stores_store_manager_ids", sql)
+                    self.assertNotIn('JOIN "users_customuser"', sql)
+
+    def test_owner_is_joined_only_when_selected(self):
+        _, sql = self._sql(self.url_list, {"fields": "id,owner"})
+        self.assertIn('JOIN "users_customuser"', sql)
+        self.assertNotIn("stores_store_manager_ids", sql)
+
+    def test_detail_fieldset(self):
+        response, _ = self._sql(self.url_detail, {"fields": "id,name"})
+        self.assertEqual(
+            response.data,
+            {"id": self.store1.pk, "name": self.store1.name, "message": mock.ANY},
+        )
+
+    def test_detail_etag_depends_on_fieldset(self):
+        full, _ = self._sql(self.url_detail, {})
+        sparse, _ = self._sql(self.url_detail, {"fields": "id"})
+        self.assertNotEqual(full["ETag"], sparse["ETag"])
+        response = self.client.get(
+            self.url_detail, {"fields": "id"}, HTTP_IF_NONE_MATCH=full["ETag"]
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_schedule_views_accept_fieldsets(self):
+        for url, fields in (
+            (reverse("store-days-list"), ["id", "montag"]),
+            (reverse("store-hours-list"), ["id", "opening_time"]),
+            (reverse("store-managers-list"), ["id", "manager_ids"]),
+        ):
+            with self.subTest(url=url):
+                response, _ = self._sql(url, {"fields": ",".join(fields)})
+                self.assertEqual(list(response.data["results"][0]), fields)
+
+    def test_unknown_fields_are_rejected(self):
+        for params in ({"fields": "id,secret"}, {"exclude": "opening_time"}):
+            with self.subTest(params=params):
+                url = reverse("store-days-list")
+                response = self.client.get(url, params)
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+                [param] = params
+                self.assertIn("Unknown fields", str(response.data[param][0]))
+
+    def test_fieldset_params_do_not_select_stores_for_bulk_updates(self):
+        response = self.client.patch(
+            reverse("store-days-list") + "?fields=id", {"montag": False}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("Select stores", response.data["detail"])
+
+
+class StoreIncludeTests(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.url_list = reverse("stores-list")
+        self.url_detail = reverse("stores-detail", kwargs={"pk": self.store1.pk})
+        self.store2.manager_ids.add(self.manager1)
+
+    def _user(self, user):
+        return {
+            "id": user.pk,
+            "first_name": user.first_name,
+            "last_name": user.last_name,
+            "email": user.email,
+        }
+
+    def test_list_includes_deduplicated_users(self):
+        response = self.client.get(self.url_list, {"include": "owner,managers"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data["included"],
+            {
+                "users": [
+                    self._user(self.owner1),
+                    self._user(self.manager1),
+                    self._user(self.manager2),
+                ]
+            },
+        )
+
+    def test_include_selects_relations(self):
+        response = self.client.get(self.url_list, {"include": "owner"})
+        self.assertEqual(response.data["included"]["users"], [self._user(self.owner1)])
+        response = self.client.get(self.url_list, {"include": "managers"})
+        self.assertEqual(
+            [user["id"] for user in response.data["included"]["users"]],
+            [self.manager1.pk, self.manager2.pk],
+        )
+        response = self.client.get(self.url_list)
+        self.assertNotIn("included", response.data)
+
+    def test_include_costs_one_query(self):
+        self.switch_to_superuser()
+        params = {"page_size": 100}
+        for compiled in (True, False):
+            with self.subTest(compiled=compiled):
+                with override_settings(STORES_COMPILED_SERIALIZERS=compiled):
+                    cache.clear()
+                    token_cache.clear()
+                    with CaptureQueriesContext(connection) as plain:
+                        self.client.get(self.url_list, params)
+                    cache.clear()
+                    token_cache.clear()
+                    with CaptureQueriesContext(connection) as included:
+                        response = self.client.get(
+                            self.url_list, {**params, "include": "owner,managers"}
+                        )
+                self.assertEqual(
+                    len(included.captured_queries), len(plain.captured_queries) + 1
+                )
+                users = response.data["included"]["users"]
+                self.assertEqual(len(users), len({user["id"] for user in users}))
+                expected = set()
+                for store in response.data["results"]:
+                    expected.add(store["owner_id"])
+                    expected.update(store["manager_ids"])
+                self.assertEqual({user["id"] for user in users}, expected)
+
+    def test_detail_includes_users(self):
+        response = self.client.get(self.url_detail, {"include": "managers"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            response.data["included"], {"users": [self._user(self.manager1)]}
+        )
+        self.assertEqual(response.data["id"], self.store1.pk)
+
+        plain = self.client.get(self.url_detail)
+        self.assertNotEqual(plain["ETag"], response["ETag"])
+
+    def test_schedule_views_include_users(self):
+        for url in (reverse("store-days-list"), reverse("store-hours-list")):
+            with self.subTest(url=url):
+                response = self.client.get(url, {"include": "owner"})
+                self.assertEqual(
+                    response.data["included"]["users"], [self._user(self.owner1)]
+                )
+
+    def test_invalid_include_is_rejected(self):
+        for value in ("owner,tokens", ","):
+            with self.subTest(value=value):
+                response = self.client.get(self.url_list, {"include": value})
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+                self.assertIn("Invalid include", str(response.data["include"][0]))
+
+    def test_email_change_refreshes_cached_list(self):
+        params = {"include": "managers"}
+        response = self.client.get(self.url_list, params)
+        etag = response["ETag"]
+        self.manager1.email = "renamed@example.com"
+        self.manager1.save(update_fields=["email"])
+
+        response = self.client.get(self.url_list, params, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        emails = [user["email"] for user in response.data["included"]["users"]]
+        self.assertIn("renamed@example.com", emails)
+
+
+class StoreServerTimingTests(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.url_list = reverse("stores-list")
+
+    def _timings(self, response):
+        timings = {}
+        for entry in response["Server-Timing"].split(", "):
+            name, *params = entry.split(";")
+            timings[name] = dict(param.split("=", 1) for param in params)
+        return timings
+
+    def test_list_reports_queries_and_phases(self):
+        for compiled in (True, False):
+            with self.subTest(compiled=compiled):
+                cache.clear()
+                with override_settings(STORES_COMPILED_SERIALIZERS=compiled):
+                    with CaptureQueriesContext(connection) as context:
+                        response = self.client.get(self.url_list)
+                timings = self._timings(response)
+                self.assertEqual(
+                    timings["db"]["desc"],
+                    f'"{len(context.captured_queries)} queries"',
+                )
+                for name in ("filter", "paginate", "serialize", "render", "total"):
+                    self.assertGreaterEqual(float(timings[name]["dur"]), 0)
+
+    def test_timings_are_logged_as_fields(self):
+        with self.assertLogs("test_api.timing", "INFO") as logs:
+            response = self.client.get(self.url_list)
+        [record] = logs.records
+        self.assertEqual(record.view, "stores-list")
+        self.assertEqual(record.status, status.HTTP_200_OK)
+        self.assertEqual(
+            f'"{record.queries} queries"', self._timings(response)["db"]["desc"]
+        )
+        self.assertIn("serialize_ms", record.__dict__)
+        self.assertIn("db_ms", record.__dict__)
+
+    def test_method_budget_takes_precedence(self):
+        self.assertEqual(timing.get_budget("GET", "stores-list")["queries"], 8)
+        self.assertEqual(timing.get_budget("PATCH", "stores-detail")["queries"], 40)
+        self.assertIsNone(timing.get_budget("GET", "unknown"))
+
+    @override_settings(
+        QUERY_BUDGETS={"GET stores-list": {"queries": 1}}, QUERY_BUDGETS_STRICT=True
+    )
+    def test_exceeded_budget_fails_when_strict(self):
+        with self.assertRaisesMessage(timing.QueryBudgetExceeded, "budget 1"):
+            self.client.get(self.url_list)
+
+    @override_settings(
+        QUERY_BUDGETS={"GET stores-list": {"db_ms": 0}}, QUERY_BUDGETS_STRICT=True
+    )
+    def test_sql_time_only_warns_when_strict(self):
+        with self.assertLogs("test_api.timing", "WARNING") as logs:
+            response = self.client.get(self.url_list)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("ms of SQL", logs.records[-1].getMessage())
+
+    @override_settings(
+        QUERY_BUDGETS={"stores-list": {"queries": 1, "db_ms": 0}},
+        QUERY_BUDGETS_STRICT=False,
+    )
+    def test_exceeded_budget_logs_warning(self):
+        with self.assertLogs("test_api.timing", "WARNING") as logs:
+            response = self.client.get(self.url_list)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        warning = [r for r in logs.records if r.levelname == "WARNING"][0]
+        self.assertIn("GET stores-list ran", warning.getMessage())
+        self.assertIn("ms of SQL", warning.getMessage())
+
+    def test_user_endpoints_are_timed(self):
+        self.switch_to_superuser()
+        response = self.client.get(reverse("customuser-list"))
+        timings = self._timings(response)
+        self.assertIn("serialize", timings)
+        self.assertIn("filter", timings)
+
+
+class StoreCursorPaginationTests(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.url_list = reverse("stores-list")
+        for i, city in enumerate(["Aachen", "Aachen", "Bonn", "Bonn", "Celle"]):
+            Store.objects.create(
+                owner_id=self.owner1,
+                name=f"Cursor Store {i}",
+                address=f"{i + 1} Cursor St",
+                city=city,
+                state_abbrv="BE",
+                plz="12345",
+            )
+        self.owner1_stores = Store.objects.filter(owner_id=self.owner1)
+
+    def _walk(self, url, params):
+        ids = []
+        response = self.client.get(url, params)
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn("count", response.data)
+            ids.extend(store["id"] for store in response.data["results"])
+            if not response.data["next"]:
+                return ids, response
+            response = self.client.get(response.data["next"])
+
+    def test_cursor_pages_cover_all_stores(self):
+        ids, _ = self._walk(self.url_list, {"pagination": "cursor", "page_size": 2})
+        expected = list(self.owner1_stores.order_by("id").values_list("id", flat=True))
+        self.assertEqual(ids, expected)
+
+    def test_cursor_follows_active_ordering(self):
+        for ordering in ("city", "-city", "opens"):
+            with self.subTest(ordering=ordering):
+                ids, _ = self._walk(
+                    self.url_list,
+                    {"pagination": "cursor", "page_size": 2, "ordering": ordering},
+                )
+                field = {"opens": "opening_time"}.get(ordering, ordering)
+                expected = self.owner1_stores.order_by(field, "id")
+                self.assertEqual(ids, list(expected.values_list("id", flat=True)))
+
+    def test_cursor_previous_link(self):
+        response = self.client.get(
+            self.url_list, {"pagination": "cursor", "page_size": 3}
+        )
+        first_page = [store["id"] for store in response.data["results"]]
+        self.assertIsNone(response.data["previous"])
+        response = self.client.get(response.data["next"])
+        response = self.client.get(response.data["previous"])
+        self.assertEqual([store["id"] for store in response.data["results"]], first_page)
+
+    def test_cursor_on_store_sub_views(self):
+        for name in ("store-days-list", "store-hours-list", "store-managers-list"):
+            with self.subTest(view=name):
+                ids, _ = self._walk(
+                    reverse(name), {"pagination": "cursor", "page_size": 2}
+                )
+                self.assertEqual(len(ids), self.owner1_stores.count())
+
+    def test_page_number_pagination_is_default(self):
+        response = self.client.get(self.url_list, {"page_size": 2})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], self.owner1_stores.count())
+
+    def test_invalid_cursor(self):
+        response = self.client.get(self.url_list, {"cursor": "not-a-cursor"})
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_invalid_pagination_mode(self):
+        response = self.client.get(self.url_list, {"pagination": "offset"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("Invalid pagination mode", str(response.data))
+
+    def test_cursor_rejects_many_to_many_ordering(self):
+        response = self.client.get(
+            self.url_list, {"pagination": "cursor", "ordering": "manager_first_name"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class StoreSearchTests(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.switch_to_superuser()
+        self.url_list = reverse("stores-list")
+        self.quaeker = self._store("Quaekerei Schmidt", "Köln", "1 Hauptstraße")
+        self.quaeker_city = self._store("Kiosk Eins", "Quäkerhausen", "2 Ring")
+        self.other = self._store("Metzgerei Meier", "Bonn", "3 Weg")
+
+    def _store(self, name, city, address):
+        return Store.objects.create(
+            owner_id=self.owner2,
+            name=name,
+            address=address,
+            city=city,
+            state_abbrv="BE",
+            plz="12345",
+        )
+
+    def _search_ids(self, query, **params):
+        response = self.client.get(self.url_list, {"search": query, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [store["id"] for store in response.data["results"]]
+
+    def test_search_folds_umlauts_and_case(self):
+        for query in ("Quäker", "quaeker", "QUAEKER"):
+            with self.subTest(query=query):
+                ids = self._search_ids(query)
+                self.assertEqual(ids, [self.quaeker.id, self.quaeker_city.id])
+
+    def test_search_matches_substrings_in_every_column(self):
+        test_cases = (
+            ("koeln", self.quaeker),
+            ("hauptstr", self.quaeker),
+            ("metzgerei mei", self.other),
+            ("Owner1", self.other),
+        )
+        for query, store in test_cases:
+            with self.subTest(query=query):
+                self.assertIn(store.id, self._search_ids(query, page_size=50))
+
+    def test_search_requires_every_term(self):
+        self.assertEqual(self._search_ids("quäker schmidt"), [self.quaeker.id])
+        self.assertEqual(self._search_ids("quäker bonn"), [])
+
+    def test_search_short_terms(self):
+        self.assertEqual(self._search_ids("quäker sc"), [self.quaeker.id])
+
+    def test_search_follows_store_changes(self):
+        self.other.name = "Quäkerei Meier"
+        self.other.save()
+        self.assertIn(self.other.id, self._search_ids("quaeker"))
+        self.other.delete()
+        self.assertNotIn(self.other.id, self._search_ids("meier"))
+
+    def test_search_with_cursor_pagination(self):
+        ids = self._search_ids("quäker", pagination="cursor", page_size=1)
+        self.assertEqual(ids, [self.quaeker.id])
+        response = self.client.get(
+            self.url_list,
+            {"search": "quäker", "pagination": "cursor", "page_size": 1},
+        )
+        response = self.client.get(response.data["next"])
+        self.assertEqual(
+            [store["id"] for store in response.data["results"]],
+            [self.quaeker_city.id],
+        )
+
+    def test_search_finds_bulk_created_stores(self):
+        payload = [
+            {
+                "name": "Quäkerladen",
+                "address": "4 Bulk St",
+                "city": "Bulk City",
+                "state_abbrv": "HH",
+                "owner_id": self.owner1.id,
+                "manager_ids": [self.manager1.id],
+            }
+        ]
+        response = self.client.post(
+            reverse("stores-bulk-create"), payload, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        created_id = response.data["created"][0]["id"]
+        self.assertIn(created_id, self._search_ids("quaekerladen"))
+        self.assertIn(created_id, self._search_ids("manager test"))
+
+    def test_search_blank_is_rejected(self):
+        response = self.client.get(self.url_list, {"search": " "})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("may not be blank", str(response.data["search"]))
+
+    def test_indexed_filters_stay_exact(self):
+        response = self.client.get(self.url_list, {"name": "Quaeker"})
+        self.assertEqual(response.data["count"], 1)
+        response = self.client.get(self.url_list, {"city": "Quäkerhausen"})
+        self.assertEqual(response.data["count"], 1)
+        response = self.client.get(self.url_list, {"name": "Quäker"})
+        self.assertEqual(response.data["count"], 0)
+
+    def test_search_uses_fts_index(self):
+        with CaptureQueriesContext(connection) as queries:
+            self._search_ids("quaeker")
+        self.assertTrue(
+            any("stores_storesearch_fts MATCH" in query["sql"] for query in queries)
+        )
+
+
+class StoreOpenAtTests(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.url_list = reverse("stores-list")
+        # store1 and store2 are open montag to mittwoch, 07:00 to 17:00.
+        self.late = Store.objects.create(
+            owner_id=self.owner1,
+            name="Late Store",
+            address="9 Late St",
+            city="Test City",
+            state_abbrv="BE",
+            plz="12345",
+            samstag=True,
+            opening_time="12:00",
+            closing_time="22:00",
+        )
+
+    def _ids(self, **params):
+        response = self.client.get(self.url_list, {"page_size": 50, **params})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return {store["id"] for store in response.data["results"]}
+
+    def test_open_at(self):
+        test_cases = (
+            ("montagT07:00", {self.store1.id, self.store2.id}),
+            ("mittwochT16:59", {self.store1.id, self.store2.id}),
+            ("MittwochT17:00", set()),
+            ("samstagT19:30", {self.late.id}),
+            ("sonntagT12:00", set()),
+        )
+        for value, expected in test_cases:
+            with self.subTest(open_at=value):
+                self.assertEqual(self._ids(open_at=value), expected)
+
+    def test_open_at_combines_with_filters(self):
+        ids = self._ids(open_at="montagT08:00", city=self.store2.city)
+        self.assertEqual(ids, {self.store2.id})
+
+    def test_open_at_follows_bulk_hours_update(self):
+        response = self.client.patch(
+            reverse("store-hours-list"),
+            {"ids": [self.late.id], "closing_time": "23:00:00"},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self._ids(open_at="samstagT22:30"), {self.late.id})
+
+    def test_invalid_open_at(self):
+        for value in ("samstag", "saturdayT19:30", "samstagT25:00", "T19:30"):
+            with self.subTest(open_at=value):
+                response = self.client.get(self.url_list, {"open_at": value})
+                self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+                self.assertIn("<weekday>T<HH:MM>", str(response.data["open_at"]))
+
+    def test_open_now_uses_time_zone(self):
+        # 2026-10-17 is a samstag; 19:30 in Berlin is 17:30 UTC.
+        now = datetime(2026, 10, 17, 17, 30, tzinfo=dt_timezone.utc)
+        with mock.patch("django.utils.timezone.now", return_value=now):
+            with self.settings(TIME_ZONE="Europe/Berlin"):
+                self.assertEqual(self._ids(open_now="true"), {self.late.id})
+                closed = self._ids(open_now="false")
+        self.assertIn(self.store1.id, closed)
+        self.assertNotIn(self.late.id, closed)
+
+    def test_open_now_is_not_served_from_an_older_minute(self):
+        saturday = datetime(2026, 10, 17, 21, 59, tzinfo=dt_timezone.utc)
+        with mock.patch("django.utils.timezone.now", return_value=saturday):
+            self.assertEqual(self._ids(open_now="true"), {self.late.id})
+        later = saturday + timedelta(minutes=1)
+        with mock.patch("django.utils.timezone.now", return_value=later):
+            self.assertEqual(self._ids(open_now="true"), set())
+
+
+class StoreStatsTests(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.url_stats = reverse("stores-stats")
+        self.sunday_store = Store.objects.create(
+            owner_id=self.owner1,
+            name="Sunday Store",
+            address="7 Sunday St",
+            city="Hamburg",
+            state_abbrv="HH",
+            plz="20095",
+            sonntag=True,
+            opening_time="10:00",
+            closing_time="21:30",
+        )
+
+    def test_stats_for_visible_stores(self):
+        response = self.client.get(self.url_stats)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.data
+        self.assertEqual(data["total"], 3)
+        self.assertEqual(
+            data["by_state"],
+            [
+                {"state_abbrv": "BE", "state": "Berlin", "count": 2},
+                {"state_abbrv": "HH", "state": "Hamburg", "count": 1},
+            ],
+        )
+        self.assertEqual(data["by_weekday"]["montag"], 2)
+        self.assertEqual(data["by_weekday"]["sonntag"], 1)
+        self.assertEqual(data["by_weekday"]["freitag"], 0)
+        self.assertEqual(
+            data["by_closing_hour"], [{"hour": 17, "count": 2}, {"hour": 21, "count": 1}]
+        )
+        self.assertEqual(
+            data["by_opening_hour"], [{"hour": 7, "count": 2}, {"hour": 10, "count": 1}]
+        )
+
+    def test_stats_match_superuser_queryset(self):
+        self.switch_to_superuser()
+        data = self.client.get(self.url_stats).data
+        self.assertEqual(data["total"], Store.objects.count())
+        for row in data["by_city"]:
+            self.assertEqual(row["count"], Store.objects.filter(city=row["city"]).count())
+        self.assertEqual(
+            data["by_weekday"]["sonntag"], Store.objects.filter(sonntag=True).count()
+        )
+
+    def test_stats_apply_filters(self):
+        response = self.client.get(self.url_stats, {"state_abbrv": "HH"})
+        self.assertEqual(response.data["total"], 1)
+        self.assertEqual(response.data["by_city"], [{"city": "Hamburg", "count": 1}])
+        response = self.client.get(self.url_stats, {"plz": "abcde"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_stats_count_stores_once_across_manager_joins(self):
+        # Both managers of store1 match the first name filter.
+        self.store1.manager_ids.add(self.manager2)
+        params = {"manager_first_name": "Manager"}
+        listed = self.client.get(reverse("stores-list"), params).data["count"]
+        data = self.client.get(self.url_stats, params).data
+        self.assertEqual(listed, 2)
+        self.assertEqual(data["total"], 2)
+        self.assertEqual(data["by_state"][0]["count"], 2)
+        self.assertEqual(data["by_weekday"]["montag"], 2)
+
+    def test_stats_use_one_query_without_store_instances(self):
+        self.client.get(self.url_stats)
+        cache.clear()
+        with mock.patch.object(Store, "from_db") as from_db:
+            with CaptureQueriesContext(connection) as queries:
+                self.client.get(self.url_stats, {"montag": "true"})
+        from_db.assert_not_called()
+        stats_queries = [q for q in queries if '"stores_store"' in q["sql"]]
+        self.assertEqual(len(stats_queries), 1)
+        self.assertIn("GROUP BY", stats_queries[0]["sql"])
+
+    def test_stats_invalidated_by_store_changes(self):
+        self.assertEqual(self.client.get(self.url_stats).data["total"], 3)
+        self.sunday_store.delete()
+        self.assertEqual(self.client.get(self.url_stats).data["total"], 2)
+
+
+@skipUnless(connection.vendor == "sqlite", "Reads SQLite query plans")
+class StoreIndexPlanTests(BaseTestCase):
+    """Every query of a filtered list request is answered through an index."""
+
+    FILTERS = (
+        "plz=12345",
+        "state_abbrv=BE",
+        "state_abbrv=BE&city=Test",
+        "name=Test",
+        "city=Test",
+        "address=123 Main",
+        "search=test store",
+        "owner_id={owner}",
+        "owner_first_name=Owner",
+        "manager_ids={manager}",
+        "manager_first_name=Manager",
+        "opening_time=07:00",
+        "opening_time_lte=08:00",
+        "opening_time_gte=08:00",
+        "closing_time_lte=18:00",
+        "closing_time_gte=16:00",
+        "opening_time_gte=06:00&closing_time_lte=18:00",
+        "montag=true",
+        "days_all=montag,freitag",
+        "days_any=samstag,sonntag",
+        "min_days=3",
+        "state_abbrv=BE&montag=true&opening_time_lte=08:00",
+        "ordering=name",
+        "ordering=-city",
+        "ordering=state",
+        "ordering=opens",
+        "ordering=-closes",
+        "state_abbrv=BE&ordering=city",
+        "plz=12345&ordering=name",
+        "open_at=samstagT19:30",
+        "open_now=true",
+        "open_at=montagT08:00&state_abbrv=BE",
+    )
+
+    def setUp(self):
+        super().setUp()
+        self.url_list = reverse("stores-list")
+
+    def _full_scans(self, query):
+        tables = set(connection.introspection.table_names())
+        scans = []
+        # A cached response would leave no store query to explain.
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url_list + "?" + query)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertTrue(any('"stores_store"' in q["sql"] for q in queries))
+        with connection.cursor() as cursor:
+            for captured in queries:
+                if not captured["sql"].startswith("SELECT"):
+                    continue
+                cursor.execute("EXPLAIN QUERY PLAN " + captured["sql"])
+                for row in cursor.fetchall():
+                    detail = row[-1]
+                    # "SCAN t" without an index reads every row of t.
+                    match = re.match(r"SCAN (\S+)$", detail)
+                    if match and match.group(1) in tables:
+                        scans.append((detail, captured["sql"]))
+        return scans
+
+    def test_filters_do_not_scan_tables(self):
+        tokens = {
+            "superuser": self.super_token,
+            "owner": self.token1,
+            "manager": self.token3,
+        }
+        for user, token in tokens.items():
+            self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+            for query in self.FILTERS:
+                query = query.format(owner=self.owner1.id, manager=self.manager1.id)
+                with self.subTest(user=user, query=query):
+                    self.assertEqual(self._full_scans(query), [])
+
+
+class StoreListCacheTests(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.url_list = reverse("stores-list")
+
+    def _ids(self, response):
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return {store["id"] for store in response.data["results"]}
+
+    def _as(self, token):
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+
+    def test_repeated_list_is_served_from_cache(self):
+        first = self.client.get(self.url_list, {"montag": "true"})
+        with CaptureQueriesContext(connection) as context:
+            second = self.client.get(self.url_list, {"montag": "TRUE"})
+        self.assertEqual(first.data, second.data)
+        for query in context.captured_queries:
+            self.assertNotIn('"stores_store"', query["sql"])
+
+    def test_time_params_are_canonicalized(self):
+        hours_url = reverse("store-hours-list")
+        self.client.get(hours_url, {"opening_time": "07:00"})
+        with CaptureQueriesContext(connection) as context:
+            self.client.get(hours_url, {"opening_time": "07:00:00"})
+        for query in context.captured_queries:
+            self.assertNotIn('"stores_store"', query["sql"])
+
+    def test_users_do_not_share_entries(self):
+        owner_ids = self._ids(self.client.get(self.url_list))
+        self._as(self.token3)
+        manager_ids = self._ids(self.client.get(self.url_list))
+        self.assertEqual(owner_ids, {self.store1.id, self.store2.id})
+        self.assertEqual(manager_ids, {self.store1.id})
+
+    def test_store_update_invalidates(self):
+        self.client.get(self.url_list)
+        self.store1.name = "Renamed Store"
+        self.store1.save()
+        response = self.client.get(self.url_list)
+        names = {store["name"] for store in response.data["results"]}
+        self.assertIn("Renamed Store", names)
+
+    def test_manager_changes_invalidate(self):
+        self._as(self.token3)
+        self.assertEqual(self._ids(self.client.get(self.url_list)), {self.store1.id})
+        self.store2.manager_ids.add(self.manager1)
+        self.assertEqual(
+            self._ids(self.client.get(self.url_list)),
+            {self.store1.id, self.store2.id},
+        )
+        self.store1.manager_ids.clear()
+        self.assertEqual(self._ids(self.client.get(self.url_list)), {self.store2.id})
+        self.manager1.managed_stores.remove(self.store2)
+        self.assertEqual(self._ids(self.client.get(self.url_list)), set())
+
+    def test_owner_change_and_delete_invalidate(self):
+        self.assertEqual(
+            self._ids(self.client.get(self.url_list)),
+            {self.store1.id, self.store2.id},
+        )
+        self.store2.owner_id = self.owner2
+        self.store2.save()
+        self.assertEqual(self._ids(self.client.get(self.url_list)), {self.store1.id})
+        self.store1.delete()
+        self.assertEqual(self._ids(self.client.get(self.url_list)), set())
+
+    def test_owner_rename_invalidates(self):
+        self.client.get(self.url_list)
+        self.owner1.first_name = "Renamed"
+        self.owner1.save()
+        response = self.client.get(self.url_list)
+        self.assertEqual(response.data["results"][0]["owner"], str(self.owner1))
+
+    def test_generations_are_read_from_the_database(self):
+        self.client.get(self.url_list)
+        # A change made by another process: its bump is only in the database.
+        Store.objects.filter(pk=self.store1.pk).update(name="Renamed Store")
+        StoreListGeneration.objects.filter(user_id=self.owner1.pk).update(
+            value=F("value") + 1
+        )
+        response = self.client.get(self.url_list)
+        names = {store["name"] for store in response.data["results"]}
+        self.assertIn("Renamed Store", names)
+
+
+class StoreConditionalGetTests(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.url_list = reverse("stores-list")
+        self.url_detail = reverse("stores-detail", args=[self.store1.id])
+
+    def test_detail_validators(self):
+        response = self.client.get(self.url_detail)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn("ETag", response)
+        self.assertIn("Last-Modified", response)
+
+        response = self.client.get(
+            self.url_detail, HTTP_IF_NONE_MATCH=response["ETag"]
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(response.content, b"")
+
+    def test_detail_if_modified_since(self):
+        response = self.client.get(self.url_detail)
+        response = self.client.get(
+            self.url_detail, HTTP_IF_MODIFIED_SINCE=response["Last-Modified"]
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_detail_etag_changes_with_managers(self):
+        etag = self.client.get(self.url_detail)["ETag"]
+        self.store1.manager_ids.add(self.manager2)
+        response = self.client.get(self.url_detail, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertIn(str(self.manager2), response.data["managers"])
+
+    def test_manager_changes_keep_updated_at(self):
+        updated_at = datetime(2024, 1, 1, tzinfo=dt_timezone.utc)
+        Store.objects.filter(pk=self.store1.pk).update(
+            updated_at=updated_at, relations_modified_at=None
+        )
+        modified = self.client.get(self.url_detail)["Last-Modified"]
+        self.assertEqual(parse_http_date(modified), int(updated_at.timestamp()))
+        self.store1.manager_ids.add(self.manager2)
+        response = self.client.get(self.url_detail)
+        self.assertEqual(response.data["updated_at"], "2024-01-01T00:00:00Z")
+        self.assertGreater(
+            parse_http_date(response["Last-Modified"]), parse_http_date(modified)
+        )
+
+    def test_detail_etag_differs_between_views(self):
+        store_etag = self.client.get(self.url_detail)["ETag"]
+        days_url = reverse("store-days-detail", kwargs={"pk": self.store1.id})
+        response = self.client.get(days_url, HTTP_IF_NONE_MATCH=store_etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        response = self.client.get(days_url, HTTP_IF_NONE_MATCH=response["ETag"])
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_list_validators(self):
+        etag = self.client.get(self.url_list)["ETag"]
+        # Served from the response cache.
+        response = self.client.get(self.url_list, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+        # Computed from the page without the cache.
+        cache.clear()
+        response = self.client.get(self.url_list, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_list_etag_changes_with_count(self):
+        etag = self.client.get(self.url_list, {"page_size": 1})["ETag"]
+        Store.objects.create(owner_id=self.owner1, **STORE3_DATA)
+        response = self.client.get(
+            self.url_list, {"page_size": 1}, HTTP_IF_NONE_MATCH=etag
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["count"], 3)
+
+
+class StoreBulkCreateTests(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.url_bulk = reverse("stores-bulk-create")
+
+    def _payload(self, i, **extra):
+        data = {
+            "name": f"Bulk Store {i}",
+            "address": f"{i + 1} Bulk St",
+            "city": "Bulk City",
+            "state_abbrv": "HH",
+            "plz": "20095",
+            "owner_id": self.owner1.id,
+            "manager_ids": [self.manager1.id, self.manager2.id],
+            "montag": True,
+            "samstag": True,
+        }
+        data.update(extra)
+        return data
+
+    def test_bulk_create_stores(self):
+        payload = [self._payload(i) for i in range(5)]
+        response = self.client.post(self.url_bulk, payload, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(response.data["errors"], [])
+        ids = [item["id"] for item in response.data["created"]]
+        self.assertEqual(len(ids), 5)
+        for store in Store.objects.filter(id__in=ids):
+            self.assertEqual(store.owner_id, self.owner1)
+            self.assertEqual(store.days_open, str(["Montag", "Samstag"]))
+            self.assertEqual(
+                set(store.manager_ids.all()), {self.manager1, self.manager2}
+            )
+
+        # The new stores are visible to their managers.
+        self.client.credentials(HTTP_AUTHORIZATION=f"Token {self.token3.key}")
+        response = self.client.get(reverse("stores-list"), {"page_size": 10})
+        visible = {store["id"] for store in response.data["results"]}
+        self.assertTrue(set(ids) <= visible)
+
+    def test_bulk_create_reports_item_errors(self):
+        payload = [
+            self._payload(0),
+            self._payload(1, state_abbrv="XX"),
+            self._payload(2, manager_ids=[999999]),
+            {"name": "Missing fields"},
+            self._payload(4),
+        ]
+        old_count = Store.objects.count()
+        response = self.client.post(self.url_bulk, payload, format="json")
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual([item["index"] for item in response.data["created"]], [0, 4])
+        errors = {item["index"]: item["errors"] for item in response.data["errors"]}
+        self.assertEqual(set(errors), {1, 2, 3})
+        self.assertIn("invalid state abbreviation", str(errors[1]["state_abbrv"]))
+        self.assertIn("does not exist", str(errors[2]["manager_ids"]))
+        self.assertIn("required for store creation", str(errors[3]))
+        self.assertEqual(Store.objects.count(), old_count + 2)
+
+    def test_bulk_create_all_invalid(self):
+        payload = [self._payload(0, plz="1"), self._payload(1, name=" ")]
+        response = self.client.post(self.url_bulk, payload, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data["created"], [])
+        self.assertEqual(len(response.data["errors"]), 2)
+
+    def test_bulk_create_requires_list(self):
+        response = self.client.post(self.url_bulk, self._payload(0), format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("Expected a list", str(response.data))
+
+    def test_bulk_create_query_count_is_constant(self):
+        def count(size):
+            payload = [self._payload(i) for i in range(size)]
+            token_cache.clear()
+            with CaptureQueriesContext(connection) as context:
+                response = self.client.post(self.url_bulk, payload, format="json")
+            self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+            return len(context.captured_queries)
+
+        self.assertEqual(count(2), count(20))
+
+
+class StoreBulkScheduleTests(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.hours_url = reverse("store-hours-list")
+        self.days_url = reverse("store-days-list")
+
+    def test_bulk_update_hours_by_ids(self):
+        data = {
+            "ids": [self.store1.id, self.store2.id],
+            "opening_time": "10:00:00",
+            "closing_time": "14:00:00",
+        }
+        response = self.client.patch(self.hours_url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["updated"], 2)
+        for store in (self.store1, self.store2):
+            store.refresh_from_db()
+            self.assertEqual(str(store.opening_time), "10:00:00")
+            self.assertEqual(str(store.closing_time), "14:00:00")
+        self.store3.refresh_from_db()
+        self.assertEqual(str(self.store3.opening_time), "07:00:00")
+
+    def test_bulk_update_hours_by_filter(self):
+        self.store2.closing_time = "20:00:00"
+        self.store2.save()
+        response = self.client.patch(
+            self.hours_url + "?closing_time_gte=18:00",
+            {"closing_time": "22:00:00"},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["ids"], [self.store2.id])
+        self.store1.refresh_from_db()
+        self.assertEqual(str(self.store1.closing_time), "17:00:00")
+
+    def test_bulk_update_hours_checks_existing_times(self):
+        data = {"ids": [self.store1.id, self.store2.id], "opening_time": "18:00:00"}
+        response = self.client.patch(self.hours_url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("Closing time must be later", str(response.data))
+        self.store1.refresh_from_db()
+        self.assertEqual(str(self.store1.opening_time), "07:00:00")
+
+        data["closing_time"] = "17:00:00"
+        response = self.client.patch(self.hours_url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_update_respects_visibility(self):
+        data = {"ids": [self.store1.id, self.store3.id], "opening_time": "06:00:00"}
+        response = self.client.patch(self.hours_url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+        self.assertIn(str(self.store3.id), str(response.data))
+        self.store1.refresh_from_db()
+        self.assertEqual(str(self.store1.opening_time), "07:00:00")
+
+    def test_bulk_update_requires_selection(self):
+        response = self.client.patch(
+            self.hours_url, {"opening_time": "06:00:00"}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("list of ids or with filter parameters", str(response.data))
+
+    def test_bulk_update_requires_values(self):
+        selections = {
+            self.hours_url: "?closing_time_gte=08:00",
+            self.days_url: "?montag=true",
+        }
+        for url, selection in selections.items():
+            for query, data in (("", {"ids": [self.store1.id]}), (selection, {})):
+                with self.subTest(url=url, query=query):
+                    with CaptureQueriesContext(connection) as context:
+                        response = self.client.patch(url + query, data, format="json")
+                    self.assertEqual(
+                        response.status_code, status.HTTP_400_BAD_REQUEST
+                    )
+                    self.assertIn("Expected at least one of", str(response.data))
+                    self.assertFalse(
+                        any('"stores_store"' in q["sql"] for q in context)
+                    )
+
+    def test_bulk_update_hours_conflicts_by_filter(self):
+        response = self.client.patch(
+            self.hours_url + "?closing_time_lte=17:00",
+            {"opening_time": "18:00:00"},
+            format="json",
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(
+            [int(pk) for pk in response.data["ids"]], [self.store1.id, self.store2.id]
+        )
+
+    def test_bulk_update_days(self):
+        data = {
+            "ids": [self.store1.id, self.store2.id],
+            "montag": False,
+            "sonntag": True,
+        }
+        response = self.client.patch(self.days_url, data, format="json")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        for store in (self.store1, self.store2):
+            store.refresh_from_db()
+            self.assertFalse(store.montag)
+            self.assertTrue(store.sonntag)
+            self.assertEqual(store.days_mask, store.compute_days_mask())
+            self.assertEqual(store.days_open, str(["Dienstag", "Mittwoch", "Sonntag"]))
+
+    def test_bulk_update_days_by_filter_and_invalid_values(self):
+        response = self.client.patch(
+            self.days_url + "?montag=true", {"freitag": True}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["updated"], 2)
+
+        response = self.client.patch(
+            self.days_url + "?montag=true", {"freitag": "maybe"}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.patch(
+            self.days_url + "?not_a_day=true", {"freitag": True}, format="json"
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_bulk_update_invalidates_list_cache(self):
+        self.client.get(self.hours_url)
+        data = {"ids": [self.store1.id], "closing_time": "19:00:00"}
+        self.client.patch(self.hours_url, data, format="json")
+        response = self.client.get(self.hours_url)
+        closing = {s["id"]: s["closing_time"] for s in response.data["results"]}
+        self.assertEqual(closing[self.store1.id], "19:00:00")
+
+
+class StoreExportTests(BaseTestCase):
+    def setUp(self):
+        super().setUp()
+        self.csv_url = reverse("stores-export", kwargs={"export_format": "csv"})
+        self.ndjson_url = reverse("stores-export", kwargs={"export_format": "ndjson"})
+
+    def _content(self, response):
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return b"".join(response.streaming_content).decode()
+
+    def test_export_ndjson(self):
+        response = self.client.get(self.ndjson_url)
+        self.assertEqual(response["Content-Type"], "application/x-ndjson; charset=utf-8")
+        records = [json.loads(line) for line in self._content(response).splitlines()]
+        self.assertEqual([r["id"] for r in records], [self.store1.id, self.store2.id])
+        self.assertEqual(records[0]["owner"], str(self.owner1))
+        self.assertEqual(records[0]["managers"], [str(self.manager1)])
+        self.assertEqual(records[0]["days_of_operation"], self.store1.days_open)
+        self.assertEqual(records[0]["opening_time"], "07:00:00")
+
+    def test_export_csv_matches_serializer(self):
+        content = self._content(self.client.get(self.csv_url))
+        rows = list(csv.DictReader(io.StringIO(content)))
+        listed = self.client.get(reverse("stores-list")).data["results"]
+        self.assertEqual(len(rows), len(listed))
+        for row, store in zip(rows, listed):
+            self.assertEqual(int(row["id"]), store["id"])
+            self.assertEqual(row["name"], store["name"])
+            self.assertEqual(row["owner"], store["owner"])
+            self.assertEqual(row["managers"], "; ".join(store["managers"]))
+            self.assertEqual(row["days_of_operation"], store["days_of_operation"])
+
+    def test_export_applies_filters_and_ordering(self):
+        response = self.client.get(
+            self.ndjson_url, {"name": "Store1", "ordering": "-name"}
+        )
+        records = [json.loads(line) for line in self._content(response).splitlines()]
+        self.assertEqual([r["id"] for r in records], [self.store2.id])
+
+        response = self.client.get(self.ndjson_url, {"not_a_filter": "x"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_export_runs_no_count_query(self):
+        with CaptureQueriesContext(connection) as context:
+            self._content(self.client.get(self.csv_url, HTTP_ACCEPT="text/csv"))
+        for query in context.captured_queries:
+            self.assertNotIn("COUNT(", query["sql"])
+
+    def test_export_requires_authentication(self):
+        self.client.credentials()
+        response = self.client.get(self.csv_url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+
+class JSONBackendTests(SimpleTestCase):
+    data = {
+        "name": "Bäckerei\u2028Nord",
+        "error": ErrorDetail("Invalid", code="invalid"),
+        "price": Decimal("12.50"),
+        "opening_time": time(7, 30),
+        "created_at": datetime(2024, 5, 1, 12, 0, tzinfo=dt_timezone.utc),
+        "day": date(2024, 5, 1),
+        "id": UUID("12345678-1234-5678-1234-567812345678"),
+        "counts": {1: 2},
+        "lazy": gettext_lazy("Not found."),
+    }
+    expected = {
+        "name": "Bäckerei\u2028Nord",
+        "error": "Invalid",
+        "price": "12.50",
+        "opening_time": "07:30:00",
+        "created_at": "2024-05-01T12:00:00Z",
+        "day": "2024-05-01",
+        "id": "12345678-1234-5678-1234-567812345678",
+        "counts": {"1": 2},
+        "lazy": "Not found.",
+    }
+
+    def render(self, data, media_type=None, backend=fast_json.AUTO):
+        with self.settings(API_JSON_BACKEND=backend):
+            return fast_json.JSONRenderer().render(data, media_type)
+
+    def parse(self, body, backend=fast_json.AUTO):
+        with self.settings(API_JSON_BACKEND=backend):
+            return fast_json.JSONParser().parse(io.BytesIO(body))
+
+    def test_backends_render_the_same_values(self):
+        for backend in (fast_json.ORJSON, fast_json.STDLIB):
+            with self.subTest(backend=backend):
+                rendered = self.render(self.data, backend=backend)
+                self.assertIn(b"\\u2028", rendered)
+                self.assertEqual(json.loads(rendered), self.expected)
+
+    def test_decimal_as_float_when_not_coerced(self):
+        with mock.patch.object(api_settings, "COERCE_DECIMAL_TO_STRING", False):
+            for backend in (fast_json.ORJSON, fast_json.STDLIB):
+                rendered = self.render({"price": Decimal("12.50")}, backend=backend)
+                self.assertEqual(json.loads(rendered), {"price": 12.5})
+
+    def test_orjson_fallbacks(self):
+        big = {"value": 2**70}
+        self.assertEqual(json.loads(self.render(big)), big)
+        self.assertIn(b'\n    "a"', self.render({"a": 1}, "application/json; indent=4"))
+        self.assertIn(b'\n  "a"', self.render({"a": 1}, "application/json; indent=2"))
+
+    def test_parse(self):
+        for backend in (fast_json.ORJSON, fast_json.STDLIB):
+            with self.subTest(backend=backend):
+                body = json.dumps({"name": "Bäckerei", "n": 2**70}).encode()
+                self.assertEqual(
+                    self.parse(body, backend), {"name": "Bäckerei", "n": 2**70}
+                )
+                for invalid in (b"{", b'{"n": NaN}'):
+                    with self.assertRaises(ParseError):
+                        self.parse(invalid, backend)
+
+    def test_backend_setting(self):
+        with self.settings(API_JSON_BACKEND="ujson"):
+            with self.assertRaises(ImproperlyConfigured):
+                fast_json.json_backend()
+        with mock.patch.object(fast_json, "orjson", None):
+            self.assertEqual(fast_json.json_backend(), fast_json.STDLIB)
+            with self.settings(API_JSON_BACKEND=fast_json.ORJSON):
+                with self.assertRaises(ImproperlyConfigured):
+                    fast_json.json_backend()
+
+
+def reload_store_urls():
+    importlib.reload(importlib.import_module("stores.api.urls"))
+    importlib.reload(importlib.import_module("test_api.urls"))
+    clear_url_caches()
+
+
+@override_settings(STORES_ASYNC_READS=True)
+class StoreAsyncReadTests(BaseTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        reload_store_urls()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        reload_store_urls()
+
+    def setUp(self):
+        super().setUp()
+        self.accept = {"Accept": "application/json"}
+        self.auth = {**self.accept, "Authorization": f"Token {self.token1.key}"}
+        self.url_list = reverse("stores-list")
+        self.url_detail = reverse("stores-detail", kwargs={"pk": self.store1.id})
+
+    def test_only_reads_are_async(self):
+        self.assertTrue(iscoroutinefunction(resolve(self.url_list).func))
+        self.assertTrue(iscoroutinefunction(resolve(self.url_detail).func))
+        self.assertTrue(
+            iscoroutinefunction(resolve(reverse("store-managers-list")).func)
+        )
+        self.assertFalse(iscoroutinefunction(resolve(reverse("stores-stats")).func))
+        self.assertFalse(
+            iscoroutinefunction(resolve(reverse("stores-bulk-create")).func)
+        )
+
+    async def test_async_list(self):
+        response = await self.async_client.get(self.url_list, headers=self.auth)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual(
+            [store["id"] for store in data["results"]],
+            [self.store1.id, self.store2.id],
+        )
+        self.assertEqual(data["message"], StoreViewSet.list_message)
+        etag = response["ETag"]
+
+        response = await self.async_client.get(
+            self.url_list, headers={**self.auth, "If-None-Match": etag}
+        )
+        self.assertEqual(response.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    async def test_async_list_filters(self):
+        response = await self.async_client.get(
+            self.url_list, {"name": STORE2_DATA["name"]}, headers=self.auth
+        )
+        self.assertEqual(
+            [store["id"] for store in response.json()["results"]], [self.store2.id]
+        )
+        response = await self.async_client.get(
+            self.url_list, {"plz": "abc"}, headers=self.auth
+        )
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("plz", response.json())
+
+    async def test_async_server_timing(self):
+        response = await self.async_client.get(self.url_list, headers=self.auth)
+        self.assertRegex(response["Server-Timing"], r'^db;dur=[0-9.]+;desc="[1-9]')
+
+    async def test_async_include(self):
+        params = {"include": "owner,managers"}
+        for url in (self.url_list, self.url_detail):
+            with self.subTest(url=url):
+                response = await self.async_client.get(url, params, headers=self.auth)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                users = response.json()["included"]["users"]
+                self.assertEqual(users[0]["id"], self.owner1.id)
+                self.assertIn(self.manager1.id, [user["id"] for user in users])
+
+    async def test_async_detail(self):
+        response = await self.async_client.get(self.url_detail, headers=self.auth)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        data = response.json()
+        self.assertEqual(data["id"], self.store1.id)
+        self.assertEqual(data["managers"], [str(self.manager1)])
+        self.assertEqual(data["message"], StoreViewSet.detail_message)
+
+        url = reverse("stores-detail", kwargs={"pk": self.store3.id})
+        response = await self.async_client.get(url, headers=self.auth)
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    async def test_async_schedule_and_manager_views(self):
+        for name, detail_message, list_message in (
+            ("store-days", StoreDaysView.detail_message, StoreDaysView.list_message),
+            ("store-hours", StoreHoursView.detail_message, None),
+            ("store-managers", StoreManagersView.detail_message, None),
+        ):
+            with self.subTest(name=name):
+                url = reverse(f"{name}-list")
+                response = await self.async_client.get(url, headers=self.auth)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertEqual(response.json().get("message"), list_message)
+                url = reverse(f"{name}-detail", kwargs={"pk": self.store1.id})
+                response = await self.async_client.get(url, headers=self.auth)
+                self.assertEqual(response.status_code, status.HTTP_200_OK)
+                self.assertEqual(response.json()["message"], detail_message)
+
+    async def test_async_authentication(self):
+        response = await self.async_client.get(self.url_list, headers=self.accept)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+        for header in ("Token invalid", "Token", "Token a b"):
+            response = await self.async_client.get(
+                self.url_list, headers={**self.accept, "Authorization": header}
+            )
+            self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+        await self.async_client.aforce_login(self.owner2)
+        response = await self.async_client.get(self.url_list, headers=self.accept)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(
+            [store["id"] for store in response.json()["results"]], [self.store3.id]
+        )
+
+    def test_writes_use_sync_views(self):
+        response = self.client.patch(self.url_detail, {"city": "Hamburg"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["city"], "Hamburg")
+        response = self.client.get(self.url_detail)
+        self.assertEqual(response.data["city"], "Hamburg")
+
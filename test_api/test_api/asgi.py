@@ -2,6 +2,9 @@
 ASGI config for test_api project.
 
 It exposes the ASGI callable as a module-level variable named ``application``.
+GET requests of the store views are served by async views (STORES_ASYNC_READS),
+so for example ``uvicorn test_api.asgi:application`` keeps slow clients from
+holding worker threads.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.1/howto/deployment/asgi/
@@ -12,5 +15,6 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'test_api.settings')
+os.environ.setdefault('STORES_ASYNC_READS', '1')
 
 application = get_asgi_application()
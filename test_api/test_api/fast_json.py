@@ -0,0 +1,115 @@
+"""
+Fast JSON rendering and parsing for the API.
+
+The `JSONRenderer` and `JSONParser` classes replace DRF's classes of the same name. They encode and decode with orjson when it is installed and with the stdlib json module otherwise. The `API_JSON_BACKEND` setting picks the backend: "auto" (the default) uses orjson when it can be imported, "orjson" requires it and "stdlib" always uses json.
+
+orjson writes strings, numbers, lists and dicts (including subclasses such as `ReturnDict` and `ErrorDetail`), datetimes, dates, times and UUIDs in C. Only other objects reach the Python `default` hook: a `Decimal` is written the way DRF's `DecimalField` writes it, as a string unless `COERCE_DECIMAL_TO_STRING` is off, and anything else the way DRF's `JSONEncoder` writes it. The stdlib backend uses the same rules. Data orjson cannot express, such as integers beyond 64 bits or indents other than 2, is rendered with the stdlib encoder.
+"""
+
+from decimal import Decimal
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from rest_framework import parsers, renderers
+from rest_framework.exceptions import ParseError
+from rest_framework.settings import api_settings
+from rest_framework.utils import encoders, json
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+AUTO = "auto"
+ORJSON = "orjson"
+STDLIB = "stdlib"
+UTF8_NAMES = {"utf-8", "utf8"}
+
+
+def json_backend():
+    """The JSON backend selected by the API_JSON_BACKEND setting."""
+    backend = getattr(settings, "API_JSON_BACKEND", AUTO)
+    if backend == AUTO:
+        return STDLIB if orjson is None else ORJSON
+    if backend not in {ORJSON, STDLIB}:
+        raise ImproperlyConfigured(
+            f"API_JSON_BACKEND must be one of {AUTO!r}, {ORJSON!r} or {STDLIB!r}."
+        )
+    if backend == ORJSON and orjson is None:
+        raise ImproperlyConfigured(
+            "API_JSON_BACKEND is 'orjson' but orjson is not installed."
+        )
+    return backend
+
+
+class JSONEncoder(encoders.JSONEncoder):
+    """DRF's encoder, writing Decimals like DecimalField does."""
+
+    def default(self, obj):
+        if isinstance(obj, Decimal):
+            return str(obj) if api_settings.COERCE_DECIMAL_TO_STRING else float(obj)
+        return super().default(obj)
+
+
+_encoder = JSONEncoder()
+
+
+def orjson_dumps(data, indent=None):
+    """`data` as UTF-8 JSON bytes, or None if orjson cannot encode it."""
+    # Non-string keys are written as strings, like json.dumps does, and UTC
+    # datetimes end in "Z", like DRF's encoder writes them.
+    option = orjson.OPT_NON_STR_KEYS | orjson.OPT_UTC_Z
+    if indent == 2:
+        option |= orjson.OPT_INDENT_2
+    try:
+        return orjson.dumps(data, default=_encoder.default, option=option)
+    except orjson.JSONEncodeError:
+        return None
+
+
+def dumps(data):
+    """`data` as compact UTF-8 JSON bytes with the configured backend."""
+    if json_backend() == ORJSON:
+        encoded = orjson_dumps(data)
+        if encoded is not None:
+            return encoded
+    return json.dumps(
+        data, cls=JSONEncoder, ensure_ascii=False, separators=(",", ":")
+    ).encode()
+
+
+class JSONRenderer(renderers.JSONRenderer):
+    encoder_class = JSONEncoder
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None or json_backend() != ORJSON or self.ensure_ascii:
+            return super().render(data, accepted_media_type, renderer_context)
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        encoded = orjson_dumps(data, indent) if indent in {None, 2} else None
+        if encoded is None:
+            return super().render(data, accepted_media_type, renderer_context)
+        # Escaped like DRF does, so the output is a strict JavaScript subset.
+        return encoded.replace("\u2028".encode(), b"\\u2028").replace(
+            "\u2029".encode(), b"\\u2029"
+        )
+
+
+class JSONParser(parsers.JSONParser):
+    renderer_class = JSONRenderer
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        if json_backend() != ORJSON:
+            return super().parse(stream, media_type, parser_context)
+        parser_context = parser_context or {}
+        encoding = parser_context.get("encoding", settings.DEFAULT_CHARSET)
+        try:
+            data = stream.read()
+            if encoding.lower() not in UTF8_NAMES:
+                data = data.decode(encoding)
+            try:
+                return orjson.loads(data)
+            except orjson.JSONDecodeError:
+                # Let json decide, e.g. for integers beyond 64 bits.
+                parse_constant = json.strict_constant if self.strict else None
+                return json.loads(data, parse_constant=parse_constant)
+        except ValueError as exc:
+            raise ParseError("JSON parse error - %s" % str(exc))
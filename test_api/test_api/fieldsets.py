@@ -0,0 +1,94 @@
+"""
+Sparse fieldsets for API responses.
+
+Clients choose the fields of a GET response with `fields=id,name` or drop fields with `exclude=owner,managers`. Both take comma-separated names of readable serializer fields and can be combined. Unknown names are rejected with a 400. Write requests ignore both parameters.
+
+`SparseFieldsetMixin` removes the other fields from the view's serializer, so their values are never computed, and hands the fieldset to the view's `prune_queryset`, which drops the joins and prefetches that only the removed fields need.
+"""
+
+from functools import cache
+from rest_framework.exceptions import ValidationError
+from rest_framework.serializers import ListSerializer
+
+FIELDS_PARAM = "fields"
+EXCLUDE_PARAM = "exclude"
+FIELDSET_PARAMS = {FIELDS_PARAM, EXCLUDE_PARAM}
+FIELDSET_METHODS = {"GET", "HEAD"}
+
+
+@cache
+def readable_fields(serializer_class):
+    """Names of the fields `serializer_class` writes, in output order."""
+    fields = serializer_class().fields
+    return tuple(name for name, field in fields.items() if not field.write_only)
+
+
+def split_names(value):
+    return [name.strip() for name in value.split(",") if name.strip()]
+
+
+def fieldset_check(available):
+    """A query parameter check rejecting names that are not in `available`."""
+
+    def check(field, value):
+        unknown = [name for name in split_names(value) if name not in available]
+        if unknown:
+            return (
+                f"Unknown fields: {', '.join(unknown)}. "
+                f"Must be among: {', '.join(available)}"
+            )
+
+    return check
+
+
+def parse_fieldset(params, available):
+    """The fields of `available` selected by `params`, or None for all."""
+    if not FIELDSET_PARAMS & set(params):
+        return None
+    check = fieldset_check(available)
+    selected = available
+    for param in (FIELDS_PARAM, EXCLUDE_PARAM):
+        if param not in params:
+            continue
+        message = check(param, params[param])
+        if message is not None:
+            raise ValidationError({param: [message]})
+        names = set(split_names(params[param]))
+        if param == FIELDS_PARAM:
+            selected = [name for name in selected if name in names]
+        else:
+            selected = [name for name in selected if name not in names]
+    return frozenset(selected)
+
+
+class SparseFieldsetMixin:
+    def get_fieldset(self):
+        """The readable fields the request asks for, or None for all of them."""
+        if self.request.method not in FIELDSET_METHODS:
+            return None
+        available = readable_fields(self.get_serializer_class())
+        return parse_fieldset(self.request.query_params, available)
+
+    def get_serializer(self, *args, **kwargs):
+        serializer = super().get_serializer(*args, **kwargs)
+        fieldset = self.get_fieldset()
+        if fieldset is not None:
+            if isinstance(serializer, ListSerializer):
+                fields = serializer.child.fields
+            else:
+                fields = serializer.fields
+            for name in list(fields):
+                if name not in fieldset and not fields[name].write_only:
+                    fields.pop(name)
+        return serializer
+
+    def filter_queryset(self, queryset):
+        queryset = super().filter_queryset(queryset)
+        fieldset = self.get_fieldset()
+        if fieldset is None:
+            return queryset
+        return self.prune_queryset(queryset, fieldset)
+
+    def prune_queryset(self, queryset, fieldset):
+        """`queryset` without the data only fields outside `fieldset` need."""
+        return queryset
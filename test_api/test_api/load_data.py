@@ -1,7 +1,18 @@
-from stores.models import Store, DAYS_OF_WEEK
-from django.contrib.auth import get_user_model
+import os
 import random
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from functools import partial
 from time import time
+import django
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import transaction
+from django.db.models import Max
+from rest_framework.authtoken.models import Token
+from stores.api.bulk import insert_stores
+from stores.models import Store, DAYS_OF_WEEK
 
 User = get_user_model()
 
@@ -169,178 +180,220 @@ STATE = tuple((abbrv for abbrv in Store.STATES))
 
 PASSWORD = "StRoNgPaSsWoRd123!"
 
-
-def get_used_emails():
-    return set(User.objects.values_list("email", flat=True))
-
-
-def generate_user():
-    first_name = random.choice(FIRST_NAMES)
-    last_name = random.choice(LAST_NAMES)
-    invalid_emails = get_used_emails()
-    email = f"{first_name.lower()}.{last_name.lower()}@{random.choice(EMAIL_DOMAINS)}"
-    while email in invalid_emails:
-        first_name = random.choice(FIRST_NAMES)
-        last_name = random.choice(LAST_NAMES)
-        email = (
-            f"{first_name.lower()}.{last_name.lower()}@{random.choice(EMAIL_DOMAINS)}"
-        )
-    return User.objects.create_user(
-        email=email,
-        password=PASSWORD,
-        first_name=first_name,
-        last_name=last_name,
-    )
-
-
-def store_owner():
-    return generate_user()
-
-
-def store_managers(num_managers):
-    return [generate_user() for _ in range(num_managers)]
+# Users or stores generated per task of a worker process.
+CHUNK_SIZE = 10_000
+CHUNKS_AHEAD = 2
+
+STORE_FIELDS = (
+    "name",
+    "city",
+    "address",
+    "plz",
+    "opening_time",
+    "closing_time",
+    "state_abbrv",
+    *DAYS,
+)
 
 
 CITY_INCLUSION_PROBABILITY = 0.3  # 70% chance to include city
 SUFFIX_INCLUSION_PROBABILITY = 0.3  # 30% chance to include suffix
 
 
-def generate_store_name(city):
-    prefix = random.choice(STORE_PREFIXES) + " "
-    mid = random.choice(STORE_MIDS) + " "
+def generate_store_name(city, rng=random):
+    prefix = rng.choice(STORE_PREFIXES) + " "
+    mid = rng.choice(STORE_MIDS) + " "
 
     # Random decisions using fixed probabilities
-    include_city = random.random() < CITY_INCLUSION_PROBABILITY
-    include_suffix = random.random() < SUFFIX_INCLUSION_PROBABILITY
-    suffix = random.choice(STORE_SUFFIXES) if include_suffix else ""
+    include_city = rng.random() < CITY_INCLUSION_PROBABILITY
+    include_suffix = rng.random() < SUFFIX_INCLUSION_PROBABILITY
+    suffix = rng.choice(STORE_SUFFIXES) if include_suffix else ""
     city = ", " + city if include_city else ""
 
     return prefix + mid + suffix + city
 
 
-def generate_store(owner):
-    city = random.choice(CITIES)
-    name = generate_store_name(city)
-    number_first = random.choice([True, False])
-    if number_first:
-        address = random.choice(STREET_NUMBERS) + " " + random.choice(STREET_NAMES)
+def generate_store_fields(rng=random):
+    """Values of STORE_FIELDS for a random store open on 3 or more days."""
+    city = rng.choice(CITIES)
+    if rng.choice([True, False]):
+        address = rng.choice(STREET_NUMBERS) + " " + rng.choice(STREET_NAMES)
     else:
-        address = random.choice(STREET_NAMES)
-    store = Store.objects.create(
-        owner_id=owner,
-        name=name,
-        city=city,
-        address=address,
-        plz=random.choice(PLZ_CODES),
-        opening_time=random.choice(OPENING_TIMES),
-        closing_time=random.choice(CLOSING_TIMES),
-        state_abbrv=random.choice(STATE),
+        address = rng.choice(STREET_NAMES)
+    open_days = set(rng.sample(DAYS, rng.randint(3, len(DAYS))))
+    return (
+        generate_store_name(city, rng),
+        city,
+        address,
+        rng.choice(PLZ_CODES),
+        rng.choice(OPENING_TIMES),
+        rng.choice(CLOSING_TIMES),
+        rng.choice(STATE),
+        *(day in open_days for day in DAYS),
     )
 
-    number_of_days = 0
-    while number_of_days < 3:
-        for day in DAYS:
-            setattr(store, day, False)
-            choice = random.choice([True, False])
-            if choice:
-                number_of_days += 1
-            setattr(store, day, choice)
-    store.save()
-    return store
-
-
-def generate_store_old():
-    city = random.choice(CITIES)
-    name = generate_store_name(city)
-    number_first = random.choice([True, False])
-    if number_first:
-        address = random.choice(STREET_NUMBERS) + " " + random.choice(STREET_NAMES)
-    else:
-        address = random.choice(STREET_NAMES)
-    store = Store.objects.create(
-        owner_id=store_owner(),
-        name=name,
-        city=city,
-        address=address,
-        plz=random.choice(PLZ_CODES),
-        opening_time=random.choice(OPENING_TIMES),
-        closing_time=random.choice(CLOSING_TIMES),
-        state_abbrv=random.choice(STATE),
-    )
-
-    for manager in store_managers(random.randint(1, 4)):
-        store.manager_ids.add(manager)
-    number_of_days = 0
-    while number_of_days < 3:
-        for day in DAYS:
-            setattr(store, day, False)
-            choice = random.choice([True, False])
-            if choice:
-                number_of_days += 1
-            setattr(store, day, choice)
-
-    store.save()
-    return store
 
-
-def bulk_populate(num_stores, num_users, big_owner=None):
-    absolute_start_time = time()
-    # First create regular users
-    users_start_time = time()
+def chunks(total):
+    starts = range(0, total, CHUNK_SIZE)
+    return [(start, min(start + CHUNK_SIZE, total)) for start in starts]
+
+
+def chunk_random(seed, kind, start):
+    # One generator per chunk, so the data does not depend on the workers.
+    return random.Random(f"{seed}:{kind}:{start}")
+
+
+def user_rows(bounds, seed, first_index):
+    """(email, first name, last name, token key) of the users in `bounds`."""
+    start, stop = bounds
+    rng = chunk_random(seed, "users", start)
+    # Numbered like the emails, so later runs with the same seed get new keys.
+    tokens = chunk_random(seed, "tokens", first_index + start)
+    rows = []
+    for index in range(start, stop):
+        first_name = rng.choice(FIRST_NAMES)
+        last_name = rng.choice(LAST_NAMES)
+        domain = rng.choice(EMAIL_DOMAINS)
+        # The index keeps emails unique without looking them up.
+        email = f"{first_name}.{last_name}.{first_index + index}@{domain}".lower()
+        rows.append((email, first_name, last_name, f"{tokens.getrandbits(160):040x}"))
+    return rows
+
+
+def store_rows(bounds, seed, pool_size, big_owner_share, heavy_managers, heavy_share):
+    """(fields, owned by the big owner, manager pool indexes) per store."""
+    start, stop = bounds
+    rng = chunk_random(seed, "stores", start)
+    rows = []
+    for _ in range(start, stop):
+        fields = generate_store_fields(rng)
+        big = rng.random() < big_owner_share
+        managers = set(rng.sample(range(pool_size), min(pool_size, rng.randint(1, 4))))
+        for index in range(heavy_managers):
+            if rng.random() < heavy_share:
+                managers.add(index)
+        rows.append((fields, big, sorted(managers)))
+    return rows
+
+
+def bounded_map(executor, function, items, limit):
+    """Like executor.map, but with at most `limit` results not yet consumed."""
+    pending = deque()
+    for item in items:
+        if len(pending) == limit:
+            yield pending.popleft().result()
+        pending.append(executor.submit(function, item))
+    while pending:
+        yield pending.popleft().result()
+
+
+@contextmanager
+def chunk_mapper(workers, num_chunks):
+    """`map` over chunks, in worker processes when there is more than one.
+
+    Workers run at most CHUNKS_AHEAD chunks each ahead of the writer, so
+    generated rows do not pile up in memory while they are written.
+    """
+    if workers == 1 or num_chunks < 2:
+        yield map
+        return
+    workers = workers or os.cpu_count() or 1
+    # Spawned workers import this module, which needs the app registry.
+    with ProcessPoolExecutor(workers, initializer=django.setup) as executor:
+        yield partial(bounded_map, executor, limit=workers * CHUNKS_AHEAD)
+
+
+def populate(
+    num_stores,
+    num_users,
+    seed=0,
+    big_owner=None,
+    big_owner_share=1.0,
+    heavy_managers=0,
+    heavy_manager_share=0.5,
+    workers=None,
+):
+    """Create users with tokens and stores with 1-4 managers each.
+
+    Every store gets its own owner among the new users, or `big_owner` with a
+    chance of `big_owner_share`; its managers are drawn from the other new
+    users, and each of the first `heavy_managers` of them manages a store
+    with a chance of `heavy_manager_share`. The users and stores only depend
+    on `seed` and on the highest user id in the table, which numbers the
+    emails and token keys; the keys are predictable, so never load this data
+    where it can be reached with real credentials. Users and stores are
+    generated in chunks by `workers` processes (one per CPU by default) and
+    written with bulk_create; all users share one password hash.
+    Returns the ids of the stores and of the users.
+    """
     if num_users <= num_stores:
         raise ValueError("Number of users must be greater than number of stores")
-    users = [generate_user() for _ in range(num_users)]
-    users_end_time = time()
-    stores_start_time = time()
-    stores = []
-    store_count = num_stores
-    while store_count > 0:
-        index = random.randint(0, len(users) - 1)
-        if big_owner:
-            store = generate_store(big_owner)
-        else:
-            store = generate_store(users.pop(index))
-        stores.append(store)
-        store_count -= 1
-    stores_end_time = time()
-    manager_assignment_start_time = time()
-    for store in stores:
-        for _ in range(random.randint(1, 4)):
-            store.manager_ids.add(random.choice(users))
-            store.save()
-    manager_assignment_end_time = time()
-    total_manager_assignment_time = (
-        manager_assignment_end_time - manager_assignment_start_time
+    password = make_password(PASSWORD)
+    first_index = (User.objects.aggregate(last=Max("pk"))["last"] or 0) + 1
+    user_chunks, store_chunks = chunks(num_users), chunks(num_stores)
+    make_user_rows = partial(user_rows, seed=seed, first_index=first_index)
+
+    rng = random.Random(seed)
+    owners = rng.sample(range(num_users), num_stores)
+    owned = set(owners)
+    pool = [index for index in range(num_users) if index not in owned]
+    make_store_rows = partial(
+        store_rows,
+        seed=seed,
+        pool_size=len(pool),
+        big_owner_share=big_owner_share if big_owner is not None else 0.0,
+        heavy_managers=heavy_managers,
+        heavy_share=heavy_manager_share,
     )
-    total_execution_time = time() - absolute_start_time
-    total_users_time = users_end_time - users_start_time
-    total_stores_time = stores_end_time - stores_start_time
-    # print(f"Total users: {num_users}\nCreated in {total_users_time:.2f} seconds")
-    #  print(f"Total stores: {num_stores}\nCreated in {total_stores_time:.2f} seconds")
-    #   (f"Total manager assignment time: {total_manager_assignment_time:.2f} seconds")
-    #    print(f"Total execution time: {total_execution_time:.2f} seconds")
-    return stores, users
+
+    user_ids, store_ids = [], []
+    num_chunks = max(len(user_chunks), len(store_chunks))
+    with chunk_mapper(workers, num_chunks) as map_chunks, transaction.atomic():
+        for rows in map_chunks(make_user_rows, user_chunks):
+            users = [
+                User(
+                    email=email,
+                    first_name=first_name,
+                    last_name=last_name,
+                    password=password,
+                )
+                for email, first_name, last_name, _ in rows
+            ]
+            User.objects.bulk_create(users)
+            Token.objects.bulk_create(
+                Token(key=key, user_id=user.pk)
+                for user, (*_, key) in zip(users, rows)
+            )
+            user_ids += [user.pk for user in users]
+
+        for (start, _), rows in zip(
+            store_chunks, map_chunks(make_store_rows, store_chunks)
+        ):
+            stores, managers = [], []
+            for index, (fields, big, picks) in enumerate(rows, start):
+                owner_id = big_owner.pk if big else user_ids[owners[index]]
+                values = dict(zip(STORE_FIELDS, fields))
+                stores.append(Store(owner_id_id=owner_id, **values))
+                managers.append([user_ids[pool[pick]] for pick in picks])
+            insert_stores(stores, managers)
+            store_ids += [store.pk for store in stores]
+    return store_ids, user_ids
+
+
+def bulk_populate(num_stores, num_users, big_owner=None, seed=0):
+    """Create `num_stores` stores owned by `big_owner` or by distinct new users.
+
+    Returns the ids of the new stores and users, see populate.
+    """
+    return populate(num_stores, num_users, seed=seed, big_owner=big_owner)
 
 
 def populate_database(num_stores, num_regular_users):
     absolute_start_time = time()
-    # First create regular users
-    users_start_time = time()
-    for _ in range(num_regular_users):
-        generate_user()
-    users_end_time = time()
-    # Create stores with random owners and managers
-    stores_start_time = time()
-    for _ in range(num_stores):
-        generate_store_old()
-    stores_end_time = time()
-    user_execution_time = users_end_time - users_start_time
-    store_execution_time = stores_end_time - stores_start_time
+    store_ids, user_ids = populate(num_stores, num_stores + num_regular_users)
     total_execution_time = time() - absolute_start_time
-    num_users = User.objects.count()
-    num_stores = Store.objects.count()
-    print(f"Total users: {num_users}\nCreated in {user_execution_time:.2f} seconds")
-    print(f"Total stores: {num_stores}\nCreated in {store_execution_time:.2f} seconds")
+    print(f"Total users: {len(user_ids)}")
+    print(f"Total stores: {len(store_ids)}")
     print(f"Total execution time: {total_execution_time:.2f} seconds")
 
 
@@ -0,0 +1,206 @@
+"""
+Pagination classes shared by the stores and users APIs.
+
+The `KeysetPagination` class is a seek (cursor) pagination. The cursor stores the values of the active `ordering` fields of the last row on a page, plus `id` as a tiebreaker, so fetching page N is a single indexed range lookup instead of an OFFSET scan, and no COUNT query is run.
+
+The `OptInKeysetPagination` class is a PageNumberPagination that switches to keyset pagination when a client sends `pagination=cursor` or a `cursor` query parameter. Clients that do not opt in keep the page number behaviour. Both are timed as the `paginate` phase of `test_api.timing`.
+"""
+
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from binascii import Error as B64Error
+
+from django.core.exceptions import FieldDoesNotExist
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination, PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from .timing import phase
+
+CURSOR_QUERY_PARAM = "cursor"
+PAGINATION_QUERY_PARAM = "pagination"
+PAGINATION_MODES = {"page", "cursor"}
+
+# Query parameters that only control pagination and are never used to filter.
+PAGINATION_PARAMS = {"page", "page_size", CURSOR_QUERY_PARAM, PAGINATION_QUERY_PARAM}
+
+
+class KeysetPagination(BasePagination):
+    page_size = 3
+    page_size_query_param = "page_size"
+    max_page_size = 100
+    cursor_query_param = CURSOR_QUERY_PARAM
+    invalid_cursor_message = "Invalid cursor"
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(queryset)
+        self.check_ordering(queryset.model, self.ordering)
+
+        cursor = self.decode_cursor(request)
+        reverse = cursor is not None and cursor["reverse"]
+        ordering = self._reverse(self.ordering) if reverse else self.ordering
+        queryset = queryset.order_by(*ordering)
+        if cursor is not None:
+            queryset = queryset.filter(self.seek_filter(ordering, cursor["position"]))
+
+        # One extra row tells us whether there is a further page.
+        rows = list(queryset[: self.page_size + 1])
+        has_more = len(rows) > self.page_size
+        rows = rows[: self.page_size]
+        if reverse:
+            rows.reverse()
+
+        self.has_next = has_more if not reverse else cursor is not None
+        self.has_previous = cursor is not None if not reverse else has_more
+        self.page = rows
+        return rows
+
+    def get_paginated_response(self, data):
+        return Response(
+            {
+                "next": self.get_next_link(),
+                "previous": self.get_previous_link(),
+                "results": data,
+            }
+        )
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            "type": "object",
+            "required": ["results"],
+            "properties": {
+                "next": {"type": "string", "nullable": True, "format": "uri"},
+                "previous": {"type": "string", "nullable": True, "format": "uri"},
+                "results": schema,
+            },
+        }
+
+    def get_page_size(self, request):
+        if not self.page_size_query_param:
+            return self.page_size
+        page_size = request.query_params.get(self.page_size_query_param)
+        if page_size is None:
+            return self.page_size
+        try:
+            page_size = int(page_size)
+        except ValueError:
+            return self.page_size
+        if page_size < 1:
+            return self.page_size
+        return min(page_size, self.max_page_size)
+
+    def get_ordering(self, queryset):
+        ordering = list(queryset.query.order_by) or list(queryset.model._meta.ordering)
+        if not any(field.lstrip("-") in {"id", "pk"} for field in ordering):
+            ordering.append("id")
+        return ordering
+
+    def check_ordering(self, model, ordering):
+        for field in ordering:
+            path = field.lstrip("-").split("__")
+            current = model
+            for name in path:
+                try:
+                    model_field = current._meta.get_field(name)
+                except FieldDoesNotExist:
+                    # An annotation such as a search rank, which is a scalar.
+                    break
+                if model_field.many_to_many or model_field.one_to_many:
+                    raise ValidationError(
+                        f"Cursor pagination does not support ordering by {field.lstrip('-')}"
+                    )
+                current = model_field.related_model or current
+
+    def seek_filter(self, ordering, position):
+        """Rows strictly after `position` in `ordering`, as one OR of ANDs."""
+        if len(position) != len(ordering):
+            raise NotFound(self.invalid_cursor_message)
+        seek = Q()
+        equal = Q()
+        for field, value in zip(ordering, position):
+            name = field.lstrip("-")
+            lookup = "lt" if field.startswith("-") else "gt"
+            seek |= equal & Q(**{f"{name}__{lookup}": value})
+            equal &= Q(**{name: value})
+        return seek
+
+    def get_position(self, row):
+        position = []
+        for field in self.ordering:
+            if hasattr(row, "_fields"):
+                # A values_list(named=True) row selects the ordering columns.
+                position.append(getattr(row, field.lstrip("-")))
+                continue
+            value = row
+            for name in field.lstrip("-").split("__"):
+                value = getattr(value, name)
+            # Ordering by a foreign key orders by its primary key.
+            position.append(getattr(value, "pk", value))
+        return position
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.get_position(self.page[-1]), reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous or not self.page:
+            return None
+        return self.encode_cursor(self.get_position(self.page[0]), reverse=True)
+
+    def encode_cursor(self, position, reverse):
+        payload = json.dumps({"p": position, "r": reverse}, cls=DjangoJSONEncoder)
+        cursor = urlsafe_b64encode(payload.encode()).decode()
+        url = self.request.build_absolute_uri()
+        url = remove_query_param(url, "page")
+        return replace_query_param(url, self.cursor_query_param, cursor)
+
+    def decode_cursor(self, request):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if encoded is None:
+            return None
+        try:
+            payload = json.loads(urlsafe_b64decode(encoded.encode()).decode())
+            return {"position": list(payload["p"]), "reverse": bool(payload["r"])}
+        except (B64Error, UnicodeDecodeError, ValueError, KeyError, TypeError):
+            raise NotFound(self.invalid_cursor_message)
+
+    def _reverse(self, ordering):
+        return [
+            field[1:] if field.startswith("-") else "-" + field for field in ordering
+        ]
+
+
+class OptInKeysetPagination(PageNumberPagination):
+    keyset_class = KeysetPagination
+
+    def paginate_queryset(self, queryset, request, view=None):
+        with phase("paginate"):
+            return self._paginate_queryset(queryset, request, view)
+
+    def _paginate_queryset(self, queryset, request, view):
+        self.keyset = None
+        if self.wants_cursor(request):
+            self.keyset = self.keyset_class()
+            self.keyset.page_size = self.page_size
+            self.keyset.page_size_query_param = self.page_size_query_param
+            self.keyset.max_page_size = self.max_page_size or self.keyset.max_page_size
+            return self.keyset.paginate_queryset(queryset, request, view)
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.keyset is not None:
+            return self.keyset.get_paginated_response(data)
+        return super().get_paginated_response(data)
+
+    def wants_cursor(self, request):
+        mode = request.query_params.get(PAGINATION_QUERY_PARAM)
+        if mode is not None and mode not in PAGINATION_MODES:
+            raise ValidationError(
+                f"Invalid pagination mode: {mode}. Must be one of: {PAGINATION_MODES}"
+            )
+        return mode == "cursor" or CURSOR_QUERY_PARAM in request.query_params
@@ -10,6 +10,8 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.1/ref/settings/
 """
 
+import os
+import sys
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
@@ -47,6 +49,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "test_api.timing.ServerTimingMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -75,6 +78,48 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = "test_api.wsgi.application"
+ASGI_APPLICATION = "test_api.asgi.application"
+
+# Serve GET requests of the store views with async views (stores.api.async_views).
+# test_api.asgi turns this on; under WSGI the sync views are faster.
+STORES_ASYNC_READS = os.environ.get("STORES_ASYNC_READS", "") == "1"
+
+# Query and SQL time budgets per URL name (test_api.timing). A key can be
+# prefixed with a method to apply to that method only. Query budgets are the
+# largest counts measured by the test suite (which renders the browsable API)
+# and `manage.py bench_api`, with some headroom. Requests over budget log a
+# warning. While running the test suite, too many queries fail the request;
+# SQL time depends on the machine and only warns.
+TESTING = len(sys.argv) > 1 and sys.argv[1] == "test"
+QUERY_BUDGETS_STRICT = TESTING
+QUERY_BUDGETS = {
+    "GET stores-list": {"queries": 8, "db_ms": 250},
+    "GET stores-detail": {"queries": 6, "db_ms": 100},
+    "GET stores-stats": {"queries": 4, "db_ms": 250},
+    "GET store-days-list": {"queries": 8, "db_ms": 250},
+    "GET store-days-detail": {"queries": 5, "db_ms": 100},
+    "GET store-hours-list": {"queries": 8, "db_ms": 250},
+    "GET store-hours-detail": {"queries": 5, "db_ms": 100},
+    "GET store-managers-list": {"queries": 8, "db_ms": 250},
+    "GET store-managers-detail": {"queries": 5, "db_ms": 100},
+    "stores-list": {"queries": 40},
+    # A PUT changing the owner and the managers runs about 30.
+    "stores-detail": {"queries": 40},
+    # 60 at the 1000 store limit: SQLite splits the INSERTs.
+    "stores-bulk-create": {"queries": 70},
+    # Bulk day and hour updates of store-days-list and store-hours-list run a
+    # few statements per 500 stores, so they have no query budget.
+    "store-days-detail": {"queries": 25},
+    "store-hours-detail": {"queries": 25},
+    "store-managers-detail": {"queries": 45},
+    # Ownership flags are looked up per user; tokens are joined.
+    "customuser-list": {"queries": 16},
+    "customuser-detail": {"queries": 25},
+}
+
+# Build store list responses with compiled serializers over values_list rows
+# (stores.api.compiled) instead of serializing model instances.
+STORES_COMPILED_SERIALIZERS = True
 
 
 # Database
@@ -89,6 +134,23 @@ DATABASES = {
 
 AUTH_USER_MODEL = "users.CustomUser"
 
+CACHES = {
+    "default": {
+        "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+    }
+}
+
+# Seconds a cached store list response is kept. Responses may be cached per
+# process: invalidation is by generation counters kept in the database
+# (stores.cache), which all processes share.
+STORE_LIST_CACHE_TIMEOUT = 300
+
+# Seconds and entries of the per-process token lookup cache of
+# users.api.authentication; changes made by other processes show after the
+# timeout. A timeout of 0 turns the cache off.
+TOKEN_AUTH_CACHE_TIMEOUT = 60
+TOKEN_AUTH_CACHE_SIZE = 10_000
+
 # Password validation
 # https://docs.djangoproject.com/en/5.1/ref/settings/#auth-password-validators
 
@@ -109,18 +171,26 @@ AUTH_PASSWORD_VALIDATORS = [
 
 # REST framework settings
 REST_FRAMEWORK = {
-    "DEFAULT_PAGINATION_CLASS": "rest_framework.pagination.PageNumberPagination",
+    "DEFAULT_PAGINATION_CLASS": "test_api.pagination.OptInKeysetPagination",
     "PAGE_SIZE": 3,
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework.authentication.TokenAuthentication",
+        "users.api.authentication.CachedTokenAuthentication",
         "rest_framework.authentication.SessionAuthentication",
     ],
-    "DEFAULT_FILTER_BACKENDS": ["django_filters.rest_framework.DjangoFilterBackend"],
+    "DEFAULT_FILTER_BACKENDS": ["test_api.timing.TimedFilterBackend"],
     "DEFAULT_RENDERER_CLASSES": [
         "rest_framework.renderers.BrowsableAPIRenderer",
-        "rest_framework.renderers.JSONRenderer",
+        "test_api.fast_json.JSONRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "test_api.fast_json.JSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
     ],
 }
+# JSON library of test_api.fast_json: "auto" (orjson if installed), "orjson"
+# or "stdlib".
+API_JSON_BACKEND = "auto"
 FILTERS_DEFAULT_LOOKUP_EXPR = "exact"
 
 
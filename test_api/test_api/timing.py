@@ -0,0 +1,189 @@
+"""
+Per-request query counts, SQL time and phase timings.
+
+`ServerTimingMiddleware` collects a `RequestMetrics` for every request:
+
+- the number of SQL queries and the time spent executing them, recorded by an execute wrapper on every database connection;
+- the time spent in the phases of DRF views: `filter` (`TimedFilterBackend`), `paginate` (`test_api.pagination`), `serialize` (`TimedSerializerMixin` and the compiled store serializers) and `render` (the middleware renders the response).
+
+The metrics are sent as a `Server-Timing` header and logged to the `test_api.timing` logger with one field per metric. Phases can overlap the SQL time, since querysets run lazily.
+
+`QUERY_BUDGETS` maps URL names, optionally prefixed with a method such as "GET stores-list", to budgets: `{"queries": <count>, "db_ms": <milliseconds>}`, either of which may be left out. A request over budget logs a warning. When `QUERY_BUDGETS_STRICT` is on, as it is for the test suite, a request over its query budget raises `QueryBudgetExceeded` instead; SQL time depends on the machine and only ever warns.
+"""
+
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from time import perf_counter
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django_filters.rest_framework import DjangoFilterBackend
+
+logger = logging.getLogger(__name__)
+
+current_metrics = ContextVar("request_metrics", default=None)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.start = perf_counter()
+        self.queries = 0
+        self.db_time = 0.0
+        self.phases = {}
+
+    def add_phase(self, name, duration):
+        self.phases[name] = self.phases.get(name, 0.0) + duration
+
+    def fields(self, total):
+        """The metrics as log fields, with durations in milliseconds."""
+        fields = {"queries": self.queries, "db_ms": round(self.db_time * 1e3, 2)}
+        for name, duration in self.phases.items():
+            fields[f"{name}_ms"] = round(duration * 1e3, 2)
+        fields["total_ms"] = round(total * 1e3, 2)
+        return fields
+
+    def server_timing(self, total):
+        entries = [f'db;dur={self.db_time * 1e3:.2f};desc="{self.queries} queries"']
+        entries += [
+            f"{name};dur={duration * 1e3:.2f}" for name, duration in self.phases.items()
+        ]
+        entries.append(f"total;dur={total * 1e3:.2f}")
+        return ", ".join(entries)
+
+
+@contextmanager
+def phase(name):
+    """Add the time spent in the block to the request's `name` phase."""
+    metrics = current_metrics.get()
+    if metrics is None:
+        yield
+        return
+    start = perf_counter()
+    try:
+        yield
+    finally:
+        metrics.add_phase(name, perf_counter() - start)
+
+
+def record_query(execute, sql, params, many, context):
+    metrics = current_metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.queries += 1
+        metrics.db_time += perf_counter() - start
+
+
+def install_query_recorder(connection, **kwargs):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+# Connections opened by other threads, e.g. for sync_to_async, get it too.
+connection_created.connect(install_query_recorder)
+
+
+def get_budget(method, url_name):
+    budgets = getattr(settings, "QUERY_BUDGETS", {})
+    return budgets.get(f"{method} {url_name}", budgets.get(url_name))
+
+
+def check_budget(request, metrics):
+    match = request.resolver_match
+    if match is None:
+        return
+    budget = get_budget(request.method, match.url_name)
+    if budget is None:
+        return
+    problems = []
+    max_queries = budget.get("queries")
+    too_many_queries = max_queries is not None and metrics.queries > max_queries
+    if too_many_queries:
+        problems.append(f"{metrics.queries} queries (budget {max_queries})")
+    max_db_ms = budget.get("db_ms")
+    if max_db_ms is not None and metrics.db_time * 1e3 > max_db_ms:
+        problems.append(f"{metrics.db_time * 1e3:.1f} ms of SQL (budget {max_db_ms})")
+    if not problems:
+        return
+    message = f"{request.method} {match.url_name} ran {' and '.join(problems)}"
+    if too_many_queries and getattr(settings, "QUERY_BUDGETS_STRICT", False):
+        raise QueryBudgetExceeded(message)
+    logger.warning(message, extra={"view": match.url_name})
+
+
+class ServerTimingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        for connection in connections.all(initialized_only=True):
+            install_query_recorder(connection)
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        try:
+            response = self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        return self.finish(request, response, metrics)
+
+    async def __acall__(self, request):
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_metrics.reset(token)
+        return self.finish(request, response, metrics)
+
+    def process_template_response(self, request, response):
+        # Render here, so that rendering is timed; Django skips rendered ones.
+        with phase("render"):
+            response.render()
+        return response
+
+    def finish(self, request, response, metrics):
+        total = perf_counter() - metrics.start
+        response["Server-Timing"] = metrics.server_timing(total)
+        match = request.resolver_match
+        logger.info(
+            "%s %s",
+            request.method,
+            request.path,
+            extra={
+                "method": request.method,
+                "path": request.path,
+                "view": match.url_name if match else None,
+                "status": response.status_code,
+                **metrics.fields(total),
+            },
+        )
+        check_budget(request, metrics)
+        return response
+
+
+class TimedFilterBackend(DjangoFilterBackend):
+    def filter_queryset(self, request, queryset, view):
+        with phase("filter"):
+            return super().filter_queryset(request, queryset, view)
+
+
+class TimedSerializerMixin:
+    def to_representation(self, instance):
+        with phase("serialize"):
+            return super().to_representation(instance)
@@ -0,0 +1,106 @@
+"""
+Token authentication with an in-process cache of token lookups.
+
+DRF's `TokenAuthentication` reads the token and its user with a join on every request. `CachedTokenAuthentication` keeps the result per token key in `token_cache`, a per-process cache with a time-to-live (`TOKEN_AUTH_CACHE_TIMEOUT` seconds, 0 turns it off) and least-recently-used eviction beyond `TOKEN_AUTH_CACHE_SIZE` entries. Unknown keys and inactive users are never cached, so they fail like they do with `TokenAuthentication`.
+
+The receivers in `users.signals` drop the entry of a token when it is deleted and the entry of a user whenever the user is saved or deleted, which covers password changes and deactivation. Other processes and queryset `update()` calls do not send these signals; their changes take effect when the entry expires.
+
+Cached entries hold column values, not instances, so every request gets its own user and token objects.
+"""
+
+from collections import OrderedDict, namedtuple
+from threading import Lock
+from time import monotonic
+from django.conf import settings
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from ..models import CustomUser
+
+Entry = namedtuple("Entry", "expires db user_id user_values token_values")
+
+
+def attnames(model):
+    return [field.attname for field in model._meta.concrete_fields]
+
+
+def column_values(instance):
+    return [getattr(instance, name) for name in attnames(type(instance))]
+
+
+def cache_timeout():
+    return getattr(settings, "TOKEN_AUTH_CACHE_TIMEOUT", 60)
+
+
+def cache_size():
+    return getattr(settings, "TOKEN_AUTH_CACHE_SIZE", 10_000)
+
+
+class TokenCache:
+    def __init__(self):
+        self.entries = OrderedDict()
+        self.keys_by_user = {}
+        self.lock = Lock()
+
+    def get(self, key):
+        """(user, token) for `key`, or None when it is not cached or expired."""
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None:
+                return None
+            if entry.expires <= monotonic():
+                self._pop(key)
+                return None
+            self.entries.move_to_end(key)
+        user = CustomUser.from_db(entry.db, attnames(CustomUser), entry.user_values)
+        token = Token.from_db(entry.db, attnames(Token), entry.token_values)
+        token.user = user
+        return user, token
+
+    def set(self, token):
+        timeout = cache_timeout()
+        if not timeout:
+            return
+        user = token.user
+        entry = Entry(
+            monotonic() + timeout,
+            token._state.db,
+            user.pk,
+            column_values(user),
+            column_values(token),
+        )
+        with self.lock:
+            self._pop(self.keys_by_user.get(user.pk))
+            self.entries[token.key] = entry
+            self.keys_by_user[user.pk] = token.key
+            while len(self.entries) > cache_size():
+                self._pop(next(iter(self.entries)))
+
+    def _pop(self, key):
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.keys_by_user.pop(entry.user_id, None)
+
+    def invalidate_key(self, key):
+        with self.lock:
+            self._pop(key)
+
+    def invalidate_user(self, user_id):
+        with self.lock:
+            self._pop(self.keys_by_user.get(user_id))
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.keys_by_user.clear()
+
+
+token_cache = TokenCache()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    def authenticate_credentials(self, key):
+        credentials = token_cache.get(key)
+        if credentials is None:
+            credentials = super().authenticate_credentials(key)
+            token_cache.set(credentials[1])
+        return credentials
@@ -12,10 +12,11 @@ from django.contrib.auth.password_validation import validate_password
 from django.contrib.auth import authenticate
 from rest_framework import serializers
 from rest_framework.exceptions import AuthenticationFailed
+from test_api.timing import TimedSerializerMixin
 from ..models import CustomUser
 
 
-class CustomUserSerializer(serializers.ModelSerializer):
+class CustomUserSerializer(TimedSerializerMixin, serializers.ModelSerializer):
     password = serializers.CharField(write_only=True)
     is_manager = serializers.SerializerMethodField()
     is_owner = serializers.SerializerMethodField()
@@ -49,7 +50,9 @@ class CustomUserSerializer(serializers.ModelSerializer):
         ]
 
     def get_token(self, obj):
-        return obj.auth_token.key
+        # The reverse one-to-one accessor reads the token and never creates one.
+        token = getattr(obj, "auth_token", None)
+        return token.key if token is not None else None
 
     def get_is_manager(self, obj):
         return obj.is_manager
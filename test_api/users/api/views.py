@@ -1,7 +1,7 @@
 """
 Provides API views for managing custom user accounts and authentication.
 
-The `CustomUserViewSet` class provides a set of API endpoints for managing custom user accounts. It uses the `CustomUserSerializer` to serialize and deserialize user data, and the `UserFilter` to filter the queryset.
+The `CustomUserViewSet` class provides a set of API endpoints for managing custom user accounts. It uses the `CustomUserSerializer` to serialize and deserialize user data, and the `UserFilter` to filter the queryset. Tokens are joined into the user query. GET requests can pick fields with `fields=` or drop them with `exclude=` (see `test_api.fieldsets`); the token join and the ownership lookups of `token`, `is_manager` and `is_owner` only run when those fields are returned, and only the selected columns are read. Token and session authentication go through `CachedTokenAuthentication` (see `users.api.authentication`).
 
 The `SignupView` class provides an API endpoint for creating new user accounts. It uses the `SignUpSerializer` to validate and create new user instances, and returns an authentication token in the response.
 
@@ -18,19 +18,28 @@ from rest_framework.views import APIView
 from rest_framework.generics import CreateAPIView
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated, AllowAny
-from rest_framework.authentication import TokenAuthentication, SessionAuthentication
+from rest_framework.authentication import SessionAuthentication
 from rest_framework.authtoken.models import Token
 
 from django.contrib.auth import authenticate
+from test_api.fieldsets import SparseFieldsetMixin
+from .authentication import CachedTokenAuthentication
 from .permissions import IsSuperUser
 
 
-class CustomUserViewSet(ModelViewSet):
+class CustomUserViewSet(SparseFieldsetMixin, ModelViewSet):
     permission_classes = [IsSuperUser]
-    queryset = CustomUser.objects.all().order_by("id")
+    queryset = CustomUser.objects.select_related("auth_token").order_by("id")
     serializer_class = CustomUserSerializer
     filterset_class = UserFilter
-    authentication_classes = [TokenAuthentication, SessionAuthentication]
+    authentication_classes = [CachedTokenAuthentication, SessionAuthentication]
+
+    def prune_queryset(self, queryset, fieldset):
+        columns = {field.name for field in CustomUser._meta.concrete_fields}
+        selected = ["id", *sorted(fieldset & columns)]
+        if "token" in fieldset:
+            return queryset.only(*selected, "auth_token__key")
+        return queryset.select_related(None).only(*selected)
 
 
 class SignupView(CreateAPIView):
@@ -76,7 +85,8 @@ class LoginView(APIView):
             password = serializer.validated_data.get("password")
             user = authenticate(email=email, password=password)
             if user:
-                return Response({"token": user.auth_token.key})
+                token, _ = Token.objects.get_or_create(user=user)
+                return Response({"token": token.key})
             return Response(
                 {"error": "Invalid credentials"}, status=status.HTTP_401_UNAUTHORIZED
             )
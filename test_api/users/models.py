@@ -5,7 +5,6 @@ from django.contrib.auth.models import (
     Group,
     Permission,
 )
-from rest_framework.authtoken.models import Token
 from .managers import CustomUserManager
 
 
@@ -32,11 +31,6 @@ class CustomUser(AbstractBaseUser, PermissionsMixin):
     def name(self):
         return f"{self.first_name} {self.last_name}"
 
-    @property
-    def auth_token(self):
-        token, _ = Token.objects.get_or_create(user=self)
-        return token
-
     def __str__(self):
         return self.name + " (id: " + str(self.id) + ")"
 
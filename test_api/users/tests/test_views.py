@@ -1,8 +1,14 @@
 from django.urls import reverse
 from django.contrib.auth import get_user_model
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from unittest import mock
 from rest_framework import status
 from rest_framework.authtoken.models import Token
 from rest_framework.test import APITestCase
+from users.api import authentication
+from users.api.authentication import token_cache
 
 
 User = get_user_model()
@@ -97,6 +103,93 @@ class CustomUserViewSetTestCase(BaseTestCase):
         # I know this should be a 204, but it isn't a quick simple fix.
         self.assertEqual(response.status_code, status.HTTP_200_OK)
 
+    def test_list_users_cursor_pagination(self):
+        for i in range(4):
+            User.objects.create_user(
+                email=f"cursor{i}@example.com",
+                password="cursor_password",
+                first_name="Cursor",
+                last_name=f"User{i}",
+            )
+        ids = []
+        response = self.client.get(self.url, {"pagination": "cursor"})
+        while True:
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertNotIn("count", response.data)
+            ids.extend(user["id"] for user in response.data["results"])
+            if not response.data["next"]:
+                break
+            response = self.client.get(response.data["next"])
+        expected = list(User.objects.order_by("id").values_list("id", flat=True))
+        self.assertEqual(ids, expected)
+
+
+    def test_list_users_sparse_fieldset(self):
+        response = self.client.get(self.url, {"fields": "id,email,token"})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        for user in response.data["results"]:
+            self.assertEqual(list(user), ["id", "email", "token"])
+
+    def test_excluded_method_fields_run_no_queries(self):
+        for i in range(3):
+            User.objects.create_user(
+                email=f"sparse{i}@example.com",
+                password="sparse_password",
+                first_name="Sparse",
+                last_name=f"User{i}",
+            )
+        params = {"exclude": "token,is_manager,is_owner", "page_size": 10}
+        with CaptureQueriesContext(connection) as pruned:
+            response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotIn("token", response.data["results"][0])
+        with CaptureQueriesContext(connection) as full:
+            response = self.client.get(self.url, {"page_size": 10})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        # An ownership and a management lookup per user are skipped, and the
+        # token is no longer joined.
+        rows = len(response.data["results"])
+        self.assertGreaterEqual(
+            len(full.captured_queries) - len(pruned.captured_queries), 2 * rows
+        )
+        full_users_sql = [
+            query["sql"]
+            for query in full.captured_queries
+            if 'FROM "users_customuser"' in query["sql"] and "ORDER BY" in query["sql"]
+        ]
+        self.assertEqual(len(full_users_sql), 1)
+        self.assertIn('"authtoken_token"', full_users_sql[0])
+        users_sql = [
+            query["sql"]
+            for query in pruned.captured_queries
+            if 'FROM "users_customuser" ORDER BY' in query["sql"]
+        ]
+        self.assertEqual(len(users_sql), 1)
+        self.assertNotIn("password", users_sql[0])
+
+    def test_retrieve_user_sparse_fieldset(self):
+        response = self.client.get(
+            f"/users/{self.user.id}/", {"fields": "email", "exclude": "id"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, {"email": self.user.email})
+
+    def test_unknown_sparse_field_is_rejected(self):
+        response = self.client.get(self.url, {"fields": "id,secret"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn("Unknown fields: secret", str(response.data["fields"][0]))
+
+        # The password is write-only, so it cannot be selected either.
+        response = self.client.get(self.url, {"exclude": "password"})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_fieldset_is_ignored_on_writes(self):
+        response = self.client.patch(
+            f"/users/{self.user.id}/?fields=id", {"first_name": "Jane"}
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["first_name"], "Jane")
+
 
 class SignupViewTests(BaseTestCase):
     def setUp(self):
@@ -225,3 +318,105 @@ class LoginViewTests(BaseTestCase):
             response = self.client.post(self.url, missing_data)
             self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
             self.assertIn(field, response.data)
+
+
+class CachedTokenAuthenticationTests(BaseTestCase):
+    def setUp(self):
+        token_cache.clear()
+        self.superuser = User.objects.create_superuser(
+            email="superuser@example.com",
+            password="superuser_password",
+            first_name="Super",
+            last_name="User",
+        )
+        self.token = Token.objects.get(user=self.superuser)
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Token {self.token.key}", HTTP_ACCEPT="application/json"
+        )
+        self.url = f"/users/{self.superuser.id}/"
+
+    def token_lookups(self):
+        """Token queries run by a GET of the superuser's detail."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [
+            query["sql"]
+            for query in queries.captured_queries
+            if '"authtoken_token"."key" =' in query["sql"]
+        ]
+
+    def test_token_lookup_is_cached(self):
+        self.assertEqual(len(self.token_lookups()), 1)
+        self.assertEqual(self.token_lookups(), [])
+        response = self.client.get(self.url)
+        self.assertEqual(response.data["email"], self.superuser.email)
+
+    def test_unknown_token_is_rejected(self):
+        self.client.credentials(HTTP_AUTHORIZATION="Token unknown")
+        for _ in range(2):
+            response = self.client.get(self.url)
+            self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deleted_token_is_rejected(self):
+        self.token_lookups()
+        self.token.delete()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_deactivated_user_is_rejected(self):
+        self.token_lookups()
+        self.superuser.is_active = False
+        self.superuser.save()
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_401_UNAUTHORIZED)
+
+    def test_password_change_drops_entry(self):
+        self.token_lookups()
+        self.superuser.set_password("new_superuser_password")
+        self.superuser.save()
+        self.assertEqual(len(self.token_lookups()), 1)
+
+    def test_entries_expire(self):
+        self.token_lookups()
+        later = authentication.monotonic() + 61
+        with mock.patch.object(authentication, "monotonic", return_value=later):
+            self.assertEqual(len(self.token_lookups()), 1)
+
+    @override_settings(TOKEN_AUTH_CACHE_TIMEOUT=0)
+    def test_cache_can_be_turned_off(self):
+        self.assertEqual(len(self.token_lookups()), 1)
+        self.assertEqual(len(self.token_lookups()), 1)
+
+    @override_settings(TOKEN_AUTH_CACHE_SIZE=1)
+    def test_least_recently_used_entry_is_evicted(self):
+        other = User.objects.create_superuser(
+            email="other@example.com", password="other_password"
+        )
+        self.token_lookups()
+        self.client.credentials(
+            HTTP_AUTHORIZATION=f"Token {Token.objects.get(user=other).key}",
+            HTTP_ACCEPT="application/json",
+        )
+        self.client.get(self.url)
+        self.assertIsNone(token_cache.get(self.token.key))
+        self.assertIsNotNone(token_cache.get(Token.objects.get(user=other).key))
+
+    def test_token_field_never_creates_tokens(self):
+        user = User.objects.create_user(**BASE_DATA)
+        Token.objects.filter(user=user).delete()
+        response = self.client.get(f"/users/{user.id}/")
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIsNone(response.data["token"])
+        self.assertFalse(Token.objects.filter(user=user).exists())
+
+    def test_login_creates_missing_token(self):
+        user = User.objects.create_user(**BASE_DATA)
+        Token.objects.filter(user=user).delete()
+        self.client.credentials(HTTP_ACCEPT="application/json")
+        response = self.client.post(
+            reverse("login"),
+            {"email": BASE_DATA["email"], "password": BASE_DATA["password"]},
+        )
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data["token"], Token.objects.get(user=user).key)